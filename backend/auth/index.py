@@ -2,9 +2,49 @@ import json
 import os
 import hashlib
 from typing import Dict, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db import get_pool
+from tokens import issue_token
+from queries import register, execute
+from metrics import instrument, phase
 
+register(
+    'admin_login',
+    "SELECT id, full_name, role, username "
+    "FROM t_p89410065_cleaning_service_web.users "
+    "WHERE username = %s AND password_hash = %s"
+)
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+# неизменяемые ответы собираются один раз на экземпляр, а не на каждый вызов
+OPTIONS_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': '',
+    'isBase64Encoded': False
+}
+METHOD_NOT_ALLOWED_RESPONSE = {
+    'statusCode': 405,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'Method not allowed'}),
+    'isBase64Encoded': False
+}
+DATABASE_NOT_CONFIGURED_RESPONSE = {
+    'statusCode': 500,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'DATABASE_URL not configured'}),
+    'isBase64Encoded': False
+}
+
+@instrument('auth')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Аутентификация пользователей для админ-панели
@@ -15,82 +55,59 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'POST')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return OPTIONS_RESPONSE
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return METHOD_NOT_ALLOWED_RESPONSE
     
-    database_url = os.environ.get('DATABASE_URL')
-    if not database_url:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'DATABASE_URL not configured'}),
-            'isBase64Encoded': False
-        }
+    if not DATABASE_URL:
+        return DATABASE_NOT_CONFIGURED_RESPONSE
     
-    body_data = json.loads(event.get('body', '{}'))
+    with phase('parse'):
+        body_data = json.loads(event.get('body', '{}'))
     username = body_data.get('username', '').strip()
     password = body_data.get('password', '').strip()
     
     if not username or not password:
         return {
             'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'headers': JSON_HEADERS,
             'body': json.dumps({'error': 'Username and password are required'}),
             'isBase64Encoded': False
         }
     
     password_hash = hashlib.sha256(password.encode()).hexdigest()
     
-    conn = psycopg2.connect(database_url)
+    pool = get_pool()
+    conn = pool.getconn()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
-        cursor.execute(
-            "SELECT id, full_name, role, username "
-            "FROM t_p89410065_cleaning_service_web.users "
-            "WHERE username = '" + username.replace("'", "''") + "' "
-            "AND password_hash = '" + password_hash.replace("'", "''") + "'"
-        )
+        execute(cursor, 'admin_login', (username, password_hash))
         
         user = cursor.fetchone()
         
         if not user:
             return {
                 'statusCode': 401,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'headers': JSON_HEADERS,
                 'body': json.dumps({'error': 'Invalid username or password'}),
                 'isBase64Encoded': False
             }
         
         return {
             'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'headers': JSON_HEADERS,
             'body': json.dumps({
                 'id': user['id'],
                 'full_name': user['full_name'],
                 'role': user['role'],
-                'username': user['username']
+                'username': user['username'],
+                'token': issue_token(user['id'], user['role'], 'admin')
             }),
             'isBase64Encoded': False
         }
     
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        pool.putconn(conn)
\ No newline at end of file
@@ -0,0 +1,238 @@
+'''
+Business: Автоназначение исполнителей на неназначенные заявки дня - жадное размещение и локальный поиск
+Args: conn - соединение psycopg2, day - дата, dry_run; ASSIGN_TIME_BUDGET_MS из окружения
+Returns: auto_assign() - назначения, заявки без свободного исполнителя и загрузка исполнителей после решения
+'''
+
+import os
+import time
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+from psycopg2.extras import RealDictCursor, execute_values
+from queries import register, execute
+from availability import load_schedule, job_slots
+
+# локальный поиск прерывается по бюджету, жадное решение к этому моменту уже допустимо
+ASSIGN_TIME_BUDGET_MS = float(os.environ.get('ASSIGN_TIME_BUDGET_MS', '500'))
+MAX_IMPROVEMENT_PASSES = 20
+# потолок slots_per_day в V0014: маска дня помещается в BIGINT
+MAX_SLOTS = 62
+
+register(
+    'assign_occupancy',
+    "SELECT assignee_id, busy, jobs FROM t_p89410065_cleaning_service_web.cleaner_occupancy WHERE day = %s::date"
+)
+register(
+    'assign_unassigned',
+    "SELECT id, (EXTRACT(EPOCH FROM booking_time) / 60)::integer AS minutes, area, service_type "
+    "FROM t_p89410065_cleaning_service_web.bookings "
+    "WHERE booking_date = %s::date AND assignee_id IS NULL AND status <> 'cancelled' "
+    "ORDER BY id"
+)
+
+# назначаются только заявки, которые всё ещё без исполнителя: ручное назначение за время решения не затирается
+ASSIGN_QUERY = (
+    "UPDATE t_p89410065_cleaning_service_web.bookings b SET "
+    "assignee_id = v.assignee_id, "
+    "status = CASE WHEN b.status = 'new' THEN 'assigned' ELSE b.status END, "
+    "updated_at = CURRENT_TIMESTAMP "
+    "FROM (VALUES %s) AS v (id, assignee_id) "
+    "WHERE b.id = v.id AND b.assignee_id IS NULL AND b.status <> 'cancelled' "
+    "RETURNING b.id"
+)
+
+Job = Tuple[int, int, int]
+
+
+def job_window(settings: Dict[str, Any], minutes: Optional[int], length: int) -> int:
+    '''Начальный слот заявки - как в booking_slot_mask(): время вне рабочего дня прижимается к его границам'''
+    if minutes is None:
+        return 0
+    start = (minutes - settings['day_start']) // settings['slot_minutes']
+    return min(max(start, 0), settings['slots_per_day'] - length)
+
+
+def solve(cleaners: List[int], busy: Dict[int, int], load: Dict[int, int], jobs: List[Job],
+          budget_ms: float = ASSIGN_TIME_BUDGET_MS) -> Tuple[Dict[int, int], List[int]]:
+    '''
+    Назначение работ jobs = [(id, начальный слот, длина)] исполнителям с занятостью busy (битовые маски)
+    и текущей загрузкой load в слотах. Время заявки фиксировано клиентом: работа встаёт только к исполнителю,
+    у которого свободно всё окно. Цель - разместить как можно больше работ и выровнять загрузку
+    (минимум суммы квадратов загрузок); существующие назначения не меняются.
+    Возвращает {id заявки: исполнитель} и id заявок, для которых исполнителя не нашлось.
+    '''
+    deadline = time.perf_counter() + budget_ms / 1000
+    busy = {cleaner: busy.get(cleaner, 0) for cleaner in cleaners}
+    load = {cleaner: load.get(cleaner, 0) for cleaner in cleaners}
+    masks = {job_id: ((1 << length) - 1) << start for job_id, start, length in jobs}
+    lengths = {job_id: length for job_id, _, length in jobs}
+    placed: Dict[int, int] = {}
+    on_cleaner: Dict[int, List[int]] = {cleaner: [] for cleaner in cleaners}
+    unplaced: List[int] = []
+    # исполнители по загрузке: поиск наименее загруженного свободного идёт с нижних корзин и
+    # обычно заканчивается на первых кандидатах, а не перебирает всех
+    by_load: List[Dict[int, None]] = [{} for _ in range(MAX_SLOTS + 1)]
+    for cleaner in cleaners:
+        by_load[load[cleaner]][cleaner] = None
+
+    def place(job_id: int, cleaner: int) -> None:
+        placed[job_id] = cleaner
+        on_cleaner[cleaner].append(job_id)
+        busy[cleaner] |= masks[job_id]
+        del by_load[load[cleaner]][cleaner]
+        load[cleaner] += lengths[job_id]
+        by_load[load[cleaner]][cleaner] = None
+
+    def unplace(job_id: int) -> int:
+        cleaner = placed.pop(job_id)
+        on_cleaner[cleaner].remove(job_id)
+        busy[cleaner] &= ~masks[job_id]
+        del by_load[load[cleaner]][cleaner]
+        load[cleaner] -= lengths[job_id]
+        by_load[load[cleaner]][cleaner] = None
+        return cleaner
+
+    def least_loaded(mask: int, exclude: Optional[int] = None, below: int = MAX_SLOTS + 1) -> Optional[int]:
+        for bucket in by_load[:below]:
+            for cleaner in bucket:
+                if cleaner != exclude and not busy[cleaner] & mask:
+                    return cleaner
+        return None
+
+    # жадно: длинные работы первыми - их труднее разместить, короткие потом заполняют промежутки.
+    # Пока работы только добавляются, окно без свободного исполнителя таким и остаётся
+    full: set = set()
+    for job_id, start, length in sorted(jobs, key=lambda job: (-job[2], job[1], job[0])):
+        cleaner = None if masks[job_id] in full else least_loaded(masks[job_id])
+        if cleaner is None:
+            full.add(masks[job_id])
+            unplaced.append(job_id)
+        else:
+            place(job_id, cleaner)
+
+    # вытеснение: неразмещённая работа встаёт к исполнителю, если единственную мешающую ей
+    # новую работу можно перенести к другому; окна работ, назначенных ранее, в busy и не двигаются.
+    # До первого успешного переноса окна, которые некуда перенести или не удалось вставить, не перепроверяются
+    stuck: set = set()
+    failed: set = set()
+    for job_id in list(unplaced):
+        if time.perf_counter() >= deadline:
+            break
+        mask = masks[job_id]
+        if mask in failed:
+            continue
+        failed.add(mask)
+        for cleaner in cleaners:
+            blocking = [other for other in on_cleaner[cleaner] if masks[other] & mask]
+            if len(blocking) != 1 or masks[blocking[0]] in stuck:
+                continue
+            if busy[cleaner] & ~masks[blocking[0]] & mask:
+                continue
+            target = least_loaded(masks[blocking[0]], exclude=cleaner)
+            if target is None:
+                # мешающее окно занято у всех, кроме этого исполнителя
+                stuck.add(masks[blocking[0]])
+                continue
+            unplace(blocking[0])
+            place(blocking[0], target)
+            place(job_id, cleaner)
+            unplaced.remove(job_id)
+            stuck.clear()
+            failed.clear()
+            break
+
+    # выравнивание: перенос работы к менее загруженному исполнителю, пока сумма квадратов убывает
+    for _ in range(MAX_IMPROVEMENT_PASSES):
+        improved = False
+        for job_id in sorted(placed, key=lambda item: -load[placed[item]]):
+            if time.perf_counter() >= deadline:
+                break
+            current = placed[job_id]
+            target = least_loaded(masks[job_id], exclude=current, below=load[current] - lengths[job_id])
+            if target is not None:
+                unplace(job_id)
+                place(job_id, target)
+                improved = True
+        if not improved or time.perf_counter() >= deadline:
+            break
+
+    return placed, sorted(unplaced)
+
+
+def auto_assign(conn: Any, day: date, dry_run: bool = False) -> Dict[str, Any]:
+    '''Загружает день, решает задачу назначения и записывает результат одной транзакцией'''
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        # параллельные запуски по одному дню выполняются по очереди
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('bookings_auto_assign'), %s)", (day.toordinal(),))
+        schedule = load_schedule(cursor)
+        settings = schedule['settings']
+        execute(cursor, 'schedule_cleaners', ())
+        cleaners = [row['id'] for row in cursor.fetchall()]
+        execute(cursor, 'assign_occupancy', (day,))
+        busy: Dict[int, int] = {}
+        load: Dict[int, int] = {}
+        for row in cursor.fetchall():
+            busy[row['assignee_id']] = row['busy']
+            load[row['assignee_id']] = bin(row['busy']).count('1')
+        execute(cursor, 'assign_unassigned', (day,))
+        jobs: List[Job] = []
+        for row in cursor.fetchall():
+            length = job_slots(schedule, row['area'] or 0, row['service_type'] or '*')
+            jobs.append((row['id'], job_window(settings, row['minutes'], length), length))
+
+        started = time.perf_counter()
+        placed, unplaced = solve(cleaners, busy, load, jobs)
+        solve_ms = (time.perf_counter() - started) * 1000
+
+        applied: List[int] = []
+        if placed:
+            applied = [row['id'] for row in execute_values(
+                cursor, ASSIGN_QUERY, sorted(placed.items()),
+                template='(%s::integer, %s::integer)', page_size=len(placed), fetch=True
+            )]
+
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+
+    lengths = {job_id: length for job_id, _, length in jobs}
+    applied_set = set(applied)
+    for job_id, cleaner in placed.items():
+        if job_id in applied_set:
+            load[cleaner] = load.get(cleaner, 0) + lengths[job_id]
+    return {
+        'date': day.isoformat(),
+        'assignments': [{'id': job_id, 'assignee_id': placed[job_id]} for job_id in sorted(applied_set)],
+        'assigned': len(applied_set),
+        'unplaced': unplaced,
+        # заявку успели назначить вручную или отменить, пока шло решение
+        'skipped': sorted(set(placed) - applied_set),
+        'load_minutes': {str(cleaner): load.get(cleaner, 0) * settings['slot_minutes'] for cleaner in cleaners},
+        'solve_ms': round(solve_ms, 2),
+        'dry_run': dry_run
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import psycopg2
+
+    parser = argparse.ArgumentParser(description='Автоназначение исполнителей на заявки по дням')
+    parser.add_argument('date_from', help='YYYY-MM-DD')
+    parser.add_argument('date_to', nargs='?', help='YYYY-MM-DD, по умолчанию равна date_from')
+    parser.add_argument('--dry-run', action='store_true', help='показать решение без записи')
+    args = parser.parse_args()
+
+    first = date.fromisoformat(args.date_from)
+    last = date.fromisoformat(args.date_to) if args.date_to else first
+    connection = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        for ordinal in range(first.toordinal(), last.toordinal() + 1):
+            report = auto_assign(connection, date.fromordinal(ordinal), args.dry_run)
+            report.pop('load_minutes')
+            report.pop('assignments')
+            print(json.dumps(report, ensure_ascii=False))
+    finally:
+        connection.close()
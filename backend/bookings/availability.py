@@ -0,0 +1,159 @@
+'''
+Business: Свободное время для записи - ёмкость исполнителей по дням из битовых масок занятости (V0014)
+Args: cursor - RealDictCursor; date_from, days, area, service_type; AVAILABILITY_CHECK, SCHEDULE_CACHE_TTL из окружения
+Returns: fetch_availability() - по каждому дню времена начала со свободными исполнителями;
+         check_slot() - причина отказа для выбранного клиентом времени или None
+'''
+
+import os
+import time
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional
+from queries import register, execute
+
+AVAILABILITY_CHECK = os.environ.get('AVAILABILITY_CHECK', 'on') != 'off'
+SCHEDULE_CACHE_TTL = float(os.environ.get('SCHEDULE_CACHE_TTL', '300'))
+AVAILABILITY_MAX_DAYS = 60
+
+register(
+    'schedule_settings',
+    "SELECT EXTRACT(HOUR FROM day_start)::integer * 60 + EXTRACT(MINUTE FROM day_start)::integer AS day_start, "
+    "slot_minutes, slots_per_day "
+    "FROM t_p89410065_cleaning_service_web.schedule_settings WHERE id"
+)
+register(
+    'service_durations',
+    "SELECT service_type, base_minutes, minutes_per_m2::float8 AS minutes_per_m2 "
+    "FROM t_p89410065_cleaning_service_web.service_durations"
+)
+register(
+    'schedule_cleaners',
+    "SELECT id FROM t_p89410065_cleaning_service_web.users WHERE role = 'operator' ORDER BY id"
+)
+register(
+    'occupancy_range',
+    "SELECT day, assignee_id, busy FROM t_p89410065_cleaning_service_web.cleaner_occupancy "
+    "WHERE day BETWEEN %s::date AND %s::date AND busy <> 0"
+)
+register(
+    'demand_range',
+    "SELECT day, counts FROM t_p89410065_cleaning_service_web.slot_demand "
+    "WHERE day BETWEEN %s::date AND %s::date"
+)
+
+_schedule_cache: Dict[str, Any] = {'expires': 0.0, 'settings': None, 'durations': {}}
+
+
+def load_schedule(cursor: Any) -> Dict[str, Any]:
+    '''Параметры рабочего дня и длительности услуг; меняются редко, поэтому кэшируются на экземпляр'''
+    now = time.monotonic()
+    if _schedule_cache['settings'] is None or now >= _schedule_cache['expires']:
+        execute(cursor, 'schedule_settings', ())
+        settings = dict(cursor.fetchone())
+        execute(cursor, 'service_durations', ())
+        durations = {row['service_type']: (row['base_minutes'], row['minutes_per_m2']) for row in cursor.fetchall()}
+        _schedule_cache.update({'settings': settings, 'durations': durations, 'expires': now + SCHEDULE_CACHE_TTL})
+    return _schedule_cache
+
+
+def job_slots(schedule: Dict[str, Any], area: int, service_type: str) -> int:
+    '''Число слотов работы - та же формула, что booking_slot_mask() в V0014'''
+    settings = schedule['settings']
+    durations = schedule['durations']
+    base_minutes, minutes_per_m2 = durations.get(service_type) or durations.get('*') or (60, 1.5)
+    # округление убирает хвосты float (1.2 * 25 = 30.000000000000004), в SQL здесь точный numeric
+    minutes = round(base_minutes + minutes_per_m2 * max(area, 0), 6)
+    slots = -(-minutes // settings['slot_minutes'])
+    return int(min(max(slots, 1), settings['slots_per_day']))
+
+
+def slot_time(settings: Dict[str, Any], slot: int) -> str:
+    minutes = settings['day_start'] + slot * settings['slot_minutes']
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def free_by_start(cleaners: List[int], busy: Dict[int, int], demand: Optional[List[int]],
+                  length: int, slots: int) -> List[int]:
+    '''
+    Свободные исполнители для каждого начала работы длиной length слотов. Исполнитель свободен, если его маска
+    не пересекается с окном; неназначенные заявки, попадающие в окно, тоже займут кого-то из свободных.
+    '''
+    window = (1 << length) - 1
+    busy_masks = [busy[cleaner] for cleaner in cleaners if busy.get(cleaner)]
+    idle = len(cleaners) - len(busy_masks)
+    result = []
+    for start in range(slots - length + 1):
+        mask = window << start
+        free = idle + sum(1 for value in busy_masks if not value & mask)
+        if demand:
+            free -= max(demand[start:start + length])
+        result.append(free)
+    return result
+
+
+def fetch_availability(cursor: Any, date_from: date, days: int, area: int, service_type: str) -> Dict[str, Any]:
+    schedule = load_schedule(cursor)
+    settings = schedule['settings']
+    length = job_slots(schedule, area, service_type)
+    date_to = date_from + timedelta(days=days - 1)
+
+    execute(cursor, 'schedule_cleaners', ())
+    cleaners = [row['id'] for row in cursor.fetchall()]
+    busy: Dict[date, Dict[int, int]] = {}
+    execute(cursor, 'occupancy_range', (date_from, date_to))
+    for row in cursor.fetchall():
+        busy.setdefault(row['day'], {})[row['assignee_id']] = row['busy']
+    execute(cursor, 'demand_range', (date_from, date_to))
+    demand = {row['day']: row['counts'] for row in cursor.fetchall()}
+
+    result_days = []
+    for offset in range(days):
+        day = date_from + timedelta(days=offset)
+        free = free_by_start(cleaners, busy.get(day, {}), demand.get(day), length, settings['slots_per_day'])
+        result_days.append({
+            'date': day.isoformat(),
+            'slots': [{'time': slot_time(settings, start), 'free': count} for start, count in enumerate(free) if count > 0]
+        })
+
+    return {
+        'slot_minutes': settings['slot_minutes'],
+        'duration_minutes': length * settings['slot_minutes'],
+        'capacity': len(cleaners),
+        'days': result_days
+    }
+
+
+def check_slot(cursor: Any, booking_date: str, booking_time: str, area: int, service_type: str) -> Optional[str]:
+    '''
+    Проверка времени новой заявки; без исполнителей-операторов модель ёмкости не применяется.
+    Берёт блокировку дня до конца транзакции: проверка и INSERT вызывающего идут без гонки
+    с параллельными заявками на тот же день
+    '''
+    day = date.fromisoformat(booking_date)
+    hours, minutes = booking_time.split(':')[:2]
+    requested = int(hours) * 60 + int(minutes)
+    if not AVAILABILITY_CHECK:
+        return None
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('bookings_slot'), %s)", (day.toordinal(),))
+
+    schedule = load_schedule(cursor)
+    settings = schedule['settings']
+    execute(cursor, 'schedule_cleaners', ())
+    cleaners = [row['id'] for row in cursor.fetchall()]
+    if not cleaners:
+        return None
+
+    length = job_slots(schedule, area, service_type)
+    offset = requested - settings['day_start']
+    start = offset // settings['slot_minutes']
+    if offset < 0 or start + length > settings['slots_per_day']:
+        return 'Selected time is outside working hours'
+
+    execute(cursor, 'occupancy_range', (day, day))
+    busy = {row['assignee_id']: row['busy'] for row in cursor.fetchall()}
+    execute(cursor, 'demand_range', (day, day))
+    row = cursor.fetchone()
+    free = free_by_start(cleaners, busy, row['counts'] if row else None, length, settings['slots_per_day'])
+    if free[start] <= 0:
+        return 'Selected time slot is not available'
+    return None
@@ -0,0 +1,135 @@
+'''
+Business: Пакетные изменения заявок диспетчером - статусы, назначения и удаления одним запросом к БД
+Args: conn - соединение psycopg2, operations - список {id, status?, assignee_id?, delete?}, atomic - всё или ничего
+Returns: результат по каждой операции и итоговые счётчики
+'''
+
+from typing import Dict, Any, List, Optional, Tuple
+from psycopg2.extras import execute_values
+
+BATCH_MAX_ITEMS = 500
+
+BOOKING_STATUSES = ['new', 'assigned', 'in-progress', 'completed', 'cancelled']
+
+# один оператор: CTE с VALUES, UPDATE ... FROM и DELETE, затем итог по каждой строке
+BATCH_QUERY = (
+    "WITH v (id, op, status, set_assignee, assignee_id) AS (VALUES %s), "
+    "upd AS ("
+    "  UPDATE t_p89410065_cleaning_service_web.bookings b SET "
+    "    status = COALESCE(v.status, CASE WHEN v.set_assignee AND v.assignee_id IS NOT NULL "
+    "                                     THEN 'assigned' ELSE b.status END), "
+    "    assignee_id = CASE WHEN v.set_assignee THEN v.assignee_id ELSE b.assignee_id END, "
+    "    updated_at = CURRENT_TIMESTAMP "
+    "  FROM v WHERE v.op = 'update' AND b.id = v.id {scope} "
+    "  AND (v.assignee_id IS NULL OR EXISTS ("
+    "    SELECT 1 FROM t_p89410065_cleaning_service_web.users u WHERE u.id = v.assignee_id)) "
+    "  RETURNING b.id"
+    "), "
+    "del AS ("
+    "  DELETE FROM t_p89410065_cleaning_service_web.bookings b USING v "
+    "  WHERE v.op = 'delete' AND b.id = v.id {scope} "
+    "  RETURNING b.id"
+    ") "
+    "SELECT v.id, CASE "
+    "  WHEN upd.id IS NOT NULL THEN 'updated' "
+    "  WHEN del.id IS NOT NULL THEN 'deleted' "
+    "  WHEN NOT EXISTS (SELECT 1 FROM t_p89410065_cleaning_service_web.bookings b "
+    "                   WHERE b.id = v.id {scope}) THEN 'not_found' "
+    "  ELSE 'unknown_assignee' END "
+    "FROM v LEFT JOIN upd ON upd.id = v.id LEFT JOIN del ON del.id = v.id"
+)
+
+BATCH_ERRORS = {
+    'not_found': 'Booking not found',
+    'unknown_assignee': 'Assignee not found',
+}
+
+
+def parse_operation(item: Any, seen: set) -> Tuple[Optional[tuple], Optional[str]]:
+    '''Проверка одной операции; возвращает строку VALUES или текст ошибки'''
+    if not isinstance(item, dict):
+        return None, 'Operation must be an object'
+    try:
+        booking_id = int(item.get('id'))
+    except (TypeError, ValueError):
+        return None, 'Booking ID is required'
+    if booking_id in seen:
+        return None, 'Duplicate booking ID in batch'
+    seen.add(booking_id)
+
+    if item.get('delete'):
+        return (booking_id, 'delete', None, False, None), None
+
+    status = item.get('status') or None
+    if status is not None and status not in BOOKING_STATUSES:
+        return None, 'Unknown status: ' + str(status)
+    set_assignee = 'assignee_id' in item
+    assignee_id = None
+    if set_assignee and item['assignee_id'] not in (None, ''):
+        try:
+            assignee_id = int(item['assignee_id'])
+        except (TypeError, ValueError):
+            return None, 'Invalid assignee_id'
+    if status is None and not set_assignee:
+        return None, 'No fields to update'
+    return (booking_id, 'update', status, set_assignee, assignee_id), None
+
+
+def apply_batch(conn: Any, operations: List[Any], user_id: Optional[str], user_role: Optional[str],
+                atomic: bool = False) -> Dict[str, Any]:
+    '''Применяет операции одной транзакцией; операторы меняют только свои заявки'''
+    results: List[Dict[str, Any]] = []
+    rows: List[tuple] = []
+    seen: set = set()
+    for index, item in enumerate(operations):
+        row, error = parse_operation(item, seen)
+        entry: Dict[str, Any] = {'index': index, 'id': item.get('id') if isinstance(item, dict) else None}
+        if error:
+            entry.update(result='error', error=error)
+        else:
+            rows.append(row)
+        results.append(entry)
+
+    outcome: Dict[int, str] = {}
+    invalid = any(entry.get('result') == 'error' for entry in results)
+    if rows and not (atomic and invalid):
+        scope = ''
+        if user_id and user_role not in ['super_admin', 'admin']:
+            scope = 'AND b.assignee_id = ' + str(int(user_id))
+        with conn.cursor() as cursor:
+            outcome = dict(execute_values(
+                cursor,
+                BATCH_QUERY.format(scope=scope),
+                rows,
+                template='(%s::integer, %s::text, %s::varchar, %s::boolean, %s::integer)',
+                page_size=len(rows),
+                fetch=True
+            ))
+
+    for entry in results:
+        if entry.get('result'):
+            continue
+        booking_id = int(entry['id'])
+        result = outcome.get(booking_id, 'skipped')
+        if result in BATCH_ERRORS:
+            entry.update(result='error', error=BATCH_ERRORS[result])
+        else:
+            entry['result'] = result
+        entry['id'] = booking_id
+
+    failed = sum(1 for entry in results if entry['result'] == 'error')
+    if atomic and failed:
+        conn.rollback()
+        for entry in results:
+            if entry['result'] in ['updated', 'deleted']:
+                entry['result'] = 'rolled_back'
+    else:
+        conn.commit()
+
+    return {
+        'results': results,
+        'updated': sum(1 for entry in results if entry['result'] == 'updated'),
+        'deleted': sum(1 for entry in results if entry['result'] == 'deleted'),
+        'failed': failed,
+        'atomic': atomic
+    }
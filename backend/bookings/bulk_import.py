@@ -0,0 +1,323 @@
+'''
+Business: Массовый импорт заявок партнёров из CSV/JSONL через COPY FROM STDIN во временную таблицу
+Args: conn - соединение psycopg2, lines - итератор строк файла, fmt - csv или jsonl, dry_run - без фиксации
+Returns: отчёт с количеством принятых, импортированных строк и ошибками по номерам записей
+'''
+
+import csv
+import io
+import json
+import re
+from datetime import date
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+MAX_REPORTED_ERRORS = 1000
+
+DATE_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+TIME_RE = re.compile(r'^([01]\d|2[0-3]):[0-5]\d(:[0-5]\d)?$')
+
+FIELD_ALIASES = {
+    'name': 'name',
+    'phone': 'phone',
+    'email': 'email',
+    'address': 'address',
+    'area': 'area',
+    'service_type': 'service_type',
+    'serviceType': 'service_type',
+    'comment': 'comment',
+    'booking_date': 'booking_date',
+    'date': 'booking_date',
+    'booking_time': 'booking_time',
+    'time': 'booking_time',
+}
+
+# длины VARCHAR в bookings: длинное значение отклоняется строкой отчёта, а не падением INSERT всего файла
+COLUMN_LIMITS = {'name': 255, 'phone': 50, 'email': 255, 'service_type': 100}
+
+STAGING_COLUMNS = [
+    'line_no', 'name', 'phone', 'email', 'address', 'area',
+    'service_type', 'comment', 'booking_date', 'booking_time', 'parse_error'
+]
+
+
+class CopyStream:
+    '''Файлоподобная обёртка над генератором строк для cursor.copy_expert'''
+
+    def __init__(self, chunks: Iterator[str]) -> None:
+        self._chunks = chunks
+        self._buffer = ''
+        self._offset = 0
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) - self._offset < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer = self._buffer[self._offset:] + chunk
+            self._offset = 0
+        end = len(self._buffer) if size < 0 else self._offset + size
+        data = self._buffer[self._offset:end]
+        self._offset = min(end, len(self._buffer))
+        return data
+
+
+def strip_bom(lines: Iterable[str]) -> Iterator[str]:
+    '''Убирает UTF-8 BOM в начале файла - иначе он прилипает к имени первой колонки'''
+    first = True
+    for line in lines:
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+
+def csv_records(reader: csv.DictReader) -> Iterator[Dict[str, Any]]:
+    '''Записи CSV; запись, которую csv не смог разобрать (NUL, кавычки), становится ошибкой строки'''
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            record = {'__error__': f'invalid CSV: {e}'}
+        yield record
+
+
+def jsonl_records(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = {'__error__': 'invalid JSON'}
+        if not isinstance(record, dict):
+            record = {'__error__': 'JSON object expected'}
+        yield record
+
+
+def parse_records(lines: Iterable[str], fmt: str) -> Iterator[Dict[str, Any]]:
+    '''
+    Построчно разбирает CSV (с заголовком) или JSONL в словари с исходными ключами.
+    Заголовок CSV читается сразу: неразборчивый заголовок - ValueError на весь файл
+    '''
+    if fmt == 'csv':
+        reader = csv.DictReader(strip_bom(lines))
+        try:
+            if not reader.fieldnames:
+                raise ValueError('CSV header is missing')
+        except csv.Error as e:
+            raise ValueError(f'Invalid CSV header: {e}')
+        return csv_records(reader)
+    elif fmt == 'jsonl':
+        return jsonl_records(strip_bom(lines))
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    '''Приводит ключи к колонкам bookings и проверяет форматы area/date/time'''
+    row: Dict[str, Any] = {column: None for column in STAGING_COLUMNS}
+    for key, value in record.items():
+        column = FIELD_ALIASES.get(key)
+        if column and value is not None:
+            row[column] = str(value).strip()
+
+    if record.get('__error__'):
+        row['parse_error'] = record['__error__']
+        return row
+    # NUL не пропускает COPY - вся строка файла отклоняется ещё до загрузки
+    if any(value and '\x00' in value for value in row.values()):
+        row.update({column: None for column in STAGING_COLUMNS})
+        row['parse_error'] = 'NUL character is not allowed'
+        return row
+    for column, limit in COLUMN_LIMITS.items():
+        if row[column] and len(row[column]) > limit:
+            row['parse_error'] = f'{column} must be at most {limit} characters'
+            return row
+    try:
+        if row['area'] and not 0 < int(row['area']) < 1000000:
+            raise ValueError
+    except ValueError:
+        row['parse_error'] = 'area must be a positive integer'
+        return row
+    if row['booking_date']:
+        match = DATE_RE.match(row['booking_date'])
+        try:
+            if not match:
+                raise ValueError
+            date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            row['parse_error'] = 'booking_date must be YYYY-MM-DD'
+            return row
+    if row['booking_time'] and not TIME_RE.match(row['booking_time']):
+        row['parse_error'] = 'booking_time must be HH:MM'
+    return row
+
+
+def staging_csv(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    '''Генерирует CSV для COPY: номер строки файла + нормализованные поля'''
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for line_no, record in enumerate(records, start=1):
+        row = normalize_record(record)
+        row['line_no'] = line_no
+        writer.writerow(['' if row[c] is None else row[c] for c in STAGING_COLUMNS])
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def import_bookings(conn: Any, lines: Iterable[str], fmt: str = 'csv', dry_run: bool = False) -> Dict[str, Any]:
+    '''Импорт одной транзакцией: COPY в staging, проверка и дедупликация SQL-запросами, INSERT ... SELECT'''
+    records = parse_records(lines, fmt)
+    with conn.cursor() as cursor:
+        # построчные NOTIFY заменяются одним сводным событием в конце импорта
+        cursor.execute("SET LOCAL bookings.notify = 'off'")
+        # построчное обновление занятости (V0014) тоже выключено - затронутые дни пересчитываются в конце
+        cursor.execute("SET LOCAL bookings.bulk = 'on'")
+        cursor.execute(
+            "CREATE TEMP TABLE bookings_import_staging ("
+            "line_no INTEGER PRIMARY KEY, name TEXT, phone TEXT, email TEXT, address TEXT, area TEXT, "
+            "service_type TEXT, comment TEXT, booking_date TEXT, booking_time TEXT, parse_error TEXT"
+            ") ON COMMIT DROP"
+        )
+        cursor.execute(
+            "CREATE TEMP TABLE bookings_import_errors (line_no INTEGER, error TEXT) ON COMMIT DROP"
+        )
+        cursor.copy_expert(
+            "COPY bookings_import_staging (" + ", ".join(STAGING_COLUMNS) + ") "
+            "FROM STDIN WITH (FORMAT csv, NULL '')",
+            CopyStream(staging_csv(records))
+        )
+        cursor.execute("SELECT COUNT(*) FROM bookings_import_staging")
+        received = cursor.fetchone()[0]
+
+        # обязательные поля и ошибки разбора
+        cursor.execute(
+            "INSERT INTO bookings_import_errors (line_no, error) "
+            "SELECT line_no, COALESCE(parse_error, CASE "
+            "  WHEN name IS NULL THEN 'name is required' "
+            "  WHEN phone IS NULL THEN 'phone is required' "
+            "  WHEN email IS NULL THEN 'email is required' "
+            "  WHEN address IS NULL THEN 'address is required' "
+            "  WHEN area IS NULL THEN 'area is required' "
+            "  WHEN service_type IS NULL THEN 'service_type is required' "
+            "  WHEN booking_date IS NULL THEN 'booking_date is required' "
+            "  WHEN booking_time IS NULL THEN 'booking_time is required' "
+            "END) "
+            "FROM bookings_import_staging "
+            "WHERE parse_error IS NOT NULL OR name IS NULL OR phone IS NULL OR email IS NULL "
+            "OR address IS NULL OR area IS NULL OR service_type IS NULL "
+            "OR booking_date IS NULL OR booking_time IS NULL"
+        )
+        cursor.execute(
+            "DELETE FROM bookings_import_staging s USING bookings_import_errors e WHERE s.line_no = e.line_no"
+        )
+
+        # дубликаты внутри файла: остаётся первая строка
+        cursor.execute(
+            "WITH ranked AS ("
+            "  SELECT line_no, FIRST_VALUE(line_no) OVER w AS first_line, ROW_NUMBER() OVER w AS rn "
+            "  FROM bookings_import_staging "
+            "  WINDOW w AS (PARTITION BY lower(email), regexp_replace(phone, '[^0-9]', '', 'g'), "
+            "               booking_date, booking_time ORDER BY line_no)"
+            ") "
+            "INSERT INTO bookings_import_errors (line_no, error) "
+            "SELECT line_no, 'duplicate of row ' || first_line FROM ranked WHERE rn > 1"
+        )
+        # уже существующие заявки с тем же клиентом и временем
+        cursor.execute(
+            "INSERT INTO bookings_import_errors (line_no, error) "
+            "SELECT s.line_no, 'already exists as booking #' || MIN(b.id) "
+            "FROM bookings_import_staging s "
+            "JOIN t_p89410065_cleaning_service_web.bookings b "
+            "  ON b.booking_date = s.booking_date::date AND b.booking_time = s.booking_time::time "
+            "  AND lower(b.email) = lower(s.email) "
+            "  AND b.phone_digits = regexp_replace(s.phone, '[^0-9]', '', 'g') "
+            "WHERE NOT EXISTS (SELECT 1 FROM bookings_import_errors e WHERE e.line_no = s.line_no) "
+            "GROUP BY s.line_no"
+        )
+        cursor.execute(
+            "DELETE FROM bookings_import_staging s USING bookings_import_errors e WHERE s.line_no = e.line_no"
+        )
+
+        # блокировки дней, как у check_slot: параллельная запись на эти дни ждёт пересчёта занятости
+        cursor.execute("SELECT DISTINCT booking_date::date FROM bookings_import_staging ORDER BY 1")
+        days = [row[0] for row in cursor.fetchall()]
+        for day in days:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('bookings_slot'), %s)", (day.toordinal(),))
+
+        cursor.execute(
+            "INSERT INTO t_p89410065_cleaning_service_web.bookings "
+            "(name, phone, email, address, area, service_type, comment, status, booking_date, booking_time) "
+            "SELECT name, phone, email, address, area::integer, service_type, COALESCE(comment, ''), 'new', "
+            "booking_date::date, booking_time::time "
+            "FROM bookings_import_staging ORDER BY line_no"
+        )
+        imported = cursor.rowcount
+        if imported:
+            cursor.execute("SELECT t_p89410065_cleaning_service_web.occupancy_rebuild_days(%s::date[])", (days,))
+        if imported and not dry_run:
+            cursor.execute(
+                "SELECT pg_notify('bookings_changes', json_build_object('op', 'IMPORT', 'count', %s)::text)",
+                (imported,)
+            )
+
+        cursor.execute("SELECT COUNT(*) FROM bookings_import_errors")
+        error_count = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT line_no, error FROM bookings_import_errors ORDER BY line_no LIMIT %s",
+            (MAX_REPORTED_ERRORS,)
+        )
+        errors: List[Dict[str, Any]] = [{'row': line_no, 'error': error} for line_no, error in cursor.fetchall()]
+
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+
+    return {
+        'received': received,
+        'imported': 0 if dry_run else imported,
+        'valid': imported,
+        'error_count': error_count,
+        'errors': errors,
+        'dry_run': dry_run
+    }
+
+
+def detect_format(filename: str, explicit: Optional[str] = None) -> str:
+    if explicit:
+        return explicit
+    return 'jsonl' if filename.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import sys
+    import time
+    import psycopg2
+
+    parser = argparse.ArgumentParser(description='Импорт заявок из CSV/JSONL')
+    parser.add_argument('path', help='файл или - для stdin')
+    parser.add_argument('--format', choices=['csv', 'jsonl'])
+    parser.add_argument('--dry-run', action='store_true', help='проверить файл без записи')
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    connection = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        if args.path == '-':
+            report = import_bookings(connection, sys.stdin, detect_format('', args.format), args.dry_run)
+        else:
+            with open(args.path, encoding='utf-8', newline='') as source:
+                report = import_bookings(connection, source, detect_format(args.path, args.format), args.dry_run)
+    finally:
+        connection.close()
+    report['seconds'] = round(time.monotonic() - started, 3)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,99 @@
+'''
+Business: Сжатие ответов по Accept-Encoding - brotli или gzip для тел больше порога, base64 как требует платформа
+Args: @compress_responses над handler; RESPONSE_COMPRESSION (on/off), COMPRESS_MIN_BYTES, COMPRESS_GZIP_LEVEL,
+      COMPRESS_BROTLI_QUALITY из окружения
+Returns: ответ с Content-Encoding, Vary: Accept-Encoding и isBase64Encoded=True либо исходный ответ без изменений
+'''
+
+import base64
+import functools
+import gzip
+import os
+from typing import Callable, Dict, Any, Optional
+from metrics import phase
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get('RESPONSE_COMPRESSION', 'on') != 'off'
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+# для динамических ответов 4-5 - разумный компромисс; 11 в десятки раз дороже по CPU
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', '4'))
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    '''br или gzip по заголовку Accept-Encoding с учётом q-значений; при равенстве предпочитается br'''
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+    wildcard = weights.get('*', 0.0)
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best: Optional[str] = None
+    best_quality = 0.0
+    for name in candidates:
+        quality = weights.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress_body(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    # mtime=0 - одинаковый вывод для одинакового тела
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def header(headers: Dict[str, Any], name: str) -> str:
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return value or ''
+    return ''
+
+
+def compress_response(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    body = response.get('body')
+    if (
+        not COMPRESSION_ENABLED
+        or response.get('isBase64Encoded')
+        or not isinstance(body, str)
+        or len(body) < COMPRESS_MIN_BYTES
+        or header(response.get('headers') or {}, 'Content-Encoding')
+    ):
+        return response
+    encoding = choose_encoding(header(event.get('headers') or {}, 'Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    with phase('compress', encoding):
+        data = body.encode('utf-8')
+        compressed = compress_body(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+        encoded = base64.b64encode(compressed).decode('ascii')
+    # заголовки ответа могут быть общими константами модуля - собирается новый словарь
+    headers = dict(response.get('headers') or {})
+    headers['Content-Encoding'] = encoding
+    headers['Vary'] = 'Accept-Encoding'
+    return {**response, 'headers': headers, 'body': encoded, 'isBase64Encoded': True}
+
+
+def compress_responses(handler: Callable) -> Callable:
+    '''Декоратор handler: сжимает ответ, если клиент это поддерживает и тело достаточно велико'''
+    @functools.wraps(handler)
+    def wrapped(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        return compress_response(event, handler(event, context))
+    return wrapped
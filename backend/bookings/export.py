@@ -0,0 +1,124 @@
+'''
+Business: Потоковая выгрузка заявок в CSV/JSONL (опционально gzip) через серверный курсор
+Args: conn - соединение psycopg2, conditions/values - фильтры списка, fmt - csv или jsonl
+Returns: итератор байтовых чанков; память не зависит от числа строк
+'''
+
+import csv
+import io
+import json
+import os
+import zlib
+from typing import Any, Iterable, Iterator, List
+
+EXPORT_ITERSIZE = int(os.environ.get('EXPORT_ITERSIZE', '2000'))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_COLUMNS = [
+    'id', 'created_at', 'status', 'name', 'phone', 'email', 'address', 'area',
+    'service_type', 'booking_date', 'booking_time', 'assignee_id', 'assignee_name', 'comment'
+]
+
+EXPORT_QUERY = (
+    "SELECT b.id, TO_CHAR(b.created_at, 'YYYY-MM-DD HH24:MI:SS'), b.status, b.name, b.phone, b.email, "
+    "b.address, b.area, b.service_type, TO_CHAR(b.booking_date, 'YYYY-MM-DD'), "
+    "TO_CHAR(b.booking_time, 'HH24:MI'), b.assignee_id, u.full_name, b.comment "
+    "FROM t_p89410065_cleaning_service_web.bookings b "
+    "LEFT JOIN t_p89410065_cleaning_service_web.users u ON b.assignee_id = u.id "
+)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def iter_rows(conn: Any, conditions: List[str], values: List[Any]) -> Iterator[tuple]:
+    '''Строки из именованного (серверного) курсора пачками по EXPORT_ITERSIZE'''
+    query = EXPORT_QUERY
+    if conditions:
+        query += "WHERE " + " AND ".join(conditions) + " "
+    query += "ORDER BY b.created_at DESC, b.id DESC"
+
+    cursor = conn.cursor(name='bookings_export')
+    cursor.itersize = EXPORT_ITERSIZE
+    try:
+        cursor.execute(query, values)
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+        conn.rollback()
+
+
+def iter_csv(rows: Iterable[tuple]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM, чтобы Excel открывал кириллицу без перекодировки
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def iter_jsonl(rows: Iterable[tuple]) -> Iterator[bytes]:
+    parts: List[str] = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n'
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield ''.join(parts).encode('utf-8')
+            parts = []
+            size = 0
+    yield ''.join(parts).encode('utf-8')
+
+
+def iter_gzip(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(conn: Any, conditions: List[str], values: List[Any],
+                fmt: str = 'csv', gzip: bool = False) -> Iterator[bytes]:
+    '''Собирает конвейер: серверный курсор -> CSV/JSONL -> gzip'''
+    rows = iter_rows(conn, conditions, values)
+    chunks = iter_csv(rows) if fmt == 'csv' else iter_jsonl(rows)
+    return iter_gzip(chunks) if gzip else chunks
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import psycopg2
+    from index import build_list_filters
+
+    parser = argparse.ArgumentParser(description='Выгрузка заявок в CSV/JSONL')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--output', default='-', help='файл или - для stdout')
+    for name in ['status', 'assignee_id', 'service_type', 'date_from', 'date_to']:
+        parser.add_argument('--' + name.replace('_', '-'), dest=name)
+    args = parser.parse_args()
+
+    filters = {k: v for k, v in vars(args).items() if v and k not in ['format', 'gzip', 'output']}
+    conditions, values = build_list_filters(filters, None, None)
+    connection = psycopg2.connect(os.environ['DATABASE_URL'])
+    target = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        for chunk in iter_export(connection, conditions, values, args.format, args.gzip):
+            target.write(chunk)
+    finally:
+        if target is not sys.stdout.buffer:
+            target.close()
+        connection.close()
@@ -0,0 +1,44 @@
+'''
+Business: Быстрая сериализация списков - JSON-массив собирает сам Postgres (json_agg), иначе orjson, иначе json
+Args: BOOKINGS_LIST_JSON=db|python из окружения; json_page_query() оборачивает SQL страницы, dumps() - кодировщик
+Returns: текст JSON, который уходит в body без повторного разбора и кодирования в Python
+'''
+
+import json
+import os
+from typing import Any, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LIST_JSON_MODE = os.environ.get('BOOKINGS_LIST_JSON', 'python')
+
+ENCODER = 'orjson' if orjson is not None else 'json'
+
+
+def dumps(obj: Any) -> str:
+    '''orjson, если установлен (в разы быстрее на списках словарей), иначе стандартный json.dumps'''
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj)
+
+
+def json_page_query(page_query: str, order_by: str, hidden: List[str]) -> str:
+    '''
+    Оборачивает запрос страницы (с LIMIT limit + 1 или без него): строки нумеруются в порядке order_by,
+    первые limit собираются в JSON-массив без служебных колонок hidden, строка с номером limit
+    возвращается целиком для курсора следующей страницы. Параметры: page_query..., limit, limit;
+    limit = NULL - все строки.
+    '''
+    removed = ', '.join(f"'{column}'" for column in hidden + ['n'])
+    return (
+        "WITH page AS (" + page_query + "), "
+        "ranked AS (SELECT p.*, row_number() OVER (ORDER BY " + order_by + ") AS n FROM page p) "
+        "SELECT COALESCE(json_agg(to_jsonb(r) - ARRAY[" + removed + "] ORDER BY r.n) "
+        "FILTER (WHERE r.n <= COALESCE(%s::bigint, r.n)), '[]')::text AS items, "
+        "(json_agg(row_to_json(r)) FILTER (WHERE r.n = %s::bigint)) -> 0 AS last_row, "
+        "COUNT(*) AS fetched "
+        "FROM ranked r"
+    )
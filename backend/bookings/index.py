@@ -1,108 +1,265 @@
 import json
 import os
-from typing import Dict, Any, List
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import urllib.request
-import urllib.parse
-
-def send_notification_email(booking_data: Dict[str, Any]) -> None:
-    '''Отправка email уведомления администратору о новой заявке'''
-    smtp_host = os.environ.get('SMTP_HOST')
-    smtp_port = os.environ.get('SMTP_PORT', '587')
-    smtp_user = os.environ.get('SMTP_USER')
-    smtp_password = os.environ.get('SMTP_PASSWORD')
-    admin_email = os.environ.get('ADMIN_EMAIL')
+import io
+import base64
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from psycopg2.extras import RealDictCursor, Json
+from db import get_pool
+from tokens import request_identity, TokenError
+from queries import register, execute, execute_query
+from fastjson import LIST_JSON_MODE, dumps, json_page_query
+from availability import AVAILABILITY_MAX_DAYS, check_slot, fetch_availability
+from metrics import instrument, phase
+from compression import compress_responses
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+BOOKING_COLUMNS = (
+    "b.id, b.name, b.phone, b.email, b.address, b.area, b.service_type, b.comment, b.status, "
+    "TO_CHAR(b.created_at, 'YYYY-MM-DD HH24:MI') as created_at, "
+    "TO_CHAR(b.booking_date, 'YYYY-MM-DD') as booking_date, "
+    "TO_CHAR(b.booking_time, 'HH24:MI') as booking_time, "
+    "b.assignee_id, u.full_name as assignee_name"
+)
+
+PHONE_QUERY_RE = re.compile(r'^[\d\s()+\-]+$')
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+
+# действия без авторизации: форма записи на сайте
+PUBLIC_ACTIONS = ('availability', 'quote')
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+# неизменяемые ответы собираются один раз на экземпляр, а не на каждый вызов
+OPTIONS_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-User-Id, X-User-Role',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': '',
+    'isBase64Encoded': False
+}
+METHOD_NOT_ALLOWED_RESPONSE = {
+    'statusCode': 405,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'Method not allowed'}),
+    'isBase64Encoded': False
+}
+DATABASE_NOT_CONFIGURED_RESPONSE = {
+    'statusCode': 500,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'DATABASE_URL not configured'}),
+    'isBase64Encoded': False
+}
+
+register(
+    'booking_detail',
+    "SELECT " + BOOKING_COLUMNS + " "
+    "FROM t_p89410065_cleaning_service_web.bookings b "
+    "LEFT JOIN t_p89410065_cleaning_service_web.users u ON b.assignee_id = u.id "
+    "WHERE b.id = %s"
+)
+register(
+    'booking_insert',
+    "INSERT INTO t_p89410065_cleaning_service_web.bookings "
+    "(name, phone, email, address, area, service_type, comment, status, booking_date, booking_time) "
+    "VALUES (%s, %s, %s, %s, %s::integer, %s, %s, 'new', %s::date, %s::time) RETURNING id"
+)
+register(
+    'booking_outbox_insert',
+    "INSERT INTO t_p89410065_cleaning_service_web.notification_outbox (booking_id, channel, payload) "
+    "VALUES (%s, 'email', %s::jsonb), (%s, 'telegram', %s::jsonb)"
+)
+# пустые поля не меняются (NULL), назначение исполнителя без явного статуса переводит заявку в assigned
+register(
+    'booking_update',
+    "UPDATE t_p89410065_cleaning_service_web.bookings SET "
+    "status = COALESCE(%s::varchar, CASE WHEN %s::boolean AND %s::integer IS NOT NULL THEN 'assigned' END, status), "
+    "assignee_id = CASE WHEN %s::boolean THEN %s::integer ELSE assignee_id END, "
+    "name = COALESCE(%s::varchar, name), "
+    "phone = COALESCE(%s::varchar, phone), "
+    "email = COALESCE(%s::varchar, email), "
+    "address = COALESCE(%s::text, address), "
+    "area = COALESCE(%s::integer, area), "
+    "service_type = COALESCE(%s::varchar, service_type), "
+    "comment = COALESCE(%s::text, comment), "
+    "booking_date = COALESCE(%s::date, booking_date), "
+    "booking_time = COALESCE(%s::time, booking_time), "
+    "updated_at = CURRENT_TIMESTAMP "
+    "WHERE id = %s"
+)
+register('booking_delete', "DELETE FROM t_p89410065_cleaning_service_web.bookings WHERE id = %s")
+
+def encode_cursor(created_at: str, booking_id: int, rank: Optional[float] = None) -> str:
+    '''Курсор keyset-пагинации: позиция (rank, created_at, id) последней строки страницы'''
+    parts = [created_at, str(booking_id)]
+    if rank is not None:
+        parts.append(repr(rank))
+    raw = '|'.join(parts).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token: str) -> Tuple[str, int, Optional[float]]:
+    padded = token + '=' * (-len(token) % 4)
+    parts = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|')
+    if len(parts) not in (2, 3):
+        raise ValueError('Malformed cursor')
+    # ValueError на неразборчивой метке времени, а не DataError от Postgres
+    datetime.fromisoformat(parts[0])
+    rank = float(parts[2]) if len(parts) == 3 else None
+    return parts[0], int(parts[1]), rank
+
+def normalize_search(term: str) -> str:
+    '''Приводит запрос к виду search_text: нижний регистр, телефон - только цифры'''
+    term = term.strip().lower()
+    if PHONE_QUERY_RE.match(term):
+        term = re.sub(r'\D', '', term)
+    return term
+
+def escape_like(term: str) -> str:
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def build_list_filters(params: Dict[str, Any], user_id: Optional[str], user_role: Optional[str]) -> Tuple[List[str], List[Any]]:
+    '''Серверные фильтры списка: status, assignee_id, date_from/date_to, service_type'''
+    conditions: List[str] = []
+    values: List[Any] = []
     
-    if not all([smtp_host, smtp_user, smtp_password, admin_email]):
-        return
+    if user_id and user_role not in ['super_admin', 'admin']:
+        conditions.append("b.assignee_id = %s")
+        values.append(int(user_id))
     
-    msg = MIMEMultipart('alternative')
-    msg['Subject'] = f'Новая заявка на уборку #{booking_data["id"]}'
-    msg['From'] = smtp_user
-    msg['To'] = admin_email
+    if params.get('status'):
+        conditions.append("b.status = %s")
+        values.append(params['status'])
+    if params.get('assignee_id'):
+        if params['assignee_id'] == 'none':
+            conditions.append("b.assignee_id IS NULL")
+        else:
+            conditions.append("b.assignee_id = %s")
+            values.append(int(params['assignee_id']))
+    if params.get('service_type'):
+        conditions.append("b.service_type = %s")
+        values.append(params['service_type'])
+    if params.get('date_from'):
+        conditions.append("b.booking_date >= %s")
+        values.append(date.fromisoformat(params['date_from']))
+    if params.get('date_to'):
+        conditions.append("b.booking_date <= %s")
+        values.append(date.fromisoformat(params['date_to']))
     
-    html_content = f'''
-    <html>
-      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f9f9f9; border-radius: 10px;">
-          <h2 style="color: #00BCD4; border-bottom: 2px solid #00BCD4; padding-bottom: 10px;">
-            Новая заявка на уборку
-          </h2>
-          
-          <div style="background-color: white; padding: 20px; border-radius: 8px; margin-top: 20px;">
-            <p><strong>Номер заявки:</strong> #{booking_data["id"]}</p>
-            <p><strong>Клиент:</strong> {booking_data["name"]}</p>
-            <p><strong>Телефон:</strong> {booking_data["phone"]}</p>
-            <p><strong>Email:</strong> {booking_data["email"]}</p>
-            <p><strong>Адрес:</strong> {booking_data["address"]}</p>
-            <p><strong>Площадь:</strong> {booking_data["area"]} м²</p>
-            <p><strong>Тип услуги:</strong> {booking_data["service_type"]}</p>
-            {f'<p><strong>Желаемая дата:</strong> {booking_data["booking_date"]}</p>' if booking_data.get("booking_date") else ''}
-            {f'<p><strong>Желаемое время:</strong> {booking_data["booking_time"]}</p>' if booking_data.get("booking_time") else ''}
-            {f'<p><strong>Комментарий:</strong> {booking_data["comment"]}</p>' if booking_data.get("comment") else ''}
-          </div>
-          
-          <div style="margin-top: 20px; padding: 15px; background-color: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
-            <p style="margin: 0;">⚠️ Не забудьте связаться с клиентом в ближайшее время!</p>
-          </div>
-        </div>
-      </body>
-    </html>
+    return conditions, values
+
+STATS_DEFAULT_DAYS = 30
+REPORT_DEFAULT_DAYS = 365
+
+def fetch_stats(cursor: Any, date_from: str, date_to: str, assignee_id: Optional[int]) -> Dict[str, Any]:
     '''
+    Статистика для дашборда одним сгруппированным проходом по счётчикам booking_stats:
+    all_time - текущие итоги по статусам и исполнителям за всё время (карточки дашборда),
+    daily - заявки по дням создания только за окно date_from..date_to
+    '''
+    query = (
+        "SELECT s.status, s.assignee_id, u.full_name as assignee_name, "
+        "TO_CHAR(s.day, 'YYYY-MM-DD') as day, "
+        "GROUPING(s.status) as g_status, GROUPING(s.assignee_id) as g_assignee, GROUPING(s.day) as g_day, "
+        "SUM(s.cnt) as cnt "
+        "FROM t_p89410065_cleaning_service_web.booking_stats s "
+        "LEFT JOIN t_p89410065_cleaning_service_web.users u ON s.assignee_id = u.id "
+    )
+    values: List[Any] = []
+    if assignee_id is not None:
+        query += "WHERE s.assignee_id = %s "
+        values.append(assignee_id)
+    query += (
+        "GROUP BY GROUPING SETS ((s.status), (s.assignee_id, u.full_name), (s.day)) "
+        "HAVING SUM(s.cnt) > 0 AND (GROUPING(s.day) = 1 OR s.day BETWEEN %s AND %s) "
+        "ORDER BY s.day, s.assignee_id, s.status"
+    )
+    values.extend([date_from, date_to])
+    execute_query(cursor, query, values, 'stats')
     
-    msg.attach(MIMEText(html_content, 'html'))
-    
-    try:
-        server = smtplib.SMTP(smtp_host, int(smtp_port))
-        server.starttls()
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
-    except Exception as e:
-        pass
-
-def send_telegram_notification(booking_data: Dict[str, Any]) -> None:
-    '''Отправка уведомления в Telegram о новой заявке'''
-    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-    chat_id = os.environ.get('TELEGRAM_CHAT_ID')
-    
-    if not bot_token or not chat_id:
-        return
+    by_status: Dict[str, int] = {}
+    by_assignee: List[Dict[str, Any]] = []
+    by_day: List[Dict[str, Any]] = []
+    for row in cursor.fetchall():
+        count = int(row['cnt'])
+        if row['g_status'] == 0:
+            by_status[row['status']] = count
+        elif row['g_assignee'] == 0:
+            by_assignee.append({
+                'assignee_id': row['assignee_id'] or None,
+                'assignee_name': row['assignee_name'],
+                'count': count
+            })
+        elif row['g_day'] == 0:
+            by_day.append({'date': row['day'], 'count': count})
     
-    message = f'''
-🆕 <b>Новая заявка на уборку #{booking_data["id"]}</b>
-
-👤 <b>Клиент:</b> {booking_data["name"]}
-📞 <b>Телефон:</b> {booking_data["phone"]}
-📧 <b>Email:</b> {booking_data["email"]}
+    return {
+        'all_time': {
+            'total': sum(by_status.values()),
+            'by_status': by_status,
+            'by_assignee': by_assignee
+        },
+        'daily': {
+            'date_from': date_from,
+            'date_to': date_to,
+            'by_day': by_day
+        }
+    }
 
-📍 <b>Адрес:</b> {booking_data["address"]}
-📏 <b>Площадь:</b> {booking_data["area"]} м²
-🧹 <b>Тип услуги:</b> {booking_data["service_type"]}
+SYNC_MAX_ROWS = 1000
+SYNC_OVERLAP_SECONDS = 5
+SYNC_TOMBSTONE_DAYS = 30
 
-📅 <b>Желаемая дата:</b> {booking_data.get("booking_date", "Не указана")}
-🕐 <b>Желаемое время:</b> {booking_data.get("booking_time", "Не указано")}
+register(
+    'sync_head',
+    "SELECT TO_CHAR(CURRENT_TIMESTAMP - make_interval(secs => %s::integer), 'YYYY-MM-DD\"T\"HH24:MI:SS.US') as watermark, "
+    "%s::timestamp < CURRENT_TIMESTAMP - make_interval(days => %s::integer) as expired"
+)
 
-💬 <b>Комментарий:</b> {booking_data.get("comment", "Нет комментария")}
-'''
+def fetch_changes(cursor: Any, since: str, conditions: List[str], values: List[Any],
+                  assignee_id: Optional[int]) -> Dict[str, Any]:
+    '''Заявки, изменённые после since, и надгробия удалённых; watermark с запасом на незакоммиченные транзакции'''
+    execute(cursor, 'sync_head', (SYNC_OVERLAP_SECONDS, since, SYNC_TOMBSTONE_DAYS))
+    head = cursor.fetchone()
+    if head['expired']:
+        return {'items': [], 'deleted': [], 'watermark': head['watermark'], 'full_resync': True}
     
-    try:
-        url = f'https://api.telegram.org/bot{bot_token}/sendMessage'
-        data = {
-            'chat_id': chat_id,
-            'text': message,
-            'parse_mode': 'HTML'
-        }
-        data_encoded = urllib.parse.urlencode(data).encode('utf-8')
-        req = urllib.request.Request(url, data=data_encoded)
-        urllib.request.urlopen(req)
-    except Exception as e:
-        pass
+    execute_query(
+        cursor,
+        "SELECT " + BOOKING_COLUMNS + " "
+        "FROM t_p89410065_cleaning_service_web.bookings b "
+        "LEFT JOIN t_p89410065_cleaning_service_web.users u ON b.assignee_id = u.id "
+        "WHERE " + " AND ".join(conditions + ["b.updated_at > %s::timestamp"]) + " "
+        "ORDER BY b.updated_at, b.id LIMIT %s",
+        values + [since, SYNC_MAX_ROWS + 1],
+        'sync'
+    )
+    items = [dict(b) for b in cursor.fetchall()]
+    if len(items) > SYNC_MAX_ROWS:
+        return {'items': [], 'deleted': [], 'watermark': head['watermark'], 'full_resync': True}
+    
+    tombstone_query = (
+        "SELECT booking_id FROM t_p89410065_cleaning_service_web.booking_tombstones "
+        "WHERE deleted_at > %s::timestamp"
+    )
+    tombstone_values: List[Any] = [since]
+    if assignee_id is not None:
+        tombstone_query += " AND assignee_id = %s"
+        tombstone_values.append(assignee_id)
+    execute_query(cursor, tombstone_query, tombstone_values, 'tombstones')
+    deleted = [row['booking_id'] for row in cursor.fetchall()]
+    
+    return {'items': items, 'deleted': deleted, 'watermark': head['watermark'], 'full_resync': False}
 
+@instrument('bookings')
+@compress_responses
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: API для управления заявками на уборку
@@ -113,91 +270,530 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-User-Role',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return OPTIONS_RESPONSE
     
-    database_url = os.environ.get('DATABASE_URL')
-    if not database_url:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'DATABASE_URL not configured'}),
-            'isBase64Encoded': False
-        }
+    query_params = event.get('queryStringParameters') or {}
+    user_id, user_role = None, None
+    action = query_params.get('action')
+    if (method != 'POST' or action) and action not in PUBLIC_ACTIONS:
+        try:
+            user_id, user_role = request_identity(event.get('headers') or {})
+        except TokenError as e:
+            return {
+                'statusCode': 401,
+                'headers': JSON_HEADERS,
+                'body': json.dumps({'error': str(e)}),
+                'isBase64Encoded': False
+            }
     
-    conn = psycopg2.connect(database_url)
+    if not DATABASE_URL:
+        return DATABASE_NOT_CONFIGURED_RESPONSE
+    
+    pool = get_pool()
+    conn = pool.getconn()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
         if method == 'GET':
-            headers = event.get('headers', {})
-            user_id = headers.get('X-User-Id')
-            user_role = headers.get('X-User-Role')
-            
             path_params = event.get('pathParams', {})
             booking_id = path_params.get('id')
             
+            if query_params.get('action') == 'stats':
+                today = date.today()
+                try:
+                    date_to = date.fromisoformat(query_params.get('date_to') or today.isoformat())
+                    date_from = date.fromisoformat(
+                        query_params.get('date_from') or (date_to - timedelta(days=STATS_DEFAULT_DAYS - 1)).isoformat()
+                    )
+                except ValueError:
+                    return {
+                        'statusCode': 400,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'Invalid date range'}),
+                        'isBase64Encoded': False
+                    }
+                assignee_filter = int(user_id) if user_id and user_role not in ['super_admin', 'admin'] else None
+                stats = fetch_stats(cursor, date_from.isoformat(), date_to.isoformat(), assignee_filter)
+                return {
+                    'statusCode': 200,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps(stats),
+                    'isBase64Encoded': False
+                }
+            
+            if query_params.get('action') == 'report':
+                from reports import fetch_report
+                if user_role not in ['super_admin', 'admin', 'manager']:
+                    return {
+                        'statusCode': 403,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'Reports are available to administrators only'}),
+                        'isBase64Encoded': False
+                    }
+                try:
+                    date_to = date.fromisoformat(query_params.get('date_to') or date.today().isoformat())
+                    date_from = date.fromisoformat(
+                        query_params.get('date_from') or (date_to - timedelta(days=REPORT_DEFAULT_DAYS - 1)).isoformat()
+                    )
+                    if date_from > date_to:
+                        raise ValueError(date_from)
+                except ValueError:
+                    return {
+                        'statusCode': 400,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'Invalid date range'}),
+                        'isBase64Encoded': False
+                    }
+                with phase('query', 'report'):
+                    report = fetch_report(cursor, date_from, date_to)
+                return {
+                    'statusCode': 200,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps(report),
+                    'isBase64Encoded': False
+                }
+            
+            if query_params.get('action') == 'availability':
+                try:
+                    date_from = date.fromisoformat(
+                        query_params.get('date_from') or (date.today() + timedelta(days=1)).isoformat()
+                    )
+                    days = int(query_params.get('days') or 30)
+                    area = int(query_params.get('area') or 50)
+                    if not 1 <= days <= AVAILABILITY_MAX_DAYS or area <= 0:
+                        raise ValueError(days)
+                except ValueError:
+                    return {
+                        'statusCode': 400,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'Invalid availability parameters'}),
+                        'isBase64Encoded': False
+                    }
+                availability = fetch_availability(cursor, date_from, days, area, query_params.get('service_type') or '*')
+                return {
+                    'statusCode': 200,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps(availability),
+                    'isBase64Encoded': False
+                }
+            
+            if query_params.get('action') == 'route':
+                from routing import fetch_route
+                if user_id and user_role not in ['super_admin', 'admin']:
+                    route_assignee = query_params.get('assignee_id') or user_id
+                    allowed = str(route_assignee) == str(user_id)
+                else:
+                    route_assignee = query_params.get('assignee_id')
+                    allowed = True
+                if not allowed:
+                    return {
+                        'statusCode': 403,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'Access to another assignee route is denied'}),
+                        'isBase64Encoded': False
+                    }
+                try:
+                    route_assignee = int(route_assignee)
+                    route_date = date.fromisoformat(query_params.get('date') or '').isoformat()
+                except (TypeError, ValueError):
+                    return {
+                        'statusCode': 400,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'assignee_id and date (YYYY-MM-DD) are required'}),
+                        'isBase64Encoded': False
+                    }
+                return {
+                    'statusCode': 200,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps(fetch_route(cursor, route_assignee, route_date)),
+                    'isBase64Encoded': False
+                }
+
+            if query_params.get('action') == 'nearby':
+                from routing import fetch_nearby, parse_coordinates
+                coordinates = parse_coordinates(query_params)
+                if coordinates is None:
+                    return {
+                        'statusCode': 400,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'Invalid lat, lon, radius_km or limit'}),
+                        'isBase64Encoded': False
+                    }
+                lon, lat, radius_km, limit = coordinates
+                try:
+                    conditions, values = build_list_filters(query_params, user_id, user_role)
+                except ValueError:
+                    return {
+                        'statusCode': 400,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'Invalid filter value'}),
+                        'isBase64Encoded': False
+                    }
+                items = fetch_nearby(cursor, BOOKING_COLUMNS, lon, lat, radius_km, limit, conditions, values)
+                return {
+                    'statusCode': 200,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'items': items}),
+                    'isBase64Encoded': False
+                }
+
+            if query_params.get('action') == 'export':
+                from export import iter_export, CONTENT_TYPES
+                fmt = query_params.get('format') or 'csv'
+                use_gzip = query_params.get('gzip') == 'true'
+                try:
+                    if fmt not in CONTENT_TYPES:
+                        raise ValueError(fmt)
+                    conditions, values = build_list_filters(query_params, user_id, user_role)
+                except ValueError:
+                    return {
+                        'statusCode': 400,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'Invalid export parameters'}),
+                        'isBase64Encoded': False
+                    }
+                search = normalize_search(query_params.get('search') or '')
+                if search:
+                    conditions.append("b.search_text LIKE %s")
+                    values.append('%' + escape_like(search) + '%')
+                
+                filename = f'bookings-{date.today().isoformat()}.{fmt}' + ('.gz' if use_gzip else '')
+                with phase('export'):
+                    payload = b''.join(iter_export(conn, conditions, values, fmt, use_gzip))
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/gzip' if use_gzip else CONTENT_TYPES[fmt],
+                        'Content-Disposition': f'attachment; filename="{filename}"',
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Expose-Headers': 'Content-Disposition'
+                    },
+                    'body': base64.b64encode(payload).decode('ascii') if use_gzip else payload.decode('utf-8'),
+                    'isBase64Encoded': use_gzip
+                }
+            
+            if query_params.get('updated_since'):
+                try:
+                    conditions, values = build_list_filters(query_params, user_id, user_role)
+                    since = datetime.fromisoformat(query_params['updated_since']).isoformat()
+                except ValueError:
+                    return {
+                        'statusCode': 400,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'Invalid updated_since watermark'}),
+                        'isBase64Encoded': False
+                    }
+                assignee_filter = int(user_id) if user_id and user_role not in ['super_admin', 'admin'] else None
+                changes = fetch_changes(cursor, since, conditions, values, assignee_filter)
+                return {
+                    'statusCode': 200,
+                    'headers': JSON_HEADERS,
+                    'body': dumps(changes),
+                    'isBase64Encoded': False
+                }
+            
             if booking_id:
-                cursor.execute(
-                    "SELECT b.id, b.name, b.phone, b.email, b.address, b.area, b.service_type, b.comment, b.status, "
-                    "TO_CHAR(b.created_at, 'YYYY-MM-DD HH24:MI') as created_at, "
-                    "TO_CHAR(b.booking_date, 'YYYY-MM-DD') as booking_date, "
-                    "TO_CHAR(b.booking_time, 'HH24:MI') as booking_time, "
-                    "b.assignee_id, u.full_name as assignee_name "
-                    "FROM t_p89410065_cleaning_service_web.bookings b "
-                    "LEFT JOIN t_p89410065_cleaning_service_web.users u ON b.assignee_id = u.id "
-                    "WHERE b.id = " + str(int(booking_id))
-                )
+                execute(cursor, 'booking_detail', (int(booking_id),))
                 booking = cursor.fetchone()
                 if not booking:
                     return {
                         'statusCode': 404,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'headers': JSON_HEADERS,
                         'body': json.dumps({'error': 'Booking not found'}),
                         'isBase64Encoded': False
                     }
                 return {
                     'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'headers': JSON_HEADERS,
                     'body': json.dumps(dict(booking)),
                     'isBase64Encoded': False
                 }
             else:
+                try:
+                    conditions, values = build_list_filters(query_params, user_id, user_role)
+                except ValueError:
+                    return {
+                        'statusCode': 400,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps({'error': 'Invalid filter value'}),
+                        'isBase64Encoded': False
+                    }
+                
+                search = normalize_search(query_params.get('search') or '')
+                paginated = bool(search) or 'limit' in query_params or 'cursor' in query_params
+                select_values: List[Any] = []
+                rank_column = ""
+                if search:
+                    rank_column = ", similarity(b.search_text, %s) as search_rank"
+                    select_values.append(search)
+                    conditions.append("b.search_text LIKE %s")
+                    values.append('%' + escape_like(search) + '%')
+                
                 base_query = (
-                    "SELECT b.id, b.name, b.phone, b.email, b.address, b.area, b.service_type, b.comment, b.status, "
-                    "TO_CHAR(b.created_at, 'YYYY-MM-DD HH24:MI') as created_at, "
-                    "TO_CHAR(b.booking_date, 'YYYY-MM-DD') as booking_date, "
-                    "TO_CHAR(b.booking_time, 'HH24:MI') as booking_time, "
-                    "b.assignee_id, u.full_name as assignee_name "
+                    "SELECT " + BOOKING_COLUMNS + ", "
+                    "TO_CHAR(b.created_at, 'YYYY-MM-DD\"T\"HH24:MI:SS.US') as cursor_created_at" + rank_column + " "
                     "FROM t_p89410065_cleaning_service_web.bookings b "
                     "LEFT JOIN t_p89410065_cleaning_service_web.users u ON b.assignee_id = u.id "
                 )
                 
-                if user_id and user_role not in ['super_admin', 'admin']:
-                    base_query += "WHERE b.assignee_id = " + str(int(user_id)) + " "
+                if paginated:
+                    try:
+                        limit = min(max(int(query_params.get('limit') or DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+                        if query_params.get('cursor'):
+                            cursor_created_at, cursor_id, cursor_rank = decode_cursor(query_params['cursor'])
+                            if search and cursor_rank is not None:
+                                conditions.append(
+                                    "(similarity(b.search_text, %s), b.created_at, b.id) < (%s::real, %s::timestamp, %s)"
+                                )
+                                values.extend([search, cursor_rank, cursor_created_at, cursor_id])
+                            elif not search and cursor_rank is None:
+                                conditions.append("(b.created_at, b.id) < (%s::timestamp, %s)")
+                                values.extend([cursor_created_at, cursor_id])
+                            else:
+                                raise ValueError('Cursor does not match search mode')
+                    except (ValueError, UnicodeDecodeError):
+                        return {
+                            'statusCode': 400,
+                            'headers': JSON_HEADERS,
+                            'body': json.dumps({'error': 'Invalid cursor or limit'}),
+                            'isBase64Encoded': False
+                        }
+                
+                if conditions:
+                    base_query += "WHERE " + " AND ".join(conditions) + " "
+                
+                if search:
+                    base_query += "ORDER BY search_rank DESC, b.created_at DESC, b.id DESC"
+                else:
+                    base_query += "ORDER BY b.created_at DESC, b.id DESC"
+                
+                values = select_values + values
+                if paginated:
+                    base_query += " LIMIT %s"
+                    values.append(limit + 1)
                 
-                base_query += "ORDER BY b.created_at DESC"
+                if LIST_JSON_MODE == 'db':
+                    # массив собирает Postgres, текст уходит в body как есть
+                    order_by = ("p.search_rank DESC, " if search else "") + "p.cursor_created_at DESC, p.id DESC"
+                    page_limit = limit if paginated else None
+                    execute_query(
+                        cursor,
+                        json_page_query(base_query, order_by, ['cursor_created_at', 'search_rank']),
+                        values + [page_limit, page_limit],
+                        'list_json'
+                    )
+                    page = cursor.fetchone()
+                    if not paginated:
+                        payload = page['items']
+                    else:
+                        next_cursor = None
+                        if page['fetched'] > limit:
+                            last = page['last_row']
+                            next_cursor = encode_cursor(last['cursor_created_at'], last['id'], last.get('search_rank'))
+                        payload = '{"items": ' + page['items'] + ', "next_cursor": ' + json.dumps(next_cursor) + '}'
+                    return {
+                        'statusCode': 200,
+                        'headers': JSON_HEADERS,
+                        'body': payload,
+                        'isBase64Encoded': False
+                    }
+                
+                execute_query(cursor, base_query, values, 'list')
+                bookings = [dict(b) for b in cursor.fetchall()]
+                
+                next_cursor = None
+                if paginated and len(bookings) > limit:
+                    bookings = bookings[:limit]
+                    last = bookings[-1]
+                    next_cursor = encode_cursor(last['cursor_created_at'], last['id'], last.get('search_rank'))
+                for b in bookings:
+                    del b['cursor_created_at']
+                    b.pop('search_rank', None)
+                
+                if paginated:
+                    body = {'items': bookings, 'next_cursor': next_cursor}
+                else:
+                    body = bookings
+                with phase('serialize'):
+                    payload = dumps(body)
                 
-                cursor.execute(base_query)
-                bookings = cursor.fetchall()
                 return {
                     'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps([dict(b) for b in bookings]),
+                    'headers': JSON_HEADERS,
+                    'body': payload,
                     'isBase64Encoded': False
                 }
         
+        elif method == 'POST' and query_params.get('action') == 'report_refresh':
+            from reports import refresh_reports
+            if user_role not in ['super_admin', 'admin', 'manager']:
+                return {
+                    'statusCode': 403,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': 'Reports are available to administrators only'}),
+                    'isBase64Encoded': False
+                }
+            with phase('query', 'report_refresh'):
+                result = refresh_reports(conn)
+            return {
+                'statusCode': 200,
+                'headers': JSON_HEADERS,
+                'body': json.dumps(result),
+                'isBase64Encoded': False
+            }
+
+        elif method == 'POST' and query_params.get('action') == 'quote':
+            from pricing import quote_items, QUOTE_MAX_ITEMS
+            with phase('parse'):
+                body_data = json.loads(event.get('body') or '{}')
+            items = body_data.get('items') if isinstance(body_data, dict) else None
+
+            if items is None:
+                with phase('query', 'quote'):
+                    quote = quote_items(cursor, [body_data], breakdown=True)[0]
+                if quote.get('error'):
+                    return {
+                        'statusCode': 400,
+                        'headers': JSON_HEADERS,
+                        'body': json.dumps(quote),
+                        'isBase64Encoded': False
+                    }
+                quote['currency'] = 'RUB'
+                return {
+                    'statusCode': 200,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps(quote),
+                    'isBase64Encoded': False
+                }
+
+            if not isinstance(items, list) or not items or len(items) > QUOTE_MAX_ITEMS:
+                return {
+                    'statusCode': 400,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': f'Items must be a list of 1 to {QUOTE_MAX_ITEMS} bookings'}),
+                    'isBase64Encoded': False
+                }
+            with phase('query', 'quote'):
+                quotes = quote_items(cursor, items)
+            return {
+                'statusCode': 200,
+                'headers': JSON_HEADERS,
+                'body': json.dumps({
+                    'items': quotes,
+                    'total': sum(quote.get('price', 0) for quote in quotes),
+                    'failed': sum(1 for quote in quotes if quote.get('error')),
+                    'currency': 'RUB'
+                }),
+                'isBase64Encoded': False
+            }
+
+        elif method == 'POST' and query_params.get('action') == 'batch':
+            from batch import apply_batch, BATCH_MAX_ITEMS
+            with phase('parse'):
+                body_data = json.loads(event.get('body') or '{}')
+            operations = body_data.get('operations')
+
+            if not isinstance(operations, list) or not operations:
+                return {
+                    'statusCode': 400,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': 'Operations list is required'}),
+                    'isBase64Encoded': False
+                }
+            if len(operations) > BATCH_MAX_ITEMS:
+                return {
+                    'statusCode': 400,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': f'At most {BATCH_MAX_ITEMS} operations per batch'}),
+                    'isBase64Encoded': False
+                }
+
+            with phase('query', 'batch'):
+                report = apply_batch(conn, operations, user_id, user_role, bool(body_data.get('atomic')))
+
+            return {
+                'statusCode': 200,
+                'headers': JSON_HEADERS,
+                'body': json.dumps(report),
+                'isBase64Encoded': False
+            }
+
+        elif method == 'POST' and query_params.get('action') == 'import':
+            from bulk_import import import_bookings
+            if user_role not in ['super_admin', 'admin', 'manager']:
+                return {
+                    'statusCode': 403,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': 'Import is allowed for administrators only'}),
+                    'isBase64Encoded': False
+                }
+            
+            fmt = query_params.get('format') or 'csv'
+            if fmt not in ['csv', 'jsonl']:
+                return {
+                    'statusCode': 400,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': 'Format must be csv or jsonl'}),
+                    'isBase64Encoded': False
+                }
+            
+            raw_body = event.get('body') or ''
+            if event.get('isBase64Encoded'):
+                raw_body = base64.b64decode(raw_body).decode('utf-8-sig')
+            try:
+                with phase('query', 'import'):
+                    report = import_bookings(
+                        conn, io.StringIO(raw_body, newline=''), fmt, query_params.get('dry_run') == 'true'
+                    )
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': str(e)}),
+                    'isBase64Encoded': False
+                }
+            
+            return {
+                'statusCode': 200,
+                'headers': JSON_HEADERS,
+                'body': json.dumps(report),
+                'isBase64Encoded': False
+            }
+        
+        elif method == 'POST' and query_params.get('action') == 'auto_assign':
+            from assign import auto_assign
+            if user_role not in ['super_admin', 'admin', 'manager']:
+                return {
+                    'statusCode': 403,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': 'Auto assignment is allowed for administrators only'}),
+                    'isBase64Encoded': False
+                }
+
+            with phase('parse'):
+                body_data = json.loads(event.get('body') or '{}')
+            try:
+                day = date.fromisoformat(body_data.get('date') or '')
+            except (TypeError, ValueError):
+                return {
+                    'statusCode': 400,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': 'Date is required in YYYY-MM-DD format'}),
+                    'isBase64Encoded': False
+                }
+            with phase('query', 'auto_assign'):
+                report = auto_assign(conn, day, bool(body_data.get('dry_run')))
+
+            return {
+                'statusCode': 200,
+                'headers': JSON_HEADERS,
+                'body': json.dumps(report),
+                'isBase64Encoded': False
+            }
+
         elif method == 'POST':
-            body_data = json.loads(event.get('body', '{}'))
+            with phase('parse'):
+                body_data = json.loads(event.get('body', '{}'))
             
             name = body_data.get('name') or ''
             phone = body_data.get('phone') or ''
@@ -212,22 +808,32 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             if not all([name, phone, email, address, area, service_type, booking_date, booking_time]):
                 return {
                     'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'headers': JSON_HEADERS,
                     'body': json.dumps({'error': 'All required fields must be filled'}),
                     'isBase64Encoded': False
                 }
             
-            cursor.execute(
-                "INSERT INTO t_p89410065_cleaning_service_web.bookings (name, phone, email, address, area, service_type, comment, status, booking_date, booking_time) "
-                "VALUES ('" + name.replace("'", "''") + "', '" + phone.replace("'", "''") + "', '" + 
-                email.replace("'", "''") + "', '" + address.replace("'", "''") + "', " + str(int(area)) + 
-                ", '" + service_type.replace("'", "''") + "', '" + comment.replace("'", "''") + "', 'new', '" + 
-                booking_date.replace("'", "''") + "', '" + booking_time.replace("'", "''") + "') "
-                "RETURNING id"
-            )
-            result = cursor.fetchone()
-            conn.commit()
+            try:
+                slot_error = check_slot(cursor, booking_date, booking_time, int(area), service_type)
+            except ValueError:
+                return {
+                    'statusCode': 400,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': 'Invalid booking date or time'}),
+                    'isBase64Encoded': False
+                }
+            if slot_error:
+                return {
+                    'statusCode': 409,
+                    'headers': JSON_HEADERS,
+                    'body': json.dumps({'error': slot_error}),
+                    'isBase64Encoded': False
+                }
             
+            execute(cursor, 'booking_insert', (
+                name, phone, email, address, int(area), service_type, comment, booking_date, booking_time
+            ))
+            result = cursor.fetchone()
             booking_id = result['id']
             
             booking_notification_data = {
@@ -242,12 +848,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'booking_date': booking_date,
                 'booking_time': booking_time
             }
-            send_notification_email(booking_notification_data)
-            send_telegram_notification(booking_notification_data)
+            execute(cursor, 'booking_outbox_insert', (
+                booking_id, Json(booking_notification_data), booking_id, Json(booking_notification_data)
+            ))
+            conn.commit()
             
             return {
                 'statusCode': 201,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'headers': JSON_HEADERS,
                 'body': json.dumps({'id': booking_id, 'message': 'Booking created successfully'}),
                 'isBase64Encoded': False
             }
@@ -260,12 +868,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             if not booking_id:
                 return {
                     'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'headers': JSON_HEADERS,
                     'body': json.dumps({'error': 'Booking ID is required'}),
                     'isBase64Encoded': False
                 }
             
-            body_data = json.loads(event.get('body', '{}'))
+            with phase('parse'):
+                body_data = json.loads(event.get('body', '{}'))
             status = body_data.get('status')
             assignee_id = body_data.get('assignee_id')
             name = body_data.get('name')
@@ -278,54 +887,31 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             booking_date = body_data.get('booking_date')
             booking_time = body_data.get('booking_time')
             
-            updates = []
-            if status:
-                updates.append("status = '" + status.replace("'", "''") + "'")
-            if assignee_id is not None:
-                if assignee_id == '':
-                    updates.append("assignee_id = NULL")
-                else:
-                    updates.append("assignee_id = " + str(int(assignee_id)))
-                    if status != 'assigned':
-                        updates.append("status = 'assigned'")
-            if name:
-                updates.append("name = '" + name.replace("'", "''") + "'")
-            if phone:
-                updates.append("phone = '" + phone.replace("'", "''") + "'")
-            if email:
-                updates.append("email = '" + email.replace("'", "''") + "'")
-            if address:
-                updates.append("address = '" + address.replace("'", "''") + "'")
-            if area:
-                updates.append("area = " + str(int(area)))
-            if service_type:
-                updates.append("service_type = '" + service_type.replace("'", "''") + "'")
-            if comment is not None:
-                updates.append("comment = '" + comment.replace("'", "''") + "'")
-            if booking_date:
-                updates.append("booking_date = '" + booking_date.replace("'", "''") + "'")
-            if booking_time:
-                updates.append("booking_time = '" + booking_time.replace("'", "''") + "'")
+            set_assignee = assignee_id is not None
+            new_assignee = int(assignee_id) if set_assignee and assignee_id != '' else None
             
-            if not updates:
+            if not any([status, set_assignee, name, phone, email, address, area, service_type,
+                        comment is not None, booking_date, booking_time]):
                 return {
                     'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'headers': JSON_HEADERS,
                     'body': json.dumps({'error': 'No fields to update'}),
                     'isBase64Encoded': False
                 }
             
-            updates.append("updated_at = CURRENT_TIMESTAMP")
-            
-            cursor.execute(
-                "UPDATE t_p89410065_cleaning_service_web.bookings SET " + ", ".join(updates) + 
-                " WHERE id = " + str(int(booking_id))
-            )
+            execute(cursor, 'booking_update', (
+                status or None, set_assignee, new_assignee,
+                set_assignee, new_assignee,
+                name or None, phone or None, email or None, address or None,
+                int(area) if area else None, service_type or None, comment,
+                booking_date or None, booking_time or None,
+                int(booking_id)
+            ))
             conn.commit()
             
             return {
                 'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'headers': JSON_HEADERS,
                 'body': json.dumps({'message': 'Booking updated successfully'}),
                 'isBase64Encoded': False
             }
@@ -338,29 +924,24 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             if not booking_id:
                 return {
                     'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'headers': JSON_HEADERS,
                     'body': json.dumps({'error': 'Booking ID is required'}),
                     'isBase64Encoded': False
                 }
             
-            cursor.execute("DELETE FROM t_p89410065_cleaning_service_web.bookings WHERE id = " + str(int(booking_id)))
+            execute(cursor, 'booking_delete', (int(booking_id),))
             conn.commit()
             
             return {
                 'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'headers': JSON_HEADERS,
                 'body': json.dumps({'message': 'Booking deleted successfully'}),
                 'isBase64Encoded': False
             }
         
         else:
-            return {
-                'statusCode': 405,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Method not allowed'}),
-                'isBase64Encoded': False
-            }
+            return METHOD_NOT_ALLOWED_RESPONSE
     
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        pool.putconn(conn)
\ No newline at end of file
@@ -0,0 +1,173 @@
+'''
+Business: Расчёт стоимости заявки по структурированным тарифам (V0016) - одна заявка или пакет из тысяч
+Args: cursor - RealDictCursor; items - [{area, serviceType, date, time}]; TARIFF_VERSION_TTL из окружения
+Returns: quote_items() - цена в рублях по каждой позиции или ошибка; разбор цены для одиночного расчёта
+'''
+
+import os
+import time
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+from queries import register, execute
+
+# как часто экземпляр сверяет версию тарифов с базой; таблица перечитывается только при её смене
+TARIFF_VERSION_TTL = float(os.environ.get('TARIFF_VERSION_TTL', '5'))
+QUOTE_MAX_ITEMS = 10000
+MINUTES_PER_DAY = 24 * 60
+
+register('tariff_version', "SELECT version FROM t_p89410065_cleaning_service_web.tariff_version WHERE id")
+register(
+    'tariff_rows',
+    "SELECT service_type, base_price::float8 AS base_price, rate_per_m2::float8 AS rate_per_m2, "
+    "min_area, min_price::float8 AS min_price "
+    "FROM t_p89410065_cleaning_service_web.tariffs"
+)
+register(
+    'tariff_modifier_rows',
+    "SELECT id, name, service_type, weekdays, "
+    "(EXTRACT(EPOCH FROM time_from) / 60)::integer AS minute_from, "
+    "(EXTRACT(EPOCH FROM time_to) / 60)::integer AS minute_to, "
+    "date_from, date_to, min_area, multiplier::float8 AS multiplier, surcharge::float8 AS surcharge "
+    "FROM t_p89410065_cleaning_service_web.tariff_modifiers WHERE active ORDER BY id"
+)
+
+_tariff_cache: Dict[str, Any] = {'version': None, 'checked': 0.0, 'tariffs': {}, 'modifiers': []}
+
+
+def compile_modifier(row: Dict[str, Any]) -> Tuple[Any, ...]:
+    '''Условие модификатора в виде кортежа для быстрой проверки: weekdays - frozenset, время - минуты суток'''
+    return (
+        row['name'],
+        row['service_type'],
+        frozenset(row['weekdays']) if row['weekdays'] else None,
+        row['minute_from'],
+        row['minute_to'],
+        row['date_from'],
+        row['date_to'],
+        row['min_area'],
+        row['multiplier'],
+        row['surcharge'],
+    )
+
+
+def load_tariffs(cursor: Any) -> Dict[str, Any]:
+    '''Скомпилированные тарифы экземпляра; версия сверяется не чаще TARIFF_VERSION_TTL'''
+    now = time.monotonic()
+    if _tariff_cache['version'] is not None and now - _tariff_cache['checked'] < TARIFF_VERSION_TTL:
+        return _tariff_cache
+    execute(cursor, 'tariff_version', ())
+    version = cursor.fetchone()['version']
+    if version != _tariff_cache['version']:
+        execute(cursor, 'tariff_rows', ())
+        tariffs = {
+            row['service_type']: (row['base_price'], row['rate_per_m2'], row['min_area'], row['min_price'])
+            for row in cursor.fetchall()
+        }
+        execute(cursor, 'tariff_modifier_rows', ())
+        modifiers = [compile_modifier(row) for row in cursor.fetchall()]
+        _tariff_cache.update({'version': version, 'tariffs': tariffs, 'modifiers': modifiers})
+    _tariff_cache['checked'] = now
+    return _tariff_cache
+
+
+def parse_item(item: Any) -> Tuple[Optional[Tuple[str, int, Optional[date], Optional[int]]], Optional[str]]:
+    '''(service_type, area, date, минуты) позиции или текст ошибки'''
+    if not isinstance(item, dict):
+        return None, 'Item must be an object'
+    service_type = item.get('serviceType') or item.get('service_type')
+    if not service_type:
+        return None, 'serviceType is required'
+    try:
+        area = int(item.get('area') or 0)
+        day = date.fromisoformat(item['date']) if item.get('date') else None
+        minutes = None
+        if item.get('time'):
+            hours, mins = str(item['time']).split(':')[:2]
+            minutes = int(hours) * 60 + int(mins)
+            if not 0 <= minutes < MINUTES_PER_DAY:
+                raise ValueError(minutes)
+    except (TypeError, ValueError):
+        return None, 'Invalid area, date or time'
+    if area < 0:
+        return None, 'Invalid area, date or time'
+    return (service_type, area, day, minutes), None
+
+
+def matching_modifiers(modifiers: List[Tuple[Any, ...]], service_type: str, area: int,
+                       day: Optional[date], minutes: Optional[int]) -> Tuple[float, float, List[str]]:
+    '''Общий множитель, сумма надбавок и названия модификаторов, подходящих под позицию'''
+    multiplier, surcharge, names = 1.0, 0.0, []
+    weekday = day.isoweekday() if day else None
+    for name, only_service, weekdays, minute_from, minute_to, date_from, date_to, min_area, factor, extra in modifiers:
+        if only_service is not None and only_service != service_type:
+            continue
+        if weekdays is not None and weekday not in weekdays:
+            continue
+        if minute_from is not None or minute_to is not None:
+            if minutes is None:
+                continue
+            if minute_from is not None and minutes < minute_from:
+                continue
+            if minute_to is not None and minutes >= minute_to:
+                continue
+        if date_from is not None or date_to is not None:
+            if day is None:
+                continue
+            if date_from is not None and day < date_from:
+                continue
+            if date_to is not None and day > date_to:
+                continue
+        if min_area is not None and area < min_area:
+            continue
+        multiplier *= factor
+        surcharge += extra
+        names.append(name)
+    return multiplier, surcharge, names
+
+
+def quote_items(cursor: Any, items: List[Any], breakdown: bool = False) -> List[Dict[str, Any]]:
+    '''
+    Пакетный расчёт за один проход: модификаторы зависят только от (тип, день, время, порог площади),
+    поэтому вычисляются один раз на уникальную комбинацию, а не на каждую позицию
+    '''
+    compiled = load_tariffs(cursor)
+    tariffs = compiled['tariffs']
+    modifiers = compiled['modifiers']
+    area_thresholds = sorted({modifier[7] for modifier in modifiers if modifier[7] is not None})
+    memo: Dict[Tuple[Any, ...], Tuple[float, float, List[str]]] = {}
+    results: List[Dict[str, Any]] = []
+
+    for item in items:
+        parsed, error = parse_item(item)
+        if error:
+            results.append({'error': error})
+            continue
+        service_type, area, day, minutes = parsed
+        tariff = tariffs.get(service_type)
+        if tariff is None:
+            results.append({'error': 'Unknown service type'})
+            continue
+        base_price, rate_per_m2, min_area, min_price = tariff
+        area_class = sum(1 for threshold in area_thresholds if area >= threshold)
+        key = (service_type, day, minutes, area_class)
+        factors = memo.get(key)
+        if factors is None:
+            factors = matching_modifiers(modifiers, service_type, area, day, minutes)
+            memo[key] = factors
+        multiplier, surcharge, names = factors
+
+        billed_area = max(area, min_area)
+        subtotal = max(min_price, base_price + rate_per_m2 * billed_area)
+        # цена в целых рублях, округление половины вверх
+        price = int(subtotal * multiplier + surcharge + 0.5)
+        result: Dict[str, Any] = {'price': max(price, 0)}
+        if breakdown:
+            result.update({
+                'billed_area': billed_area,
+                'subtotal': round(subtotal, 2),
+                'multiplier': round(multiplier, 4),
+                'surcharge': round(surcharge, 2),
+                'modifiers': names,
+            })
+        results.append(result)
+    return results
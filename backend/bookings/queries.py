@@ -0,0 +1,118 @@
+'''
+Business: Именованные параметризованные запросы, подготовленные на сервере один раз на соединение пула
+Args: register(name, sql) при импорте модуля функции, execute(cursor, name, params) в обработчике
+Returns: query_stats() - вызовы, подготовки и время выполнения по каждому запросу
+'''
+
+import hashlib
+import re
+import threading
+import time
+import weakref
+from typing import Dict, Any, Sequence, Tuple
+from metrics import add_phase
+
+MAX_DYNAMIC_STATEMENTS = 64
+
+PLACEHOLDER_RE = re.compile(r'%(s|%)')
+
+_statements: Dict[str, Tuple[str, int]] = {}
+_prepared: 'weakref.WeakKeyDictionary[Any, set]' = weakref.WeakKeyDictionary()
+_stats: Dict[str, Dict[str, float]] = {}
+_dynamic_count = 0
+_lock = threading.Lock()
+
+
+def to_server_sql(sql: str) -> Tuple[str, int]:
+    '''Заменяет плейсхолдеры psycopg2 %s на $1..$n для PREPARE; %% остаётся для psycopg2'''
+    count = 0
+
+    def replace(match: Any) -> str:
+        nonlocal count
+        if match.group(1) == '%':
+            return '%%'
+        count += 1
+        return '$' + str(count)
+
+    return PLACEHOLDER_RE.sub(replace, sql), count
+
+
+def register(name: str, sql: str) -> str:
+    '''Регистрирует запрос под именем; повторная регистрация того же текста безопасна'''
+    text, count = to_server_sql(sql)
+    with _lock:
+        existing = _statements.get(name)
+        if existing is not None and existing[0] != text:
+            raise ValueError(f'Statement {name} is already registered with different SQL')
+        _statements[name] = (text, count)
+    return name
+
+
+def _record(name: str, started: float, prepared: bool) -> None:
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    add_phase('query', elapsed_ms, name)
+    with _lock:
+        entry = _stats.setdefault(name, {'calls': 0, 'prepares': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        entry['calls'] += 1
+        entry['prepares'] += int(prepared)
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+
+def execute(cursor: Any, name: str, params: Sequence[Any] = ()) -> None:
+    '''EXECUTE подготовленного запроса; PREPARE - только при первом использовании на соединении'''
+    text, count = _statements[name]
+    if len(params) != count:
+        raise ValueError(f'Statement {name} expects {count} parameters, got {len(params)}')
+
+    conn = cursor.connection
+    with _lock:
+        prepared = _prepared.setdefault(conn, set())
+
+    started = time.perf_counter()
+    is_new = name not in prepared
+    if is_new:
+        # PREPARE не откатывается вместе с транзакцией, поэтому отмечаем его сразу после успеха
+        cursor.execute('PREPARE ' + name + ' AS ' + text.replace('%%', '%'))
+        prepared.add(name)
+    if count:
+        cursor.execute('EXECUTE ' + name + ' (' + ', '.join(['%s'] * count) + ')', tuple(params))
+    else:
+        cursor.execute('EXECUTE ' + name)
+    _record(name, started, is_new)
+
+
+def execute_query(cursor: Any, sql: str, params: Sequence[Any] = (), prefix: str = 'q') -> None:
+    '''
+    Запрос с динамическим текстом (фильтры списка): каждая форма готовится под именем по хэшу текста.
+    После MAX_DYNAMIC_STATEMENTS форм остальные выполняются без подготовки.
+    '''
+    global _dynamic_count
+    name = prefix + '_' + hashlib.sha1(sql.encode('utf-8')).hexdigest()[:12]
+    if name not in _statements:
+        with _lock:
+            full = _dynamic_count >= MAX_DYNAMIC_STATEMENTS
+            if not full:
+                _dynamic_count += 1
+        if full:
+            started = time.perf_counter()
+            cursor.execute(sql, tuple(params))
+            _record(prefix + '_unprepared', started, False)
+            return
+        register(name, sql)
+    execute(cursor, name, params)
+
+
+def query_stats() -> Dict[str, Dict[str, Any]]:
+    '''Статистика по запросам: calls, prepares, total_ms, avg_ms, max_ms'''
+    with _lock:
+        return {
+            name: {
+                'calls': int(entry['calls']),
+                'prepares': int(entry['prepares']),
+                'total_ms': round(entry['total_ms'], 3),
+                'avg_ms': round(entry['total_ms'] / entry['calls'], 3) if entry['calls'] else 0.0,
+                'max_ms': round(entry['max_ms'], 3)
+            }
+            for name, entry in _stats.items()
+        }
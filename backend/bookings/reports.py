@@ -0,0 +1,154 @@
+'''
+Business: Отчёты по заявкам и оценке выручки из материализованных представлений V0017 и их обновление
+Args: cursor - RealDictCursor; date_from, date_to - границы по неделям; conn - для refresh_reports()
+Returns: fetch_report() - итоги, разрезы по неделям, типам услуг, исполнителям и воронка статусов;
+         refresh_reports() - время обновления или пропуск, если обновление уже идёт
+'''
+
+import time
+from datetime import date
+from typing import Dict, Any, List
+from queries import register, execute
+
+REPORT_VIEWS = ['report_weekly_service', 'report_weekly_assignee']
+FUNNEL_STAGES = ['new', 'assigned', 'in-progress', 'completed']
+
+# недели по сервису и статусу: итоги, разрезы по неделе, типу и статусу - одним проходом GROUPING SETS
+register(
+    'report_service',
+    "SELECT TO_CHAR(week, 'YYYY-MM-DD') AS week, service_type, status, "
+    "GROUPING(week) AS g_week, GROUPING(service_type) AS g_service, GROUPING(status) AS g_status, "
+    "SUM(bookings)::bigint AS bookings, SUM(area_m2)::bigint AS area_m2, "
+    "SUM(estimated_revenue) FILTER (WHERE status <> 'cancelled')::float8 AS estimated_revenue "
+    "FROM t_p89410065_cleaning_service_web.report_weekly_service "
+    "WHERE week BETWEEN date_trunc('week', %s::date)::date AND %s::date "
+    "GROUP BY GROUPING SETS ((week), (service_type), (status), ()) "
+    "ORDER BY week, service_type, status"
+)
+register(
+    'report_assignee',
+    "SELECT r.assignee_id, u.full_name AS assignee_name, "
+    "SUM(r.bookings)::bigint AS bookings, "
+    "SUM(r.bookings) FILTER (WHERE r.status = 'completed')::bigint AS completed, "
+    "SUM(r.estimated_revenue) FILTER (WHERE r.status <> 'cancelled')::float8 AS estimated_revenue "
+    "FROM t_p89410065_cleaning_service_web.report_weekly_assignee r "
+    "LEFT JOIN t_p89410065_cleaning_service_web.users u ON u.id = r.assignee_id "
+    "WHERE r.week BETWEEN date_trunc('week', %s::date)::date AND %s::date "
+    "GROUP BY r.assignee_id, u.full_name "
+    "ORDER BY estimated_revenue DESC NULLS LAST, r.assignee_id"
+)
+register(
+    'report_state',
+    "SELECT TO_CHAR(refreshed_at, 'YYYY-MM-DD\"T\"HH24:MI:SS') AS refreshed_at, duration_ms "
+    "FROM t_p89410065_cleaning_service_web.report_state WHERE id"
+)
+
+
+def funnel(by_status: Dict[str, int]) -> List[Dict[str, Any]]:
+    '''Сколько заявок дошло до каждого этапа: заявка в статусе completed прошла и все предыдущие'''
+    stages = []
+    reached = 0
+    for stage in reversed(FUNNEL_STAGES):
+        reached += by_status.get(stage, 0)
+        stages.append({'stage': stage, 'count': reached})
+    stages.reverse()
+    first = stages[0]['count']
+    for entry in stages:
+        entry['share'] = round(entry['count'] / first, 4) if first else 0.0
+    return stages
+
+
+def fetch_report(cursor: Any, date_from: date, date_to: date) -> Dict[str, Any]:
+    execute(cursor, 'report_service', (date_from, date_to))
+    totals: Dict[str, Any] = {'bookings': 0, 'area_m2': 0, 'estimated_revenue': 0.0}
+    by_week: List[Dict[str, Any]] = []
+    by_service_type: List[Dict[str, Any]] = []
+    by_status: Dict[str, int] = {}
+    for row in cursor.fetchall():
+        entry = {
+            'bookings': int(row['bookings']),
+            'area_m2': int(row['area_m2']),
+            'estimated_revenue': round(row['estimated_revenue'] or 0.0, 2),
+        }
+        if row['g_week'] == 0:
+            by_week.append({'week': row['week'], **entry})
+        elif row['g_service'] == 0:
+            by_service_type.append({'service_type': row['service_type'], **entry})
+        elif row['g_status'] == 0:
+            by_status[row['status']] = entry['bookings']
+        else:
+            totals = entry
+
+    execute(cursor, 'report_assignee', (date_from, date_to))
+    by_assignee = [{
+        'assignee_id': row['assignee_id'] or None,
+        'assignee_name': row['assignee_name'],
+        'bookings': int(row['bookings']),
+        'completed': int(row['completed'] or 0),
+        'estimated_revenue': round(row['estimated_revenue'] or 0.0, 2),
+    } for row in cursor.fetchall()]
+
+    execute(cursor, 'report_state', ())
+    state = cursor.fetchone()
+
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'refreshed_at': state['refreshed_at'] if state else None,
+        'totals': totals,
+        'by_week': by_week,
+        'by_service_type': by_service_type,
+        'by_assignee': by_assignee,
+        'by_status': by_status,
+        'funnel': funnel(by_status),
+        'cancelled': by_status.get('cancelled', 0),
+        'currency': 'RUB'
+    }
+
+
+def refresh_reports(conn: Any) -> Dict[str, Any]:
+    '''
+    REFRESH CONCURRENTLY обоих представлений: чтение отчётов во время обновления не блокируется.
+    Одновременно идёт только одно обновление - параллельный вызов сразу возвращает skipped
+    '''
+    started = time.monotonic()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext('bookings_report_refresh'))")
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return {'refreshed': False, 'skipped': True}
+        timings: Dict[str, int] = {}
+        for view in REPORT_VIEWS:
+            view_started = time.monotonic()
+            cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY t_p89410065_cleaning_service_web.{view}")
+            timings[view] = int((time.monotonic() - view_started) * 1000)
+        duration_ms = int((time.monotonic() - started) * 1000)
+        cursor.execute(
+            "UPDATE t_p89410065_cleaning_service_web.report_state "
+            "SET refreshed_at = CURRENT_TIMESTAMP, duration_ms = %s WHERE id",
+            (duration_ms,)
+        )
+    conn.commit()
+    return {'refreshed': True, 'skipped': False, 'duration_ms': duration_ms, 'views_ms': timings}
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import os
+    import psycopg2
+
+    parser = argparse.ArgumentParser(description='Обновление отчётов по заявкам по расписанию')
+    parser.add_argument('--interval', type=float, default=900.0, help='пауза между обновлениями, сек')
+    parser.add_argument('--once', action='store_true', help='обновить один раз и выйти')
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        while True:
+            print(json.dumps(refresh_reports(connection)), flush=True)
+            if args.once:
+                break
+            time.sleep(args.interval)
+    finally:
+        connection.close()
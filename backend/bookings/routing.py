@@ -0,0 +1,252 @@
+'''
+Business: Маршрут исполнителя на день и поиск заявок рядом с точкой по координатам адресов (V0015)
+Args: cursor - RealDictCursor; assignee_id, day для маршрута; lat, lon, radius_km для поиска; ROUTE_CLUSTER_KM из окружения
+Returns: plan_route() - кластеры близких заявок с порядком обхода (ближайший сосед + 2-opt) и длиной пути;
+         fetch_nearby() - заявки в радиусе по возрастанию расстояния
+'''
+
+import math
+import os
+from typing import Dict, Any, List, Optional, Tuple
+from queries import register, execute, execute_query
+
+# заявки дальше этого расстояния друг от друга попадают в разные кластеры
+ROUTE_CLUSTER_KM = float(os.environ.get('ROUTE_CLUSTER_KM', '5'))
+MAX_TWO_OPT_PASSES = 50
+NEARBY_MAX_RADIUS_KM = 100
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+register(
+    'route_jobs',
+    "SELECT id, name, address, TO_CHAR(booking_time, 'HH24:MI') AS booking_time, "
+    "location[0] AS lon, location[1] AS lat, geocode_precision "
+    "FROM t_p89410065_cleaning_service_web.bookings "
+    "WHERE assignee_id = %s AND booking_date = %s::date AND status <> 'cancelled' "
+    "ORDER BY booking_time, id"
+)
+
+Point = Tuple[float, float]
+
+
+def distance_km(a: Point, b: Point) -> float:
+    '''Расстояние по большому кругу между точками (долгота, широта)'''
+    lon1, lat1, lon2, lat2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def path_length(order: List[int], matrix: List[List[float]]) -> float:
+    return sum(matrix[order[i]][order[i + 1]] for i in range(len(order) - 1))
+
+
+def clusters(points: List[Point], threshold_km: float) -> List[List[int]]:
+    '''Одиночная связь: точки ближе threshold_km (в том числе через соседей) - один кластер'''
+    parent = list(range(len(points)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(points)):
+        for j in range(i + 1, len(points)):
+            if distance_km(points[i], points[j]) <= threshold_km:
+                parent[find(i)] = find(j)
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(points)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def order_route(matrix: List[List[float]], members: List[int], start: int) -> List[int]:
+    '''Открытый путь по members из start: ближайший сосед, затем 2-opt до локального минимума'''
+    order = [start]
+    left = set(members) - {start}
+    while left:
+        last = order[-1]
+        nearest = min(left, key=lambda i: (matrix[last][i], i))
+        order.append(nearest)
+        left.remove(nearest)
+
+    # 2-opt: разворот отрезка order[i..j], если это сокращает путь; начало пути фиксировано
+    size = len(order)
+    for _ in range(MAX_TWO_OPT_PASSES):
+        improved = False
+        for i in range(1, size - 1):
+            for j in range(i + 1, size):
+                before = matrix[order[i - 1]][order[i]]
+                after = matrix[order[i - 1]][order[j]]
+                if j + 1 < size:
+                    before += matrix[order[j]][order[j + 1]]
+                    after += matrix[order[i]][order[j + 1]]
+                if after < before - 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+def plan_route(jobs: List[Dict[str, Any]], threshold_km: float = ROUTE_CLUSTER_KM) -> Dict[str, Any]:
+    '''
+    Порядок обхода заявок исполнителя за день. Кластеры идут по самому раннему времени заявки в них,
+    внутри кластера путь начинается с самой ранней заявки. Время заявок не меняется - маршрут
+    подсказывает порядок, в котором удобно обходить близкие адреса.
+    '''
+    located = [job for job in jobs if job.get('lon') is not None and job.get('lat') is not None]
+    points = [(float(job['lon']), float(job['lat'])) for job in located]
+    matrix = [[distance_km(a, b) for b in points] for a in points]
+
+    groups = sorted(clusters(points, threshold_km), key=lambda members: min(members))
+    route: List[Dict[str, Any]] = []
+    full_order: List[int] = []
+    for members in groups:
+        # jobs упорядочены по времени, поэтому минимальный индекс - самая ранняя заявка кластера
+        order = order_route(matrix, members, min(members))
+        full_order.extend(order)
+        route.append({
+            'jobs': [located[i] for i in order],
+            'distance_km': round(path_length(order, matrix), 2),
+        })
+
+    return {
+        'clusters': route,
+        'order': [located[i]['id'] for i in full_order],
+        'distance_km': round(path_length(full_order, matrix), 2),
+        # путь в порядке времени заявок - для сравнения с предложенным
+        'scheduled_distance_km': round(path_length(list(range(len(located))), matrix), 2),
+        'unlocated': [job for job in jobs if job.get('lon') is None or job.get('lat') is None],
+    }
+
+
+def fetch_route(cursor: Any, assignee_id: int, day: str) -> Dict[str, Any]:
+    execute(cursor, 'route_jobs', (assignee_id, day))
+    jobs = [dict(row) for row in cursor.fetchall()]
+    result = plan_route(jobs)
+    result.update({'assignee_id': assignee_id, 'date': day})
+    return result
+
+
+def longitude_ranges(lon: float, lon_delta: float) -> List[Tuple[float, float]]:
+    '''Диапазоны долготы рамки; через ±180° рамка делится на две, у полюса - вся окружность'''
+    if lon_delta >= 180:
+        return [(-180.0, 180.0)]
+    west, east = lon - lon_delta, lon + lon_delta
+    if west < -180:
+        return [(west + 360, 180.0), (-180.0, east)]
+    if east > 180:
+        return [(west, 180.0), (-180.0, east - 360)]
+    return [(west, east)]
+
+
+def fetch_nearby(cursor: Any, columns: str, lon: float, lat: float, radius_km: float, limit: int,
+                 conditions: List[str], values: List[Any]) -> List[Dict[str, Any]]:
+    '''
+    Заявки в радиусе от точки: рамка по GiST-индексу (оператор <@), затем расстояние по сфере -
+    по нему и отбор радиуса, и порядок, чтобы LIMIT отрезал только действительно дальние заявки
+    '''
+    lat_delta = radius_km / KM_PER_DEGREE
+    lon_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    south, north = max(lat - lat_delta, -90.0), min(lat + lat_delta, 90.0)
+    boxes = longitude_ranges(lon, lon_delta)
+    box_values: List[Any] = []
+    for west, east in boxes:
+        box_values.extend([west, south, east, north])
+    box_condition = " OR ".join(
+        ["b.location <@ box(point(%s::float8, %s::float8), point(%s::float8, %s::float8))"] * len(boxes)
+    )
+    where = [f"({box_condition})", "d.km <= %s"] + conditions
+    query = (
+        f"SELECT {columns}, b.location[0] AS lon, b.location[1] AS lat, b.geocode_precision, d.km "
+        "FROM t_p89410065_cleaning_service_web.bookings b "
+        "LEFT JOIN t_p89410065_cleaning_service_web.users u ON b.assignee_id = u.id "
+        "CROSS JOIN LATERAL (SELECT 2 * %s::float8 * asin(LEAST(1, sqrt("
+        "  sin(radians(b.location[1] - %s::float8) / 2) ^ 2 "
+        "  + cos(radians(%s::float8)) * cos(radians(b.location[1])) "
+        "  * sin(radians(b.location[0] - %s::float8) / 2) ^ 2"
+        "))) AS km) d "
+        "WHERE " + " AND ".join(where) + " "
+        "ORDER BY d.km, b.id LIMIT %s"
+    )
+    params = [EARTH_RADIUS_KM, lat, lat, lon] + box_values + [radius_km] + values + [limit]
+    execute_query(cursor, query, params, 'nearby')
+    items: List[Dict[str, Any]] = []
+    for row in cursor.fetchall():
+        item = dict(row)
+        item['distance_km'] = round(item.pop('km'), 3)
+        items.append(item)
+    return items
+
+
+def parse_coordinates(params: Dict[str, Any]) -> Optional[Tuple[float, float, float, int]]:
+    '''lon, lat, radius_km, limit из параметров запроса или None при ошибке'''
+    try:
+        lat = float(params['lat'])
+        lon = float(params['lon'])
+        radius_km = float(params.get('radius_km') or 5)
+        limit = int(params.get('limit') or 50)
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 < radius_km <= NEARBY_MAX_RADIUS_KM and 1 <= limit <= 200):
+        return None
+    return lon, lat, radius_km, limit
+
+
+if __name__ == '__main__':
+    import argparse
+    import csv
+    import json
+    import sys
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
+    parser = argparse.ArgumentParser(description='Справочник адресов и маршруты исполнителей')
+    commands = parser.add_subparsers(dest='command', required=True)
+    gazetteer = commands.add_parser('load-gazetteer', help='CSV с колонками kind,city,name,lat,lon')
+    gazetteer.add_argument('path', help='файл или - для stdin')
+    cache = commands.add_parser('load-cache', help='CSV с колонками address,lat,lon[,source] - точные координаты')
+    cache.add_argument('path', help='файл или - для stdin')
+    commands.add_parser('regeocode', help='пересчитать координаты всех заявок по справочнику и кэшу')
+    route = commands.add_parser('route', help='маршрут исполнителя на день')
+    route.add_argument('assignee_id', type=int)
+    route.add_argument('date', help='YYYY-MM-DD')
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        with connection.cursor(cursor_factory=RealDictCursor) as cur:
+            if args.command in ['load-gazetteer', 'load-cache']:
+                source = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8', newline='')
+                rows = list(csv.DictReader(source))
+                if args.command == 'load-gazetteer':
+                    # ключи нормализуются той же функцией, что и адреса заявок
+                    cur.executemany(
+                        "INSERT INTO t_p89410065_cleaning_service_web.gazetteer (kind, city, name_key, name, location) "
+                        "VALUES (%s, t_p89410065_cleaning_service_web.normalize_address_part(%s), "
+                        "t_p89410065_cleaning_service_web.normalize_address_part(%s), %s, "
+                        "point(%s::float8, %s::float8)) "
+                        "ON CONFLICT (kind, city, name_key) DO UPDATE SET name = EXCLUDED.name, location = EXCLUDED.location",
+                        [(row['kind'], row['city'], row['name'], row['name'], row['lon'], row['lat']) for row in rows]
+                    )
+                else:
+                    cur.executemany(
+                        "INSERT INTO t_p89410065_cleaning_service_web.geocode_cache (address_key, location, source) "
+                        "VALUES (array_to_string(t_p89410065_cleaning_service_web.normalize_address(%s), ', '), "
+                        "point(%s::float8, %s::float8), %s) "
+                        "ON CONFLICT (address_key) DO UPDATE SET location = EXCLUDED.location, "
+                        "source = EXCLUDED.source, updated_at = CURRENT_TIMESTAMP",
+                        [(row['address'], row['lon'], row['lat'], row.get('source') or 'import') for row in rows]
+                    )
+                cur.execute("SELECT t_p89410065_cleaning_service_web.geocode_refresh(FALSE) AS updated")
+                report: Dict[str, Any] = {'loaded': len(rows), 'bookings_updated': cur.fetchone()['updated']}
+            elif args.command == 'regeocode':
+                cur.execute("SELECT t_p89410065_cleaning_service_web.geocode_refresh(FALSE) AS updated")
+                report = {'bookings_updated': cur.fetchone()['updated']}
+            else:
+                report = fetch_route(cur, args.assignee_id, args.date)
+        connection.commit()
+    finally:
+        connection.close()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,179 @@
+'''
+Business: Пул соединений с PostgreSQL, переживающий тёплые вызовы функции
+Args: DATABASE_URL, DB_POOL_MAX_SIZE, DB_POOL_MAX_AGE, DB_POOL_CHECK_INTERVAL, DB_POOL_TIMEOUT из окружения
+Returns: get_pool() - общий пул на уровне модуля, pool_stats() - счётчики hit/miss/wait
+'''
+
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+import psycopg2
+import psycopg2.extensions
+from metrics import add_phase
+
+
+class PoolTimeout(Exception):
+    '''Все соединения заняты дольше DB_POOL_TIMEOUT секунд'''
+
+
+class ConnectionPool:
+    '''Пул соединений: проверка живости, пересоздание по возрасту, метрики'''
+
+    def __init__(self, dsn: str, max_size: int = 5, max_age: float = 300.0,
+                 check_interval: float = 30.0, timeout: float = 5.0) -> None:
+        self.dsn = dsn
+        self.max_size = max_size
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self._idle: List[Tuple[Any, float, float]] = []
+        self._born: Dict[int, float] = {}
+        self._opening = 0
+        self._cond = threading.Condition()
+        self._stats: Dict[str, float] = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_ms': 0.0,
+            'timeouts': 0,
+            'recycled': 0,
+            'broken': 0,
+        }
+
+    def _connect(self) -> Any:
+        conn = psycopg2.connect(self.dsn)
+        with self._cond:
+            self._born[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn: Any) -> None:
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, conn: Any, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self) -> Any:
+        '''Выдаёт соединение из пула или открывает новое; время попадает в фазу connect'''
+        started = time.perf_counter()
+        try:
+            return self._getconn()
+        finally:
+            add_phase('connect', (time.perf_counter() - started) * 1000)
+
+    def _getconn(self) -> Any:
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                while self._idle:
+                    conn, born, last_used = self._idle.pop()
+                    if time.monotonic() - born > self.max_age:
+                        self._stats['recycled'] += 1
+                        self._discard(conn)
+                        continue
+                    if not self._is_alive(conn, last_used):
+                        self._stats['broken'] += 1
+                        self._discard(conn)
+                        continue
+                    self._stats['hits'] += 1
+                    self._note_wait(started, waited)
+                    return conn
+                if len(self._born) + self._opening < self.max_size:
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout('Connection pool exhausted')
+                waited = True
+                self._cond.wait(remaining)
+            self._stats['misses'] += 1
+            self._note_wait(started, waited)
+            # место резервируется, пока соединение открывается вне блокировки
+            self._opening += 1
+        try:
+            conn = self._connect()
+        finally:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+        return conn
+
+    def _note_wait(self, started: float, waited: bool) -> None:
+        if waited:
+            self._stats['waits'] += 1
+            self._stats['wait_ms'] += (time.monotonic() - started) * 1000
+
+    def putconn(self, conn: Any, discard: bool = False) -> None:
+        '''Возвращает соединение в пул; незавершённая транзакция откатывается'''
+        with self._cond:
+            if not discard and not conn.closed:
+                status = conn.info.transaction_status
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        discard = True
+            born = self._born.get(id(conn))
+            if discard or conn.closed or born is None:
+                if born is not None:
+                    self._stats['broken'] += 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, born, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self) -> None:
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            result: Dict[str, Any] = dict(self._stats)
+            result['wait_ms'] = round(result['wait_ms'], 3)
+            result['size'] = len(self._born) + self._opening
+            result['idle'] = len(self._idle)
+            result['max_size'] = self.max_size
+            return result
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    '''Пул создаётся один раз на экземпляр функции и живёт между вызовами'''
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    os.environ['DATABASE_URL'],
+                    max_size=int(os.environ.get('DB_POOL_MAX_SIZE', '5')),
+                    max_age=float(os.environ.get('DB_POOL_MAX_AGE', '300')),
+                    check_interval=float(os.environ.get('DB_POOL_CHECK_INTERVAL', '30')),
+                    timeout=float(os.environ.get('DB_POOL_TIMEOUT', '5')),
+                )
+    return _pool
+
+
+def pool_stats() -> Dict[str, Any]:
+    '''Метрики пула: hits, misses, waits, wait_ms, timeouts, recycled, broken'''
+    if _pool is None:
+        return {}
+    return _pool.stats()
@@ -2,9 +2,58 @@ import json
 import os
 import hashlib
 from typing import Dict, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db import get_pool
+from tokens import issue_token
+from queries import register, execute
+from metrics import instrument, phase
 
+register(
+    'client_exists',
+    "SELECT id FROM t_p89410065_cleaning_service_web.clients WHERE login = %s OR email = %s"
+)
+register(
+    'client_insert',
+    "INSERT INTO t_p89410065_cleaning_service_web.clients (full_name, email, phone, login, password_hash) "
+    "VALUES (%s, %s, %s, %s, %s) RETURNING id, full_name, email, phone, login"
+)
+register(
+    'client_login',
+    "SELECT id, full_name, email, phone, login "
+    "FROM t_p89410065_cleaning_service_web.clients "
+    "WHERE login = %s AND password_hash = %s"
+)
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+# неизменяемые ответы собираются один раз на экземпляр, а не на каждый вызов
+OPTIONS_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': '',
+    'isBase64Encoded': False
+}
+METHOD_NOT_ALLOWED_RESPONSE = {
+    'statusCode': 405,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'Method not allowed'}),
+    'isBase64Encoded': False
+}
+DATABASE_NOT_CONFIGURED_RESPONSE = {
+    'statusCode': 500,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'DATABASE_URL not configured'}),
+    'isBase64Encoded': False
+}
+
+@instrument('client-auth')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Регистрация и авторизация клиентов на главной странице
@@ -15,39 +64,20 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'POST')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return OPTIONS_RESPONSE
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return METHOD_NOT_ALLOWED_RESPONSE
     
-    database_url = os.environ.get('DATABASE_URL')
-    if not database_url:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'DATABASE_URL not configured'}),
-            'isBase64Encoded': False
-        }
+    if not DATABASE_URL:
+        return DATABASE_NOT_CONFIGURED_RESPONSE
     
-    body_data = json.loads(event.get('body', '{}'))
+    with phase('parse'):
+        body_data = json.loads(event.get('body', '{}'))
     action = body_data.get('action')
     
-    conn = psycopg2.connect(database_url)
+    pool = get_pool()
+    conn = pool.getconn()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
@@ -61,45 +91,38 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             if not all([full_name, email, login, password]):
                 return {
                     'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'headers': JSON_HEADERS,
                     'body': json.dumps({'error': 'Все поля обязательны для заполнения'}),
                     'isBase64Encoded': False
                 }
             
-            cursor.execute(
-                "SELECT id FROM t_p89410065_cleaning_service_web.clients "
-                "WHERE login = '" + login.replace("'", "''") + "' OR email = '" + email.replace("'", "''") + "'"
-            )
+            execute(cursor, 'client_exists', (login, email))
             existing = cursor.fetchone()
             
             if existing:
                 return {
                     'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'headers': JSON_HEADERS,
                     'body': json.dumps({'error': 'Пользователь с таким логином или email уже существует'}),
                     'isBase64Encoded': False
                 }
             
             password_hash = hashlib.sha256(password.encode()).hexdigest()
             
-            cursor.execute(
-                "INSERT INTO t_p89410065_cleaning_service_web.clients (full_name, email, phone, login, password_hash) "
-                "VALUES ('" + full_name.replace("'", "''") + "', '" + email.replace("'", "''") + "', '" + 
-                phone.replace("'", "''") + "', '" + login.replace("'", "''") + "', '" + password_hash + "') "
-                "RETURNING id, full_name, email, phone, login"
-            )
+            execute(cursor, 'client_insert', (full_name, email, phone, login, password_hash))
             client = cursor.fetchone()
             conn.commit()
             
             return {
                 'statusCode': 201,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'headers': JSON_HEADERS,
                 'body': json.dumps({
                     'id': client['id'],
                     'full_name': client['full_name'],
                     'email': client['email'],
                     'phone': client['phone'],
-                    'login': client['login']
+                    'login': client['login'],
+                    'token': issue_token(client['id'], 'client', 'client')
                 }),
                 'isBase64Encoded': False
             }
@@ -111,39 +134,35 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             if not login or not password:
                 return {
                     'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'headers': JSON_HEADERS,
                     'body': json.dumps({'error': 'Логин и пароль обязательны'}),
                     'isBase64Encoded': False
                 }
             
             password_hash = hashlib.sha256(password.encode()).hexdigest()
             
-            cursor.execute(
-                "SELECT id, full_name, email, phone, login "
-                "FROM t_p89410065_cleaning_service_web.clients "
-                "WHERE login = '" + login.replace("'", "''") + "' "
-                "AND password_hash = '" + password_hash + "'"
-            )
+            execute(cursor, 'client_login', (login, password_hash))
             
             client = cursor.fetchone()
             
             if not client:
                 return {
                     'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'headers': JSON_HEADERS,
                     'body': json.dumps({'error': 'Неверный логин или пароль'}),
                     'isBase64Encoded': False
                 }
             
             return {
                 'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'headers': JSON_HEADERS,
                 'body': json.dumps({
                     'id': client['id'],
                     'full_name': client['full_name'],
                     'email': client['email'],
                     'phone': client['phone'],
-                    'login': client['login']
+                    'login': client['login'],
+                    'token': issue_token(client['id'], 'client', 'client')
                 }),
                 'isBase64Encoded': False
             }
@@ -151,11 +170,11 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         else:
             return {
                 'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'headers': JSON_HEADERS,
                 'body': json.dumps({'error': 'Invalid action'}),
                 'isBase64Encoded': False
             }
     
     finally:
         cursor.close()
-        conn.close()
+        pool.putconn(conn)
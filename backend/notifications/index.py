@@ -0,0 +1,384 @@
+import hmac
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List
+from psycopg2.extras import RealDictCursor
+from db import get_pool
+from metrics import instrument, phase
+
+BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '50'))
+# одним вызовом не забирается весь outbox: больший batch_size урезается до этого значения
+MAX_BATCH_SIZE = 500
+MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+BACKOFF_BASE_SECONDS = int(os.environ.get('OUTBOX_BACKOFF_BASE', '30'))
+BACKOFF_MAX_SECONDS = int(os.environ.get('OUTBOX_BACKOFF_MAX', '3600'))
+LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', '120'))
+DIGEST_SIZE = int(os.environ.get('MAIL_DIGEST_SIZE', '0'))
+DIGEST_SECONDS = int(os.environ.get('MAIL_DIGEST_SECONDS', '300'))
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+# неизменяемые ответы собираются один раз на экземпляр
+OPTIONS_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, X-Drain-Token',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': '',
+    'isBase64Encoded': False
+}
+METHOD_NOT_ALLOWED_RESPONSE = {
+    'statusCode': 405,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'Method not allowed'}),
+    'isBase64Encoded': False
+}
+FORBIDDEN_RESPONSE = {
+    'statusCode': 403,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'Drain token required'}),
+    'isBase64Encoded': False
+}
+INVALID_BATCH_SIZE_RESPONSE = {
+    'statusCode': 400,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'batch_size must be an integer'}),
+    'isBase64Encoded': False
+}
+
+
+class ChannelNotConfigured(Exception):
+    '''Канал не настроен в окружении - сообщение помечается как skipped'''
+
+
+def render_email(booking_data: Dict[str, Any]) -> str:
+    return f'''
+    <html>
+      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f9f9f9; border-radius: 10px;">
+          <h2 style="color: #00BCD4; border-bottom: 2px solid #00BCD4; padding-bottom: 10px;">
+            Новая заявка на уборку
+          </h2>
+
+          <div style="background-color: white; padding: 20px; border-radius: 8px; margin-top: 20px;">
+            <p><strong>Номер заявки:</strong> #{booking_data["id"]}</p>
+            <p><strong>Клиент:</strong> {booking_data["name"]}</p>
+            <p><strong>Телефон:</strong> {booking_data["phone"]}</p>
+            <p><strong>Email:</strong> {booking_data["email"]}</p>
+            <p><strong>Адрес:</strong> {booking_data["address"]}</p>
+            <p><strong>Площадь:</strong> {booking_data["area"]} м²</p>
+            <p><strong>Тип услуги:</strong> {booking_data["service_type"]}</p>
+            {f'<p><strong>Желаемая дата:</strong> {booking_data["booking_date"]}</p>' if booking_data.get("booking_date") else ''}
+            {f'<p><strong>Желаемое время:</strong> {booking_data["booking_time"]}</p>' if booking_data.get("booking_time") else ''}
+            {f'<p><strong>Комментарий:</strong> {booking_data["comment"]}</p>' if booking_data.get("comment") else ''}
+          </div>
+
+          <div style="margin-top: 20px; padding: 15px; background-color: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
+            <p style="margin: 0;">⚠️ Не забудьте связаться с клиентом в ближайшее время!</p>
+          </div>
+        </div>
+      </body>
+    </html>
+    '''
+
+
+def render_digest(bookings: List[Dict[str, Any]]) -> str:
+    rows = ''.join(
+        f'''
+            <tr>
+              <td style="padding: 6px; border-bottom: 1px solid #eee;">#{b["id"]}</td>
+              <td style="padding: 6px; border-bottom: 1px solid #eee;">{b["name"]}<br>{b["phone"]}</td>
+              <td style="padding: 6px; border-bottom: 1px solid #eee;">{b["address"]}, {b["area"]} м²</td>
+              <td style="padding: 6px; border-bottom: 1px solid #eee;">{b["service_type"]}</td>
+              <td style="padding: 6px; border-bottom: 1px solid #eee;">{b.get("booking_date") or ''} {b.get("booking_time") or ''}</td>
+            </tr>'''
+        for b in bookings
+    )
+    return f'''
+    <html>
+      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 800px; margin: 0 auto; padding: 20px; background-color: #f9f9f9; border-radius: 10px;">
+          <h2 style="color: #00BCD4; border-bottom: 2px solid #00BCD4; padding-bottom: 10px;">
+            Новые заявки на уборку: {len(bookings)}
+          </h2>
+          <table style="width: 100%; background-color: white; border-collapse: collapse; border-radius: 8px;">
+            {rows}
+          </table>
+        </div>
+      </body>
+    </html>
+    '''
+
+
+def render_telegram(booking_data: Dict[str, Any]) -> str:
+    return f'''
+🆕 <b>Новая заявка на уборку #{booking_data["id"]}</b>
+
+👤 <b>Клиент:</b> {booking_data["name"]}
+📞 <b>Телефон:</b> {booking_data["phone"]}
+📧 <b>Email:</b> {booking_data["email"]}
+
+📍 <b>Адрес:</b> {booking_data["address"]}
+📏 <b>Площадь:</b> {booking_data["area"]} м²
+🧹 <b>Тип услуги:</b> {booking_data["service_type"]}
+
+📅 <b>Желаемая дата:</b> {booking_data.get("booking_date", "Не указана")}
+🕐 <b>Желаемое время:</b> {booking_data.get("booking_time", "Не указано")}
+
+💬 <b>Комментарий:</b> {booking_data.get("comment", "Нет комментария")}
+'''
+
+
+def build_admin_email(subject: str, html_content: str) -> Any:
+    # email.mime и smtplib (через mailer) нужны только при отправке - пустой прогон outbox их не грузит
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
+    admin_email = os.environ.get('ADMIN_EMAIL')
+    if not os.environ.get('SMTP_HOST') or not admin_email:
+        raise ChannelNotConfigured('SMTP is not configured')
+
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = os.environ.get('SMTP_USER') or admin_email
+    msg['To'] = admin_email
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+
+def send_notification_email(booking_data: Dict[str, Any]) -> None:
+    '''Отправка email уведомления администратору о новой заявке'''
+    from mailer import get_mailer
+    msg = build_admin_email(f'Новая заявка на уборку #{booking_data["id"]}', render_email(booking_data))
+    get_mailer().send(msg)
+
+
+def send_digest_email(bookings: List[Dict[str, Any]]) -> None:
+    '''Одно письмо-дайджест на несколько новых заявок'''
+    from mailer import get_mailer
+    msg = build_admin_email(f'Новые заявки на уборку: {len(bookings)}', render_digest(bookings))
+    get_mailer().send(msg)
+
+
+def send_telegram_notification(booking_data: Dict[str, Any]) -> None:
+    '''Отправка уведомления в Telegram о новой заявке'''
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    chat_id = os.environ.get('TELEGRAM_CHAT_ID')
+    api_url = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+
+    if not bot_token or not chat_id:
+        raise ChannelNotConfigured('Telegram is not configured')
+
+    import urllib.parse
+    import urllib.request
+
+    data = {
+        'chat_id': chat_id,
+        'text': render_telegram(booking_data),
+        'parse_mode': 'HTML'
+    }
+    data_encoded = urllib.parse.urlencode(data).encode('utf-8')
+    req = urllib.request.Request(f'{api_url}/bot{bot_token}/sendMessage', data=data_encoded)
+    with urllib.request.urlopen(req, timeout=10) as response:
+        response.read()
+
+
+SENDERS = {
+    'email': send_notification_email,
+    'telegram': send_telegram_notification,
+}
+
+
+def backoff_seconds(attempts: int) -> int:
+    '''Экспоненциальная задержка перед следующей попыткой: 30с, 60с, 120с ... до часа'''
+    return min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+
+
+def claim_batch(conn: Any, batch_size: int) -> List[Dict[str, Any]]:
+    '''Забирает пачку готовых к отправке сообщений, продлевая их аренду на LEASE_SECONDS'''
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        with phase('query', 'outbox_claim'):
+            cursor.execute(
+                "UPDATE t_p89410065_cleaning_service_web.notification_outbox "
+                "SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s) "
+                "WHERE id IN ("
+                "  SELECT id FROM t_p89410065_cleaning_service_web.notification_outbox "
+                "  WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP "
+                "  ORDER BY next_attempt_at, id LIMIT %s FOR UPDATE SKIP LOCKED"
+                ") RETURNING id, channel, payload, attempts, "
+                "EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - created_at) AS age_seconds",
+                (LEASE_SECONDS, batch_size)
+            )
+        rows = cursor.fetchall()
+    conn.commit()
+    return rows
+
+
+def mark_sent(cursor: Any, ids: List[int]) -> None:
+    cursor.execute(
+        "UPDATE t_p89410065_cleaning_service_web.notification_outbox "
+        "SET status = 'sent', attempts = attempts + 1, last_error = NULL, "
+        "sent_at = CURRENT_TIMESTAMP WHERE id = ANY(%s)",
+        (ids,)
+    )
+
+
+def mark_failed(cursor: Any, row: Dict[str, Any], error: Exception, summary: Dict[str, int]) -> None:
+    '''Планирует повтор с backoff или переводит сообщение в dead-letter'''
+    if isinstance(error, ChannelNotConfigured):
+        cursor.execute(
+            "UPDATE t_p89410065_cleaning_service_web.notification_outbox "
+            "SET status = 'skipped', last_error = %s WHERE id = %s",
+            (str(error), row['id'])
+        )
+        summary['skipped'] += 1
+        return
+
+    attempts = row['attempts'] + 1
+    message = f'{type(error).__name__}: {error}'
+    if attempts >= MAX_ATTEMPTS:
+        cursor.execute(
+            "UPDATE t_p89410065_cleaning_service_web.notification_outbox "
+            "SET status = 'dead', attempts = %s, last_error = %s WHERE id = %s",
+            (attempts, message, row['id'])
+        )
+        summary['dead'] += 1
+    else:
+        cursor.execute(
+            "UPDATE t_p89410065_cleaning_service_web.notification_outbox "
+            "SET attempts = %s, last_error = %s, "
+            "next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s) "
+            "WHERE id = %s",
+            (attempts, message, backoff_seconds(attempts), row['id'])
+        )
+        summary['retried'] += 1
+
+
+def dispatch_digest(conn: Any, cursor: Any, rows: List[Dict[str, Any]], summary: Dict[str, int]) -> None:
+    '''Собирает email-уведомления в дайджесты по DIGEST_SIZE заявок или DIGEST_SECONDS ожидания'''
+    oldest_age = max(float(row['age_seconds']) for row in rows)
+    if oldest_age < DIGEST_SECONDS:
+        # окно дайджеста ещё не закрыто - неполная группа ждёт в очереди до его окончания
+        ready = len(rows) - len(rows) % DIGEST_SIZE
+        waiting = rows[ready:]
+        rows = rows[:ready]
+        if waiting:
+            cursor.execute(
+                "UPDATE t_p89410065_cleaning_service_web.notification_outbox "
+                "SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s) WHERE id = ANY(%s)",
+                (DIGEST_SECONDS - oldest_age, [row['id'] for row in waiting])
+            )
+            conn.commit()
+            summary['deferred'] += len(waiting)
+
+    for start in range(0, len(rows), DIGEST_SIZE):
+        group = rows[start:start + DIGEST_SIZE]
+        try:
+            with phase('notify', 'digest'):
+                send_digest_email([row['payload'] for row in group])
+        except Exception as e:
+            for row in group:
+                mark_failed(cursor, row, e, summary)
+        else:
+            mark_sent(cursor, [row['id'] for row in group])
+            summary['sent'] += len(group)
+            summary['digests'] += 1
+        conn.commit()
+
+
+def drain_outbox(batch_size: int = BATCH_SIZE) -> Dict[str, Any]:
+    '''Отправляет одну пачку сообщений из outbox: повторы с backoff, dead-letter после MAX_ATTEMPTS'''
+    pool = get_pool()
+    conn = pool.getconn()
+    summary = {'claimed': 0, 'sent': 0, 'skipped': 0, 'retried': 0, 'dead': 0, 'deferred': 0, 'digests': 0}
+
+    try:
+        rows = claim_batch(conn, batch_size)
+        summary['claimed'] = len(rows)
+
+        with conn.cursor() as cursor:
+            if DIGEST_SIZE > 1:
+                email_rows = [row for row in rows if row['channel'] == 'email']
+                rows = [row for row in rows if row['channel'] != 'email']
+                if email_rows:
+                    dispatch_digest(conn, cursor, email_rows, summary)
+
+            for row in rows:
+                try:
+                    with phase('notify'):
+                        SENDERS[row['channel']](row['payload'])
+                except Exception as e:
+                    mark_failed(cursor, row, e, summary)
+                else:
+                    mark_sent(cursor, [row['id']])
+                    summary['sent'] += 1
+                conn.commit()
+    finally:
+        pool.putconn(conn)
+
+    result: Dict[str, Any] = dict(summary)
+    # счётчики SMTP есть, только если в этом экземпляре уже что-то отправлялось
+    mailer = sys.modules.get('mailer')
+    result['mailer'] = mailer.mailer_stats() if mailer else {}
+    return result
+
+
+@instrument('notifications')
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Диспетчер уведомлений о новых заявках (email, Telegram) из transactional outbox
+    Args: event - dict с httpMethod, queryStringParameters (batch_size до MAX_BATCH_SIZE),
+          headers (X-Drain-Token, равный OUTBOX_DRAIN_TOKEN из окружения; без него вызов запрещён)
+          context - объект с атрибутами request_id, function_name
+    Returns: HTTP response со сводкой обработанной пачки
+    '''
+    method: str = event.get('httpMethod', 'POST')
+
+    if method == 'OPTIONS':
+        return OPTIONS_RESPONSE
+
+    if method != 'POST':
+        return METHOD_NOT_ALLOWED_RESPONSE
+
+    token = os.environ.get('OUTBOX_DRAIN_TOKEN')
+    headers = event.get('headers') or {}
+    supplied = str(headers.get('X-Drain-Token') or '')
+    if not token or not hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+        return FORBIDDEN_RESPONSE
+
+    query_params = event.get('queryStringParameters') or {}
+    try:
+        batch_size = min(max(int(query_params.get('batch_size') or BATCH_SIZE), 1), MAX_BATCH_SIZE)
+    except ValueError:
+        return INVALID_BATCH_SIZE_RESPONSE
+    summary = drain_outbox(batch_size)
+
+    return {
+        'statusCode': 200,
+        'headers': JSON_HEADERS,
+        'body': json.dumps(summary),
+        'isBase64Encoded': False
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Диспетчер outbox-уведомлений')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--interval', type=float, default=5.0, help='пауза между пустыми пачками, сек')
+    parser.add_argument('--once', action='store_true', help='обработать одну пачку и выйти')
+    args = parser.parse_args()
+
+    while True:
+        result = drain_outbox(args.batch_size)
+        print(json.dumps(result), flush=True)
+        if args.once:
+            break
+        if result['claimed'] < args.batch_size:
+            time.sleep(args.interval)
@@ -0,0 +1,130 @@
+'''
+Business: SMTP-отправитель с постоянной авторизованной сессией между письмами и вызовами
+Args: SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_STARTTLS, SMTP_IDLE_CHECK из окружения
+Returns: get_mailer() - общий экземпляр на уровне модуля, mailer_stats() - счётчики отправки
+'''
+
+import os
+import smtplib
+import socket
+import threading
+import time
+from email.message import Message
+from typing import Dict, Any, Optional
+
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+
+
+class Mailer:
+    '''Держит одну SMTP-сессию (STARTTLS + login) и переподключается при обрыве'''
+
+    def __init__(self, host: str, port: int = 587, user: Optional[str] = None,
+                 password: Optional[str] = None, starttls: bool = True,
+                 idle_check: float = 30.0, timeout: float = 10.0) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.idle_check = idle_check
+        self.timeout = timeout
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            'messages_sent': 0,
+            'connects': 0,
+            'reconnects': 0,
+            'failures': 0,
+        }
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        self._stats['connects'] += 1
+        return server
+
+    def _drop(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+        self._server = None
+
+    def _session(self) -> smtplib.SMTP:
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_check:
+            try:
+                if self._server.noop()[0] != 250:
+                    self._drop()
+            except Exception:
+                self._drop()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def send(self, msg: Message) -> None:
+        '''Отправляет письмо в текущей сессии; при обрыве один раз переподключается'''
+        with self._lock:
+            for attempt in range(2):
+                reused = self._server is not None
+                try:
+                    self._session().send_message(msg)
+                except RECONNECT_ERRORS:
+                    self._drop()
+                    if attempt or not reused:
+                        self._stats['failures'] += 1
+                        raise
+                    self._stats['reconnects'] += 1
+                    continue
+                except Exception:
+                    self._stats['failures'] += 1
+                    raise
+                self._last_used = time.monotonic()
+                self._stats['messages_sent'] += 1
+                return
+
+    def close(self) -> None:
+        with self._lock:
+            if self._server is not None:
+                try:
+                    self._server.quit()
+                except Exception:
+                    pass
+            self._server = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result: Dict[str, Any] = dict(self._stats)
+            result['connected'] = self._server is not None
+            return result
+
+
+_mailer: Optional[Mailer] = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer() -> Mailer:
+    '''Экземпляр создаётся один раз и переиспользует сессию между тёплыми вызовами'''
+    global _mailer
+    if _mailer is None:
+        with _mailer_lock:
+            if _mailer is None:
+                _mailer = Mailer(
+                    os.environ['SMTP_HOST'],
+                    port=int(os.environ.get('SMTP_PORT', '587')),
+                    user=os.environ.get('SMTP_USER'),
+                    password=os.environ.get('SMTP_PASSWORD'),
+                    starttls=os.environ.get('SMTP_STARTTLS', 'true').lower() == 'true',
+                    idle_check=float(os.environ.get('SMTP_IDLE_CHECK', '30')),
+                )
+    return _mailer
+
+
+def mailer_stats() -> Dict[str, Any]:
+    if _mailer is None:
+        return {}
+    return _mailer.stats()
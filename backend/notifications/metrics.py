@@ -0,0 +1,238 @@
+'''
+Business: Замер фаз обработки запроса (parse, connect, query, serialize, notify), гистограммы задержек и экспорт метрик
+Args: @instrument('bookings') над handler; with phase('parse'): ... внутри; METRICS_TOKEN - обязателен для action=metrics
+Returns: JSON-строка лога на каждый вызов с request_id; GET ?action=metrics - формат Prometheus или format=json с p50/p99
+'''
+
+import functools
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+ACTION_RE = re.compile(r'^[a-z_]{1,20}$')
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, str, str, str], 'Histogram'] = {}
+_requests: Dict[Tuple[str, str, str, str], int] = {}
+
+
+class Histogram:
+    '''Накопительная гистограмма в миллисекундах с границами BUCKETS_MS'''
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value_ms: float) -> None:
+        for index, bound in enumerate(BUCKETS_MS):
+            if value_ms <= bound:
+                break
+        else:
+            index = len(BUCKETS_MS)
+        self.counts[index] += 1
+        self.total += value_ms
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        '''Оценка квантиля линейной интерполяцией внутри бакета, как histogram_quantile в Prometheus'''
+        if not self.count:
+            return None
+        return round(self._quantile(q), 3)
+
+    def _quantile(self, q: float) -> float:
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKETS_MS[index - 1] if index > 0 else 0.0
+                if index == len(BUCKETS_MS):
+                    return float(BUCKETS_MS[-1])
+                return lower + (BUCKETS_MS[index] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return float(BUCKETS_MS[-1])
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = {}
+        self.queries: List[Dict[str, Any]] = []
+
+
+def add_phase(name: str, elapsed_ms: float, detail: Optional[str] = None) -> None:
+    '''Добавляет время к фазе текущего запроса; вне instrument() ничего не делает'''
+    recorder: Optional[_Recorder] = getattr(_local, 'recorder', None)
+    if recorder is None:
+        return
+    recorder.phases[name] = recorder.phases.get(name, 0.0) + elapsed_ms
+    if name == 'query':
+        recorder.queries.append({'name': detail or 'sql', 'ms': round(elapsed_ms, 3)})
+
+
+@contextmanager
+def phase(name: str, detail: Optional[str] = None) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, (time.perf_counter() - started) * 1000, detail)
+
+
+def _observe(key: Tuple[str, str, str, str], value_ms: float) -> None:
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram()
+    histogram.observe(value_ms)
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _optional_stats() -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    '''Метрики пула и подготовленных запросов, если эти модули есть в функции'''
+    pool: Dict[str, Any] = {}
+    statements: Dict[str, Dict[str, Any]] = {}
+    try:
+        from db import pool_stats
+        pool = pool_stats()
+    except ImportError:
+        pass
+    try:
+        from queries import query_stats
+        statements = query_stats()
+    except ImportError:
+        pass
+    return pool, statements
+
+
+def render_prometheus() -> str:
+    lines: List[str] = [
+        '# HELP handler_requests_total Handled requests by function, method, action and status class',
+        '# TYPE handler_requests_total counter',
+    ]
+    with _lock:
+        for (function, method, action, status), count in sorted(_requests.items()):
+            lines.append(
+                f'handler_requests_total{{function="{function}",method="{method}",'
+                f'action="{_label(action)}",status="{status}"}} {count}'
+            )
+        lines.append('# HELP handler_phase_duration_seconds Time spent per request phase')
+        lines.append('# TYPE handler_phase_duration_seconds histogram')
+        for (function, method, action, phase_name), histogram in sorted(_histograms.items()):
+            labels = (f'function="{function}",method="{method}",action="{_label(action)}",'
+                      f'phase="{phase_name}"')
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS_MS, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'handler_phase_duration_seconds_bucket{{{labels},le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'handler_phase_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'handler_phase_duration_seconds_sum{{{labels}}} {histogram.total / 1000:.6f}')
+            lines.append(f'handler_phase_duration_seconds_count{{{labels}}} {histogram.count}')
+
+    pool, statements = _optional_stats()
+    if pool:
+        lines.append('# TYPE db_pool gauge')
+        for name, value in sorted(pool.items()):
+            lines.append(f'db_pool{{stat="{name}"}} {value}')
+    if statements:
+        lines.append('# TYPE db_statement_calls_total counter')
+        for name, entry in sorted(statements.items()):
+            lines.append(f'db_statement_calls_total{{statement="{name}"}} {entry["calls"]}')
+        lines.append('# TYPE db_statement_duration_seconds_sum counter')
+        for name, entry in sorted(statements.items()):
+            lines.append(f'db_statement_duration_seconds_sum{{statement="{name}"}} {entry["total_ms"] / 1000:.6f}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_json() -> Dict[str, Any]:
+    endpoints: Dict[str, Dict[str, Any]] = {}
+    with _lock:
+        for (function, method, action, phase_name), histogram in sorted(_histograms.items()):
+            endpoint = endpoints.setdefault(f'{function} {method} {action}'.strip(), {})
+            endpoint[phase_name] = {
+                'count': histogram.count,
+                'avg_ms': round(histogram.total / histogram.count, 3) if histogram.count else None,
+                'p50_ms': histogram.quantile(0.5),
+                'p99_ms': histogram.quantile(0.99),
+            }
+    pool, statements = _optional_stats()
+    return {'endpoints': endpoints, 'pool': pool, 'statements': statements}
+
+
+def metrics_response(event: Dict[str, Any]) -> Dict[str, Any]:
+    '''Метрики отдаются только с X-Metrics-Token; без METRICS_TOKEN в окружении action=metrics закрыт'''
+    token = os.environ.get('METRICS_TOKEN')
+    headers = event.get('headers') or {}
+    supplied = str(headers.get('X-Metrics-Token') or '')
+    if not token or not hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+        return {
+            'statusCode': 403,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Metrics token required'}),
+            'isBase64Encoded': False
+        }
+    if (event.get('queryStringParameters') or {}).get('format') == 'json':
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps(render_json()),
+            'isBase64Encoded': False
+        }
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'text/plain; version=0.0.4', 'Access-Control-Allow-Origin': '*'},
+        'body': render_prometheus(),
+        'isBase64Encoded': False
+    }
+
+
+def instrument(function_name: str) -> Callable:
+    '''Декоратор handler: общая длительность и фазы в гистограммы, одна строка JSON-лога на вызов'''
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapped(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            method = event.get('httpMethod', 'GET')
+            action = (event.get('queryStringParameters') or {}).get('action') or ''
+            if method == 'GET' and action == 'metrics':
+                return metrics_response(event)
+            if not ACTION_RE.match(action):
+                action = '' if not action else 'other'
+
+            recorder = _local.recorder = _Recorder()
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = handler(event, context)
+                status = response.get('statusCode', 200)
+                return response
+            finally:
+                total_ms = (time.perf_counter() - started) * 1000
+                _local.recorder = None
+                with _lock:
+                    status_key = (function_name, method, action, f'{status // 100}xx')
+                    _requests[status_key] = _requests.get(status_key, 0) + 1
+                    _observe((function_name, method, action, 'total'), total_ms)
+                    for phase_name, value_ms in recorder.phases.items():
+                        _observe((function_name, method, action, phase_name), value_ms)
+                print(json.dumps({
+                    'event': 'request',
+                    'request_id': getattr(context, 'request_id', None),
+                    'function': function_name,
+                    'method': method,
+                    'action': action or None,
+                    'status': status,
+                    'total_ms': round(total_ms, 3),
+                    'phases': {name: round(value, 3) for name, value in recorder.phases.items()},
+                    'queries': recorder.queries
+                }), flush=True)
+        return wrapped
+    return decorator
@@ -0,0 +1,321 @@
+'''
+Business: Проверки диспетчера outbox с настоящей отправкой - локальный SMTP-приёмник и заглушка Telegram API
+Args: запуск из backend/notifications: python -m pytest -q; PostgreSQL не нужен - outbox в памяти
+Returns: результат pytest - доставка, повтор с backoff, dead-letter, skipped и дайджесты
+'''
+
+import email
+import email.policy
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List
+from urllib.parse import parse_qs
+import pytest
+import index
+import mailer
+
+BOOKING = {
+    'id': 101, 'name': 'Иван', 'phone': '+79990000000', 'email': 'ivan@example.com',
+    'address': 'Москва, ул. Ленина, 1', 'area': 60, 'service_type': 'apartment'
+}
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    '''Минимальный SMTP-сервер без TLS: складывает письма в messages или отвечает 451 на DATA'''
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), SmtpSession)
+        self.messages: List[email.message.EmailMessage] = []
+        self.reject = False
+
+
+class SmtpSession(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self) -> None:
+        self.reply('220 sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 sink')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                data = []
+                for raw in iter(self.rfile.readline, b''):
+                    if raw in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(raw[1:] if raw.startswith(b'..') else raw)
+                if self.server.reject:
+                    self.reply('451 try again later')
+                else:
+                    self.server.messages.append(email.message_from_bytes(b''.join(data), policy=email.policy.default))
+                    self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class TelegramStub(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, {k: v[0] for k, v in parse_qs(body.decode('utf-8')).items()}))
+        status = self.server.status
+        data = json.dumps({'ok': status == 200}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeOutbox:
+    '''notification_outbox в памяти: разбирает UPDATE диспетчера и хранит статусы строк'''
+
+    def __init__(self, rows: List[Dict[str, Any]]) -> None:
+        self.rows = {row['id']: row for row in rows}
+        self.backoffs: Dict[int, float] = {}
+        self.commits = 0
+
+    def getconn(self) -> 'FakeOutbox':
+        return self
+
+    def putconn(self, conn: Any, discard: bool = False) -> None:
+        pass
+
+    def commit(self) -> None:
+        self.commits += 1
+
+    def cursor(self, cursor_factory: Any = None) -> 'FakeCursor':
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, outbox: FakeOutbox) -> None:
+        self.outbox = outbox
+        self.result: List[Dict[str, Any]] = []
+
+    def __enter__(self) -> 'FakeCursor':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+    def execute(self, sql: str, params: Any = ()) -> None:
+        rows = self.outbox.rows
+        if 'RETURNING' in sql:
+            limit = params[1]
+            self.result = [dict(row) for row in rows.values() if row['status'] == 'pending'][:limit]
+        elif "status = 'sent'" in sql:
+            for row_id in params[0]:
+                rows[row_id].update(status='sent', attempts=rows[row_id]['attempts'] + 1)
+        elif "status = 'skipped'" in sql:
+            rows[params[1]].update(status='skipped', last_error=params[0])
+        elif "status = 'dead'" in sql:
+            rows[params[2]].update(status='dead', attempts=params[0], last_error=params[1])
+        elif 'SET attempts' in sql:
+            rows[params[3]].update(status='retry', attempts=params[0], last_error=params[1])
+            self.outbox.backoffs[params[3]] = params[2]
+        else:
+            for row_id in params[1]:
+                rows[row_id]['status'] = 'deferred'
+
+    def fetchall(self) -> List[Dict[str, Any]]:
+        return self.result
+
+
+def outbox_row(row_id: int, channel: str, attempts: int = 0, age_seconds: float = 0.0) -> Dict[str, Any]:
+    return {'id': row_id, 'channel': channel, 'payload': dict(BOOKING, id=row_id), 'attempts': attempts,
+            'age_seconds': age_seconds, 'status': 'pending'}
+
+
+@pytest.fixture
+def smtp_sink(monkeypatch):
+    sink = SmtpSink()
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    monkeypatch.setenv('SMTP_HOST', '127.0.0.1')
+    monkeypatch.setenv('SMTP_PORT', str(sink.server_address[1]))
+    monkeypatch.setenv('SMTP_STARTTLS', 'false')
+    monkeypatch.setenv('ADMIN_EMAIL', 'admin@example.com')
+    monkeypatch.setattr(mailer, '_mailer', None)
+    yield sink
+    if mailer._mailer is not None:
+        mailer._mailer.close()
+    sink.shutdown()
+    sink.server_close()
+
+
+@pytest.fixture
+def telegram_stub(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), TelegramStub)
+    server.requests = []
+    server.status = 200
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('TELEGRAM_API_URL', f'http://127.0.0.1:{server.server_address[1]}')
+    monkeypatch.setenv('TELEGRAM_BOT_TOKEN', 'test-token')
+    monkeypatch.setenv('TELEGRAM_CHAT_ID', '42')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    def install(rows: List[Dict[str, Any]]) -> FakeOutbox:
+        fake = FakeOutbox(rows)
+        monkeypatch.setattr(index, 'get_pool', lambda: fake)
+        return fake
+    monkeypatch.setattr(index, 'DIGEST_SIZE', 0)
+    return install
+
+
+def test_email_and_telegram_delivered(smtp_sink, telegram_stub, outbox):
+    fake = outbox([outbox_row(1, 'email'), outbox_row(2, 'telegram')])
+
+    summary = index.drain_outbox(10)
+
+    assert summary['claimed'] == 2
+    assert summary['sent'] == 2
+    assert fake.rows[1]['status'] == 'sent'
+    assert fake.rows[2]['status'] == 'sent'
+    assert len(smtp_sink.messages) == 1
+    assert smtp_sink.messages[0]['Subject'] == 'Новая заявка на уборку #1'
+    assert smtp_sink.messages[0]['To'] == 'admin@example.com'
+    path, form = telegram_stub.requests[0]
+    assert path == '/bottest-token/sendMessage'
+    assert form['chat_id'] == '42'
+    assert '#2' in form['text']
+    assert summary['mailer']['messages_sent'] == 1
+
+
+def test_mailer_session_is_reused_between_batches(smtp_sink, outbox):
+    outbox([outbox_row(1, 'email'), outbox_row(2, 'email')])
+    index.drain_outbox(10)
+    outbox([outbox_row(3, 'email')])
+
+    summary = index.drain_outbox(10)
+
+    assert len(smtp_sink.messages) == 3
+    assert summary['mailer']['connects'] == 1
+
+
+def test_failed_delivery_is_retried_with_backoff(smtp_sink, telegram_stub, outbox):
+    smtp_sink.reject = True
+    telegram_stub.status = 500
+    fake = outbox([outbox_row(1, 'email'), outbox_row(2, 'telegram', attempts=2)])
+
+    summary = index.drain_outbox(10)
+
+    assert summary['retried'] == 2
+    assert summary['sent'] == 0
+    assert fake.rows[1]['attempts'] == 1
+    assert fake.rows[1]['last_error'].startswith('SMTPDataError')
+    assert fake.rows[2]['attempts'] == 3
+    assert fake.rows[2]['last_error'].startswith('HTTPError')
+    assert fake.backoffs == {1: index.backoff_seconds(1), 2: index.backoff_seconds(3)}
+    assert index.backoff_seconds(3) == 4 * index.backoff_seconds(1)
+
+
+def test_last_attempt_goes_to_dead_letter(smtp_sink, telegram_stub, outbox):
+    smtp_sink.reject = True
+    telegram_stub.status = 503
+    last = index.MAX_ATTEMPTS - 1
+    fake = outbox([outbox_row(1, 'email', attempts=last), outbox_row(2, 'telegram', attempts=last)])
+
+    summary = index.drain_outbox(10)
+
+    assert summary['dead'] == 2
+    assert fake.rows[1]['status'] == 'dead'
+    assert fake.rows[2]['status'] == 'dead'
+    assert fake.rows[1]['attempts'] == index.MAX_ATTEMPTS
+    assert fake.backoffs == {}
+
+
+def test_unconfigured_channel_is_skipped(outbox, monkeypatch):
+    monkeypatch.delenv('TELEGRAM_BOT_TOKEN', raising=False)
+    monkeypatch.delenv('TELEGRAM_CHAT_ID', raising=False)
+    fake = outbox([outbox_row(1, 'telegram')])
+
+    summary = index.drain_outbox(10)
+
+    assert summary['skipped'] == 1
+    assert fake.rows[1]['status'] == 'skipped'
+
+
+def test_digest_groups_emails_after_window(smtp_sink, outbox, monkeypatch):
+    monkeypatch.setattr(index, 'DIGEST_SIZE', 2)
+    age = index.DIGEST_SECONDS + 1
+    fake = outbox([outbox_row(row_id, 'email', age_seconds=age) for row_id in (1, 2, 3)])
+
+    summary = index.drain_outbox(10)
+
+    assert summary['sent'] == 3
+    assert summary['digests'] == 2
+    assert [message['Subject'] for message in smtp_sink.messages] == [
+        'Новые заявки на уборку: 2', 'Новые заявки на уборку: 1'
+    ]
+    assert all(row['status'] == 'sent' for row in fake.rows.values())
+
+
+def test_digest_defers_incomplete_group_inside_window(smtp_sink, outbox, monkeypatch):
+    monkeypatch.setattr(index, 'DIGEST_SIZE', 2)
+    fake = outbox([outbox_row(row_id, 'email', age_seconds=10) for row_id in (1, 2, 3)])
+
+    summary = index.drain_outbox(10)
+
+    assert summary['sent'] == 2
+    assert summary['digests'] == 1
+    assert summary['deferred'] == 1
+    assert fake.rows[3]['status'] == 'deferred'
+    assert len(smtp_sink.messages) == 1
+
+
+def test_failed_digest_retries_every_booking(smtp_sink, outbox, monkeypatch):
+    monkeypatch.setattr(index, 'DIGEST_SIZE', 2)
+    smtp_sink.reject = True
+    age = index.DIGEST_SECONDS + 1
+    fake = outbox([outbox_row(row_id, 'email', age_seconds=age) for row_id in (1, 2)])
+
+    summary = index.drain_outbox(10)
+
+    assert summary['retried'] == 2
+    assert summary['digests'] == 0
+    assert [row['status'] for row in fake.rows.values()] == ['retry', 'retry']
+
+
+def drain_event(batch_size: str, token: str = 'drain-secret') -> Dict[str, Any]:
+    return {'httpMethod': 'POST', 'queryStringParameters': {'batch_size': batch_size},
+            'headers': {'X-Drain-Token': token}}
+
+
+def test_drain_requires_token(outbox, monkeypatch):
+    outbox([outbox_row(1, 'telegram')])
+    monkeypatch.delenv('OUTBOX_DRAIN_TOKEN', raising=False)
+    assert index.handler(drain_event('10'), None)['statusCode'] == 403
+    monkeypatch.setenv('OUTBOX_DRAIN_TOKEN', 'drain-secret')
+    assert index.handler(drain_event('10', token='wrong'), None)['statusCode'] == 403
+    assert index.handler(drain_event('10', token='тест'), None)['statusCode'] == 403
+
+
+def test_drain_batch_size_is_validated_and_clamped(outbox, monkeypatch):
+    monkeypatch.setenv('OUTBOX_DRAIN_TOKEN', 'drain-secret')
+    monkeypatch.delenv('TELEGRAM_BOT_TOKEN', raising=False)
+    claimed: List[int] = []
+    monkeypatch.setattr(index, 'drain_outbox', lambda batch_size: claimed.append(batch_size) or {})
+
+    assert index.handler(drain_event('abc'), None)['statusCode'] == 400
+    for value in ('-5', '0', '100000', '25'):
+        assert index.handler(drain_event(value), None)['statusCode'] == 200
+    assert claimed == [1, 1, index.MAX_BATCH_SIZE, 25]
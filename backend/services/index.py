@@ -1,8 +1,84 @@
 import json
 import os
-import psycopg2
-from typing import Dict, Any
+import time
+import hashlib
+from typing import Dict, Any, Optional
+from db import get_pool
+from metrics import instrument, phase
 
+CATALOG_TTL_SECONDS = float(os.environ.get('SERVICES_CACHE_TTL', '60'))
+CATALOG_CACHE_CONTROL = os.environ.get('SERVICES_CACHE_CONTROL', 'public, max-age=60')
+
+_catalog_version = 0
+_catalog_cache: Dict[str, Any] = {'version': -1, 'expires': 0.0, 'body': '', 'etag': ''}
+
+def bump_catalog_version() -> None:
+    '''Сбрасывает кэш каталога после POST/PUT/DELETE'''
+    global _catalog_version
+    _catalog_version += 1
+
+def cached_catalog() -> Optional[Dict[str, Any]]:
+    if _catalog_cache['version'] != _catalog_version or _catalog_cache['expires'] < time.monotonic():
+        return None
+    return _catalog_cache
+
+def store_catalog(body: str, version: int) -> Dict[str, Any]:
+    _catalog_cache.update({
+        'version': version,
+        'expires': time.monotonic() + CATALOG_TTL_SECONDS,
+        'body': body,
+        'etag': '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+    })
+    return _catalog_cache
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+def catalog_response(event: Dict[str, Any], catalog: Dict[str, Any]) -> Dict[str, Any]:
+    '''200 с каталогом или 304, если у клиента актуальная версия по ETag'''
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    response_headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'ETag',
+        'Cache-Control': CATALOG_CACHE_CONTROL,
+        'ETag': catalog['etag']
+    }
+    if etag_matches(headers.get('if-none-match'), catalog['etag']):
+        return {
+            'statusCode': 304,
+            'headers': response_headers,
+            'isBase64Encoded': False,
+            'body': ''
+        }
+    return {
+        'statusCode': 200,
+        'headers': response_headers,
+        'isBase64Encoded': False,
+        'body': catalog['body']
+    }
+
+# неизменяемые ответы собираются один раз на экземпляр
+OPTIONS_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, If-None-Match',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': ''
+}
+METHOD_NOT_ALLOWED_RESPONSE = {
+    'statusCode': 405,
+    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+    'body': json.dumps({'error': 'Method not allowed'})
+}
+
+@instrument('services')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: API для управления услугами в админ-панели
@@ -12,23 +88,22 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
+        return OPTIONS_RESPONSE
+    
+    if method == 'GET':
+        catalog = cached_catalog()
+        if catalog:
+            return catalog_response(event, catalog)
     
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    pool = get_pool()
+    conn = pool.getconn()
     cur = conn.cursor()
     
     try:
         if method == 'GET':
-            cur.execute('SELECT id, title, description, icon, price FROM services ORDER BY id')
+            version = _catalog_version
+            with phase('query', 'services_list'):
+                cur.execute('SELECT id, title, description, icon, price FROM services ORDER BY id')
             rows = cur.fetchall()
             services = [
                 {
@@ -41,29 +116,25 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 for row in rows
             ]
             
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'isBase64Encoded': False,
-                'body': json.dumps(services)
-            }
+            catalog = store_catalog(json.dumps(services), version)
+            return catalog_response(event, catalog)
         
         elif method == 'POST':
-            body_data = json.loads(event.get('body', '{}'))
+            with phase('parse'):
+                body_data = json.loads(event.get('body', '{}'))
             title = body_data.get('title')
             description = body_data.get('description')
             icon = body_data.get('icon', 'Building2')
             price = body_data.get('price')
             
-            cur.execute(
-                'INSERT INTO services (title, description, icon, price) VALUES (%s, %s, %s, %s) RETURNING id',
-                (title, description, icon, price)
-            )
+            with phase('query', 'services_insert'):
+                cur.execute(
+                    'INSERT INTO services (title, description, icon, price) VALUES (%s, %s, %s, %s) RETURNING id',
+                    (title, description, icon, price)
+                )
             service_id = cur.fetchone()[0]
             conn.commit()
+            bump_catalog_version()
             
             return {
                 'statusCode': 201,
@@ -86,17 +157,20 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Missing service id'})
                 }
             
-            body_data = json.loads(event.get('body', '{}'))
+            with phase('parse'):
+                body_data = json.loads(event.get('body', '{}'))
             title = body_data.get('title')
             description = body_data.get('description')
             icon = body_data.get('icon')
             price = body_data.get('price')
             
-            cur.execute(
-                'UPDATE services SET title = %s, description = %s, icon = %s, price = %s WHERE id = %s',
-                (title, description, icon, price, service_id)
-            )
+            with phase('query', 'services_update'):
+                cur.execute(
+                    'UPDATE services SET title = %s, description = %s, icon = %s, price = %s WHERE id = %s',
+                    (title, description, icon, price, service_id)
+                )
             conn.commit()
+            bump_catalog_version()
             
             return {
                 'statusCode': 200,
@@ -119,8 +193,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Missing service id'})
                 }
             
-            cur.execute('DELETE FROM services WHERE id = %s', (service_id,))
+            with phase('query', 'services_delete'):
+                cur.execute('DELETE FROM services WHERE id = %s', (service_id,))
             conn.commit()
+            bump_catalog_version()
             
             return {
                 'statusCode': 200,
@@ -132,12 +208,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({'message': 'Service deleted'})
             }
         
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        return METHOD_NOT_ALLOWED_RESPONSE
     
     finally:
         cur.close()
-        conn.close()
+        pool.putconn(conn)
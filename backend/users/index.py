@@ -6,65 +6,78 @@ Returns: HTTP response dict с пользователями или резуль
 '''
 
 import json
-import os
 import hashlib
-from typing import Dict, Any, List, Optional
-import psycopg2
+from typing import Dict, Any
 from psycopg2.extras import RealDictCursor
+from db import get_pool
+from tokens import request_identity, TokenError
+from metrics import instrument, phase
+from compression import compress_responses
 
 def get_db_connection():
-    dsn = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(dsn)
+    return get_pool().getconn()
 
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
+# заголовки и ответ на preflight собираются один раз на экземпляр
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-User-Role, X-User-Id',
+    'Access-Control-Max-Age': '86400',
+    'Content-Type': 'application/json'
+}
+OPTIONS_RESPONSE = {
+    'statusCode': 200,
+    'headers': CORS_HEADERS,
+    'body': ''
+}
+
+@instrument('users')
+@compress_responses
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
-    headers = event.get('headers', {})
-    user_role = headers.get('X-User-Role', '')
-    
-    cors_headers = {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type, X-User-Role, X-User-Id',
-        'Access-Control-Max-Age': '86400',
-        'Content-Type': 'application/json'
-    }
+    cors_headers = CORS_HEADERS
     
     if method == 'OPTIONS':
+        return OPTIONS_RESPONSE
+    
+    try:
+        _, user_role = request_identity(event.get('headers') or {})
+    except TokenError as e:
         return {
-            'statusCode': 200,
+            'statusCode': 401,
             'headers': cors_headers,
-            'body': ''
+            'body': json.dumps({'error': str(e)}),
+            'isBase64Encoded': False
         }
+    user_role = user_role or ''
     
     try:
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         if method == 'GET':
-            cursor.execute('''
-                SELECT id, full_name, phone, username, role, created_at, updated_at
-                FROM t_p89410065_cleaning_service_web.users
-                ORDER BY created_at DESC
-            ''')
-            users = cursor.fetchall()
-            
-            result = [{
-                'id': row['id'],
-                'full_name': row['full_name'],
-                'phone': row['phone'],
-                'login': row['username'],
-                'role': row['role'],
-                'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
-            } for row in users]
+            # JSON-массив собирает Postgres, даты форматируются там же - без обхода строк в Python
+            with phase('query', 'users_list'):
+                cursor.execute('''
+                    SELECT COALESCE(json_agg(json_build_object(
+                        'id', id,
+                        'full_name', full_name,
+                        'phone', phone,
+                        'login', username,
+                        'role', role,
+                        'created_at', TO_CHAR(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+                        'updated_at', TO_CHAR(updated_at, 'YYYY-MM-DD"T"HH24:MI:SS.US')
+                    ) ORDER BY created_at DESC), '[]')::text AS body
+                    FROM t_p89410065_cleaning_service_web.users
+                ''')
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps(result),
+                'body': cursor.fetchone()['body'],
                 'isBase64Encoded': False
             }
         
@@ -77,7 +90,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
             
-            body_data = json.loads(event.get('body', '{}'))
+            with phase('parse'):
+                body_data = json.loads(event.get('body', '{}'))
             full_name = body_data.get('full_name', '').strip()
             phone = body_data.get('phone', '').strip()
             role = body_data.get('role', '').strip()
@@ -110,12 +124,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             password_hash = hash_password(password)
             
-            cursor.execute('''
-                INSERT INTO t_p89410065_cleaning_service_web.users 
-                (full_name, phone, username, password_hash, role)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id, full_name, phone, username, role, created_at, updated_at
-            ''', (full_name, phone, login, password_hash, role))
+            with phase('query', 'users_insert'):
+                cursor.execute('''
+                    INSERT INTO t_p89410065_cleaning_service_web.users 
+                    (full_name, phone, username, password_hash, role)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING id, full_name, phone, username, role, created_at, updated_at
+                ''', (full_name, phone, login, password_hash, role))
             
             new_user = cursor.fetchone()
             conn.commit()
@@ -157,7 +172,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
             
-            body_data = json.loads(event.get('body', '{}'))
+            with phase('parse'):
+                body_data = json.loads(event.get('body', '{}'))
             full_name = body_data.get('full_name', '').strip()
             phone = body_data.get('phone', '').strip()
             role = body_data.get('role', '').strip()
@@ -196,7 +212,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 RETURNING id, full_name, phone, username, role, created_at, updated_at
             '''
             
-            cursor.execute(query, update_values)
+            with phase('query', 'users_update'):
+                cursor.execute(query, update_values)
             
             updated_user = cursor.fetchone()
             
@@ -247,10 +264,11 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
             
-            cursor.execute(
-                'DELETE FROM t_p89410065_cleaning_service_web.users WHERE id = %s',
-                (user_id,)
-            )
+            with phase('query', 'users_delete'):
+                cursor.execute(
+                    'DELETE FROM t_p89410065_cleaning_service_web.users WHERE id = %s',
+                    (user_id,)
+                )
             
             if cursor.rowcount == 0:
                 return {
@@ -287,4 +305,4 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if 'cursor' in locals():
             cursor.close()
         if 'conn' in locals():
-            conn.close()
\ No newline at end of file
+            get_pool().putconn(conn)
\ No newline at end of file
@@ -0,0 +1,135 @@
+'''
+Business: Подписанные HMAC-SHA256 токены сессий с ролью и сроком действия, проверка без обращения к БД
+Args: SESSION_KEYS ("kid:secret,kid2:secret2", первый ключ подписывает), SESSION_TTL, SESSION_REVOKED (jti через запятую)
+Returns: issue_token() для логина, request_identity() для проверки заголовка Authorization в обработчиках
+'''
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class TokenError(Exception):
+    '''Токен отсутствует, повреждён, просрочен, отозван или не того типа'''
+
+
+_keys_cache: Dict[str, Any] = {'raw': None, 'keys': [], 'revoked_raw': None, 'revoked': frozenset()}
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _signing_keys() -> List[Tuple[str, bytes]]:
+    raw = os.environ.get('SESSION_KEYS', '')
+    if raw != _keys_cache['raw']:
+        keys = []
+        for item in raw.split(','):
+            kid, _, secret = item.strip().partition(':')
+            if kid and secret:
+                keys.append((kid, secret.encode('utf-8')))
+        _keys_cache['raw'] = raw
+        _keys_cache['keys'] = keys
+    return _keys_cache['keys']
+
+
+def _revoked() -> frozenset:
+    raw = os.environ.get('SESSION_REVOKED', '')
+    if raw != _keys_cache['revoked_raw']:
+        _keys_cache['revoked_raw'] = raw
+        _keys_cache['revoked'] = frozenset(jti.strip() for jti in raw.split(',') if jti.strip())
+    return _keys_cache['revoked']
+
+
+def tokens_enabled() -> bool:
+    '''Токены включены, как только в окружении задан хотя бы один ключ'''
+    return bool(_signing_keys())
+
+
+def _sign(secret: bytes, payload: str) -> str:
+    return _b64encode(hmac.new(secret, payload.encode('ascii'), hashlib.sha256).digest())
+
+
+def issue_token(subject: int, role: str, token_type: str, ttl: Optional[int] = None) -> Optional[str]:
+    '''Выпускает токен активным ключом; None, если ключи не настроены'''
+    keys = _signing_keys()
+    if not keys:
+        return None
+    kid, secret = keys[0]
+    now = int(time.time())
+    claims = {
+        'sub': subject,
+        'role': role,
+        'typ': token_type,
+        'iat': now,
+        'exp': now + (ttl or int(os.environ.get('SESSION_TTL', '43200'))),
+        'jti': secrets.token_urlsafe(8),
+        'kid': kid
+    }
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    return payload + '.' + _sign(secret, payload)
+
+
+def verify_token(token: str, token_type: str) -> Dict[str, Any]:
+    '''Проверяет подпись, срок, тип и отзыв; возвращает claims'''
+    try:
+        payload, signature = token.split('.')
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, UnicodeDecodeError):
+        raise TokenError('Malformed token')
+    if not isinstance(claims, dict) or 'sub' not in claims:
+        raise TokenError('Malformed token')
+    # до проверки подписи поля приходят от клиента: kid может оказаться списком, подпись - не ASCII
+    kid = claims.get('kid')
+    if not isinstance(kid, str) or not signature.isascii():
+        raise TokenError('Malformed token')
+
+    secret = dict(_signing_keys()).get(kid)
+    if secret is None:
+        raise TokenError('Unknown signing key')
+    if not hmac.compare_digest(_sign(secret, payload).encode('ascii'), signature.encode('ascii')):
+        raise TokenError('Invalid signature')
+    exp, jti, role = claims.get('exp'), claims.get('jti'), claims.get('role')
+    if (not isinstance(exp, (int, float)) or isinstance(exp, bool)
+            or not isinstance(jti, (str, type(None))) or not isinstance(role, str)):
+        raise TokenError('Malformed token')
+    if claims.get('typ') != token_type:
+        raise TokenError('Wrong token type')
+    if exp < time.time():
+        raise TokenError('Token expired')
+    if claims.get('jti') in _revoked():
+        raise TokenError('Token revoked')
+    return claims
+
+
+def bearer_token(headers: Dict[str, Any]) -> Optional[str]:
+    for name, value in (headers or {}).items():
+        if name.lower() == 'authorization' and value:
+            scheme, _, token = value.partition(' ')
+            if scheme.lower() == 'bearer' and token:
+                return token.strip()
+    return None
+
+
+def request_identity(headers: Dict[str, Any], token_type: str = 'admin') -> Tuple[Optional[str], Optional[str]]:
+    '''
+    (user_id, role) вызывающего. Когда ключи настроены, требуется валидный Bearer-токен;
+    без ключей сохраняется прежнее доверие заголовкам X-User-Id/X-User-Role.
+    '''
+    headers = headers or {}
+    token = bearer_token(headers)
+    if token is None and not tokens_enabled():
+        return headers.get('X-User-Id'), headers.get('X-User-Role')
+    if token is None:
+        raise TokenError('Authorization required')
+    claims = verify_token(token, token_type)
+    return str(claims['sub']), claims['role']
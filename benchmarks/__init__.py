@@ -0,0 +1,5 @@
+'''
+Воспроизводимые бенчмарки функций на локальном PostgreSQL:
+python -m benchmarks.seed - база из db_migrations/ с заданными объёмами данных,
+python -m benchmarks.run - замеры обработчиков в JSON, python -m benchmarks.compare - сравнение двух прогонов.
+'''
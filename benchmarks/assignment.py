@@ -0,0 +1,97 @@
+'''
+Business: Время и качество автоназначения исполнителей на синтетическом дне - тысячи заявок, десятки исполнителей
+Args: --jobs, --cleaners, --preassigned (доля уже занятых слотов), --repeat, --seed
+Returns: JSON в формате benchmarks.run: p50/p95 solve() и доля размещённых заявок, разброс загрузки
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, Any, List, Tuple
+
+from benchmarks.run import RESULTS_DIR, git_revision, summarize
+
+BOOKINGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'bookings')
+
+SLOTS_PER_DAY = 24
+
+
+def synthetic_day(jobs: int, cleaners: int, preassigned: float,
+                  rng: random.Random) -> Tuple[List[int], Dict[int, int], Dict[int, int], List[Tuple[int, int, int]]]:
+    '''Исполнители с частью занятых слотов и заявки длиной 2-8 слотов со случайным началом'''
+    ids = list(range(1, cleaners + 1))
+    busy: Dict[int, int] = {}
+    load: Dict[int, int] = {}
+    for cleaner in ids:
+        mask = 0
+        for slot in range(SLOTS_PER_DAY):
+            if rng.random() < preassigned:
+                mask |= 1 << slot
+        busy[cleaner] = mask
+        load[cleaner] = bin(mask).count('1')
+    day_jobs = []
+    for job_id in range(1, jobs + 1):
+        length = rng.randint(2, 8)
+        day_jobs.append((job_id, rng.randint(0, SLOTS_PER_DAY - length), length))
+    return ids, busy, load, day_jobs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк автоназначения исполнителей')
+    parser.add_argument('--jobs', type=int, nargs='*', default=[500, 2000, 5000])
+    parser.add_argument('--cleaners', type=int, default=400)
+    parser.add_argument('--preassigned', type=float, default=0.1)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='по умолчанию benchmarks/results/assignment-<commit>.json')
+    args = parser.parse_args()
+
+    # assign.py импортирует модули функции (queries, availability) - каталог функции нужен в sys.path
+    sys.path.insert(0, BOOKINGS_DIR)
+    import assign
+
+    results: Dict[str, Any] = {}
+    for count in args.jobs:
+        cleaners, busy, load, jobs = synthetic_day(count, args.cleaners, args.preassigned, random.Random(args.seed))
+        samples: List[float] = []
+        placed: Dict[int, int] = {}
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            placed, _ = assign.solve(cleaners, busy, load, jobs)
+            samples.append((time.perf_counter() - started) * 1000)
+        final = dict(load)
+        lengths = {job_id: length for job_id, _, length in jobs}
+        for job_id, cleaner in placed.items():
+            final[cleaner] += lengths[job_id]
+        report = summarize(samples, 0)
+        report.update({
+            'placed': len(placed),
+            'placed_ratio': round(len(placed) / count, 4),
+            'load_min': min(final.values()),
+            'load_max': max(final.values()),
+        })
+        results[f'solve.{count}'] = report
+        print(json.dumps({'event': 'measured', 'jobs': count}), flush=True)
+
+    revision = git_revision()
+    report = {
+        'meta': {**revision, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                 'repeat': args.repeat, 'seed': args.seed, 'budget_ms': assign.ASSIGN_TIME_BUDGET_MS},
+        'dataset': {'jobs': args.jobs, 'cleaners': args.cleaners, 'preassigned': args.preassigned},
+        'results': results,
+    }
+    for name, row in results.items():
+        print(f"{name:<14}{row['p50_ms']:>10} ms p50{row['p95_ms']:>10} ms p95"
+              f"{row['placed_ratio']:>8} placed  load {row['load_min']}-{row['load_max']}")
+    output = args.output or os.path.join(RESULTS_DIR, f"assignment-{(revision['commit'] or 'nogit')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as target:
+        json.dump(report, target, ensure_ascii=False, indent=2)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
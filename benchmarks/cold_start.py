@@ -0,0 +1,137 @@
+'''
+Business: Замер холодного старта функций - импорт index.py и первый вызов в свежем интерпретаторе
+Args: --runs (процессов на функцию), --only, --ref (git-ревизия для сравнения, код берётся через git archive), --top
+Returns: JSON в формате benchmarks.run (results.<функция>.import / .first_call), пригодный для benchmarks.compare
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from typing import Dict, Any, List
+
+from benchmarks.run import RESULTS_DIR, git_revision, summarize
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# выполняется в отдельном процессе из каталога функции; первый вызов - preflight, он не требует базы
+CHILD_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import index
+imported = time.perf_counter()
+event = {"httpMethod": "OPTIONS", "headers": {}, "queryStringParameters": {}, "body": ""}
+index.handler(event, None)
+called = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_call_ms": (called - imported) * 1000,
+                  "modules": len(sys.modules)}))
+'''
+
+
+def export_backend(ref: str, target: str) -> str:
+    '''Копия backend/ на указанной ревизии - чтобы сравнивать с текущим деревом в одном прогоне'''
+    archive = subprocess.run(['git', 'archive', ref, 'backend'], cwd=REPO_DIR, check=True, capture_output=True).stdout
+    archive_path = os.path.join(target, 'backend.tar')
+    with open(archive_path, 'wb') as output:
+        output.write(archive)
+    with tarfile.open(archive_path) as tar:
+        tar.extractall(target)
+    return os.path.join(target, 'backend')
+
+
+def measure_function(function_dir: str, runs: int) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = {'import': [], 'first_call': [], 'process': []}
+    errors = 0
+    modules = 0
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='0')
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-c', CHILD_SCRIPT], cwd=function_dir, env=env,
+                                   capture_output=True, text=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if completed.returncode != 0:
+            errors += 1
+            continue
+        # handler пишет строку лога metrics; замер - последняя строка stdout
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        samples['import'].append(result['import_ms'])
+        samples['first_call'].append(result['first_call_ms'])
+        samples['process'].append(elapsed)
+        modules = result['modules']
+    if not samples['import']:
+        return {'errors': errors}
+    report = {name: summarize(values, errors) for name, values in samples.items()}
+    report['modules'] = modules
+    return report
+
+
+def slowest_imports(function_dir: str, top: int) -> List[Dict[str, Any]]:
+    '''Самые дорогие модули по -X importtime (кумулятивно, мкс)'''
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import index'], cwd=function_dir,
+                               capture_output=True, text=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        rows.append({'module': name, 'self_us': int(self_us), 'cumulative_us': int(cumulative_us)})
+    return sorted(rows, key=lambda row: row['cumulative_us'], reverse=True)[1:top + 1]
+
+
+def run(backend_dir: str, functions: List[str], runs: int, top: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    imports: Dict[str, Any] = {}
+    for name in functions:
+        function_dir = os.path.join(backend_dir, name)
+        report = measure_function(function_dir, runs)
+        for metric in ('import', 'first_call', 'process'):
+            if metric in report:
+                results[f'{name}.{metric}'] = report[metric]
+        if top:
+            imports[name] = slowest_imports(function_dir, top)
+        print(json.dumps({'event': 'measured', 'function': name, 'modules': report.get('modules'),
+                          'import_p50_ms': report.get('import', {}).get('p50_ms')}), flush=True)
+    return {'results': results, 'imports': imports}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Замер холодного старта функций backend/*')
+    parser.add_argument('--runs', type=int, default=20, help='свежих процессов на функцию')
+    parser.add_argument('--only', nargs='*', help='только указанные функции')
+    parser.add_argument('--ref', help='замерить backend/ на этой git-ревизии вместо рабочего дерева')
+    parser.add_argument('--top', type=int, default=10, help='сколько самых дорогих импортов показать')
+    parser.add_argument('--output', help='по умолчанию benchmarks/results/cold-<commit>.json')
+    args = parser.parse_args()
+
+    revision = git_revision()
+    with tempfile.TemporaryDirectory() as workdir:
+        backend_dir = export_backend(args.ref, workdir) if args.ref else os.path.join(REPO_DIR, 'backend')
+        if args.ref:
+            revision = {'commit': subprocess.check_output(['git', 'rev-parse', args.ref], cwd=REPO_DIR,
+                                                          text=True).strip(), 'dirty': False}
+        functions = sorted(
+            name for name in os.listdir(backend_dir)
+            if os.path.isfile(os.path.join(backend_dir, name, 'index.py')) and (not args.only or name in args.only)
+        )
+        report = run(backend_dir, functions, args.runs, args.top)
+
+    report['meta'] = {
+        **revision,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'runs': args.runs,
+        'python': sys.version.split()[0],
+    }
+    report['dataset'] = {}
+    output = args.output or os.path.join(RESULTS_DIR, f"cold-{(revision['commit'] or 'nogit')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as target:
+        json.dump(report, target, ensure_ascii=False, indent=2)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
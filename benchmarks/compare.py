@@ -0,0 +1,79 @@
+'''
+Business: Сравнение двух прогонов benchmarks.run - изменение p50/p95 по сценариям и смена планов запросов списка
+Args: base.json head.json [--threshold 10] (процент роста, считающийся регрессией) [--metric p50_ms p95_ms]
+Returns: таблица в stdout; код выхода 1, если хотя бы один сценарий стал медленнее порога
+'''
+
+import argparse
+import json
+import sys
+from typing import Dict, Any, List, Tuple
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], metrics: List[str],
+            threshold: float) -> Tuple[List[Dict[str, Any]], List[str]]:
+    rows: List[Dict[str, Any]] = []
+    regressions: List[str] = []
+    for scenario in sorted(set(base['results']) | set(head['results'])):
+        before = base['results'].get(scenario)
+        after = head['results'].get(scenario)
+        row: Dict[str, Any] = {'scenario': scenario}
+        for metric in metrics:
+            old = before.get(metric) if before else None
+            new = after.get(metric) if after else None
+            change = round((new - old) / old * 100, 1) if old and new is not None else None
+            row[metric] = (old, new, change)
+            if change is not None and change > threshold:
+                regressions.append(f'{scenario} {metric} +{change}%')
+        rows.append(row)
+    return rows, regressions
+
+
+def plan_changes(base: Dict[str, Any], head: Dict[str, Any]) -> List[str]:
+    changes = []
+    for name, plan in (head.get('plans') or {}).items():
+        previous = (base.get('plans') or {}).get(name)
+        if previous and previous.get('nodes') != plan.get('nodes'):
+            changes.append(f"{name}: {', '.join(previous['nodes'])} -> {', '.join(plan['nodes'])}")
+    return changes
+
+
+def format_cell(value: Tuple[Any, Any, Any]) -> str:
+    old, new, change = value
+    if old is None or new is None:
+        return f"{old if old is not None else '-'} -> {new if new is not None else '-'}"
+    return f'{old} -> {new} ({change:+.1f}%)'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Сравнение результатов бенчмарка двух коммитов')
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=10.0, help='допустимый рост, %%')
+    parser.add_argument('--metric', nargs='*', default=['p50_ms', 'p95_ms'])
+    args = parser.parse_args()
+
+    base, head = load(args.base), load(args.head)
+    if base['dataset'].get('bookings') != head['dataset'].get('bookings'):
+        print(f"warning: datasets differ ({base['dataset'].get('bookings')} vs {head['dataset'].get('bookings')} bookings)")
+    print(f"base {base['meta'].get('commit', '')[:12]}  head {head['meta'].get('commit', '')[:12]}")
+
+    rows, regressions = compare(base, head, args.metric, args.threshold)
+    print(f"{'scenario':<30}" + ''.join(f'{metric:>34}' for metric in args.metric))
+    for row in rows:
+        print(f"{row['scenario']:<30}" + ''.join(f'{format_cell(row[metric]):>34}' for metric in args.metric))
+
+    for change in plan_changes(base, head):
+        print('plan changed: ' + change)
+    if regressions:
+        print('regressions: ' + '; '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
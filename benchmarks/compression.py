@@ -0,0 +1,110 @@
+'''
+Business: Компромисс трафик/CPU при сжатии списков заявок - gzip и brotli на разных уровнях и размерах страниц
+Args: --dsn (реальные строки из базы benchmarks.seed) или синтетические строки; --rows, --mbit, --repeat
+Returns: таблица и JSON в формате benchmarks.run: время сжатия, размер после base64, оценка полного времени ответа
+'''
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List
+
+from benchmarks.run import RESULTS_DIR, git_revision, summarize
+from benchmarks.seed import SCHEMA
+from benchmarks.serialization import LIST_QUERY, synthetic_rows
+
+BOOKINGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'bookings')
+
+GZIP_LEVELS = [1, 6, 9]
+BROTLI_QUALITIES = [1, 4, 6, 11]
+
+
+def load_rows(dsn: str, count: int) -> List[Dict[str, Any]]:
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(LIST_QUERY.format(schema=SCHEMA), (count,))
+            rows = [dict(row) for row in cursor.fetchall()]
+        conn.rollback()
+    finally:
+        conn.close()
+    for row in rows:
+        del row['cursor_created_at']
+    return rows
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # compression.py функции bookings импортирует её metrics - каталог функции нужен в sys.path
+    sys.path.insert(0, BOOKINGS_DIR)
+    import compression
+
+    variants = [('gzip', level) for level in GZIP_LEVELS]
+    if compression.brotli is not None:
+        variants += [('br', quality) for quality in BROTLI_QUALITIES]
+    bytes_per_ms = args.mbit * 1_000_000 / 8 / 1000
+
+    results: Dict[str, Any] = {}
+    for count in args.rows:
+        rows = load_rows(args.dsn, count) if args.dsn else synthetic_rows(count)
+        # тело как у списка bookings: стандартный json.dumps (ensure_ascii) - худший случай для размера
+        data = json.dumps({'items': rows, 'next_cursor': None}).encode('utf-8')
+        results[f'identity.{count}'] = {
+            **summarize([0.0], 0), 'bytes': len(data), 'ratio': 1.0,
+            'transfer_ms': round(len(data) / bytes_per_ms, 3), 'total_ms': round(len(data) / bytes_per_ms, 3),
+        }
+        for encoding, level in variants:
+            samples: List[float] = []
+            compressed = b''
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                compressed = compression.compress_body(data, encoding, level)
+                base64.b64encode(compressed)
+                samples.append((time.perf_counter() - started) * 1000)
+            report = summarize(samples, 0)
+            # платформа декодирует base64 до отправки клиенту: по сети идёт сжатое тело
+            transfer_ms = len(compressed) / bytes_per_ms
+            report.update({
+                'bytes': len(compressed),
+                'ratio': round(len(data) / len(compressed), 2),
+                'transfer_ms': round(transfer_ms, 3),
+                'total_ms': round(report['p50_ms'] + transfer_ms, 3),
+            })
+            results[f'{encoding}-{level}.{count}'] = report
+        print(json.dumps({'event': 'measured', 'rows': count, 'raw_bytes': len(data)}), flush=True)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк сжатия ответов со списками заявок')
+    parser.add_argument('--dsn', help='DSN из python -m benchmarks.seed; без него строки синтетические')
+    parser.add_argument('--rows', type=int, nargs='*', default=[50, 200, 1000, 10_000])
+    parser.add_argument('--mbit', type=float, default=20.0, help='пропускная способность клиента для оценки')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='по умолчанию benchmarks/results/compression-<commit>.json')
+    args = parser.parse_args()
+
+    results = run(args)
+    revision = git_revision()
+    report = {
+        'meta': {**revision, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                 'repeat': args.repeat, 'mbit': args.mbit, 'synthetic': not args.dsn},
+        'dataset': {'rows': args.rows},
+        'results': results,
+    }
+    print(f"{'variant':<18}{'bytes':>12}{'ratio':>8}{'cpu p50':>10}{'transfer':>10}{'total':>10}")
+    for name, row in results.items():
+        print(f"{name:<18}{row['bytes']:>12}{row['ratio']:>8}{row['p50_ms']:>10}{row['transfer_ms']:>10}{row['total_ms']:>10}")
+    output = args.output or os.path.join(RESULTS_DIR, f"compression-{(revision['commit'] or 'nogit')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as target:
+        json.dump(report, target, ensure_ascii=False, indent=2)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+'''
+Business: Замеры обработчиков на подготовленной базе - список, карточка, создание, изменение, логин, каталог услуг
+Args: --dsn (вывод benchmarks.seed), --iterations, --warmup, --output; функции запускаются как в tools/local_runner
+Returns: JSON с коммитом, объёмом данных, p50/p95/p99 по каждому сценарию и планами запросов списка
+'''
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import time
+import uuid
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import psycopg2
+
+from tools.local_runner import FunctionInstances
+from benchmarks.seed import BENCH_ADMIN_LOGIN, BENCH_PASSWORD, SCHEMA, dataset_info
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+ADMIN_HEADERS = {'X-User-Id': '1', 'X-User-Role': 'super_admin', 'Content-Type': 'application/json'}
+
+# тот же запрос, что строит bookings для первой страницы списка (ORDER BY created_at DESC + join users)
+LIST_PLAN_QUERIES = {
+    'list_first_page': (
+        "SELECT b.*, u.full_name FROM {schema}.bookings b "
+        "LEFT JOIN {schema}.users u ON b.assignee_id = u.id "
+        "ORDER BY b.created_at DESC, b.id DESC LIMIT 51"
+    ),
+    'list_status_page': (
+        "SELECT b.*, u.full_name FROM {schema}.bookings b "
+        "LEFT JOIN {schema}.users u ON b.assignee_id = u.id "
+        "WHERE b.status = 'completed' ORDER BY b.created_at DESC, b.id DESC LIMIT 51"
+    ),
+    'list_legacy_full': (
+        "SELECT b.*, u.full_name FROM {schema}.bookings b "
+        "LEFT JOIN {schema}.users u ON b.assignee_id = u.id "
+        "ORDER BY b.created_at DESC"
+    ),
+}
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        try:
+            return subprocess.check_output(['git', *args], stderr=subprocess.DEVNULL, text=True).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ''
+    return {'commit': git('rev-parse', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def event(method: str, query: Optional[Dict[str, str]] = None, body: Optional[Dict[str, Any]] = None,
+          path_id: Optional[int] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    return {
+        'httpMethod': method,
+        'headers': dict(headers or ADMIN_HEADERS),
+        'queryStringParameters': query or {},
+        'pathParams': {'id': str(path_id)} if path_id is not None else {},
+        'body': json.dumps(body) if body is not None else '',
+        'isBase64Encoded': False
+    }
+
+
+def summarize(samples: List[float], errors: int) -> Dict[str, Any]:
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 3)
+
+    return {
+        'iterations': len(ordered),
+        'errors': errors,
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'min_ms': round(ordered[0], 3),
+        'p50_ms': pick(0.50),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def measure(instances: FunctionInstances, make_event: Callable[[], Dict[str, Any]],
+            iterations: int, warmup: int) -> Dict[str, Any]:
+    samples: List[float] = []
+    errors = 0
+    for index in range(warmup + iterations):
+        request = make_event()
+        started = time.perf_counter()
+        response = instances.invoke(request, uuid.uuid4().hex)
+        elapsed = (time.perf_counter() - started) * 1000
+        if index < warmup:
+            continue
+        samples.append(elapsed)
+        if response.get('statusCode', 500) >= 400:
+            errors += 1
+    return summarize(samples, errors)
+
+
+def explain_plans(dsn: str, bookings: int, legacy_max: int) -> Dict[str, Any]:
+    plans: Dict[str, Any] = {}
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            for name, query in LIST_PLAN_QUERIES.items():
+                if name == 'list_legacy_full' and bookings > legacy_max:
+                    continue
+                cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + query.format(schema=SCHEMA))
+                plan = cursor.fetchone()[0][0]
+                root = plan['Plan']
+                plans[name] = {
+                    'execution_ms': plan.get('Execution Time'),
+                    'planning_ms': plan.get('Planning Time'),
+                    'root_node': root.get('Node Type'),
+                    'nodes': sorted({node for node in walk_nodes(root)}),
+                    'shared_hit_blocks': root.get('Shared Hit Blocks'),
+                    'shared_read_blocks': root.get('Shared Read Blocks'),
+                }
+        conn.rollback()
+    finally:
+        conn.close()
+    return plans
+
+
+def walk_nodes(node: Dict[str, Any]) -> List[str]:
+    names = [node['Node Type'] + (f" on {node['Index Name']}" if node.get('Index Name') else '')]
+    for child in node.get('Plans', []):
+        names.extend(walk_nodes(child))
+    return names
+
+
+def sample_ids(dsn: str, count: int = 1000) -> Tuple[List[int], List[str]]:
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT id FROM {SCHEMA}.bookings TABLESAMPLE SYSTEM (1) LIMIT %s", (count,))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                cursor.execute(f"SELECT id FROM {SCHEMA}.bookings LIMIT %s", (count,))
+                ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(f"SELECT login FROM {SCHEMA}.clients LIMIT 100")
+            logins = [row[0] for row in cursor.fetchall()]
+        return ids, logins
+    finally:
+        conn.close()
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ['DATABASE_URL'] = args.dsn
+    os.environ.pop('SESSION_KEYS', None)
+    rng = random.Random(args.seed)
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        dataset = dataset_info(conn)
+    finally:
+        conn.close()
+    booking_ids, client_logins = sample_ids(args.dsn)
+
+    functions = {name: FunctionInstances(name, 1) for name in ['bookings', 'auth', 'client-auth', 'services']}
+
+    def create_event() -> Dict[str, Any]:
+        suffix = rng.randint(0, 10 ** 9)
+        return event('POST', body={
+            'name': f'Бенчмарк {suffix}', 'phone': f'+7 900 {suffix % 10 ** 7:07d}',
+            'email': f'bench{suffix}@example.com', 'address': 'ул. Тестовая, 1', 'area': 50,
+            'serviceType': 'office', 'comment': 'benchmark', 'date': '2030-01-15', 'time': '10:00'
+        })
+
+    scenarios: Dict[str, Tuple[str, Callable[[], Dict[str, Any]]]] = {
+        'bookings.list_page': ('bookings', lambda: event('GET', {'limit': '50'})),
+        'bookings.list_status_page': ('bookings', lambda: event('GET', {'limit': '50', 'status': 'completed'})),
+        'bookings.list_assignee_page': ('bookings', lambda: event('GET', {'limit': '50', 'assignee_id': '3'})),
+        'bookings.search': ('bookings', lambda: event('GET', {'limit': '20', 'search': str(rng.randint(100, 999))})),
+        'bookings.stats': ('bookings', lambda: event('GET', {'action': 'stats'})),
+        'bookings.detail': ('bookings', lambda: event('GET', path_id=rng.choice(booking_ids))),
+        'bookings.create': ('bookings', create_event),
+        'bookings.update': ('bookings', lambda: event(
+            'PUT', {'id': str(rng.choice(booking_ids))}, {'status': rng.choice(['new', 'in-progress', 'completed'])}
+        )),
+        'auth.login': ('auth', lambda: event(
+            'POST', body={'username': BENCH_ADMIN_LOGIN, 'password': BENCH_PASSWORD}
+        )),
+        'client-auth.login': ('client-auth', lambda: event(
+            'POST', body={'action': 'login', 'login': rng.choice(client_logins), 'password': BENCH_PASSWORD}
+        )),
+        'services.list': ('services', lambda: event('GET')),
+    }
+    if dataset['bookings'] <= args.legacy_max:
+        scenarios['bookings.list_legacy'] = ('bookings', lambda: event('GET'))
+    if args.only:
+        scenarios = {name: value for name, value in scenarios.items() if any(name.startswith(p) for p in args.only)}
+
+    results: Dict[str, Any] = {}
+    try:
+        for name, (function_name, make_event) in scenarios.items():
+            iterations = max(args.iterations // 10, 5) if name == 'bookings.list_legacy' else args.iterations
+            results[name] = measure(functions[function_name], make_event, iterations, args.warmup)
+            print(json.dumps({'event': 'measured', 'scenario': name, **results[name]}), flush=True)
+    finally:
+        for instances in functions.values():
+            instances.stop()
+
+    # созданные бенчмарком заявки удаляются, чтобы повторные прогоны шли на том же объёме
+    conn = psycopg2.connect(args.dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SCHEMA}.bookings WHERE comment = 'benchmark'")
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        'meta': {
+            **git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'seed': args.seed,
+        },
+        'dataset': dataset,
+        'results': results,
+        'plans': explain_plans(args.dsn, dataset['bookings'], args.legacy_max),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк обработчиков на локальной базе')
+    parser.add_argument('--dsn', required=True, help='DSN из python -m benchmarks.seed')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--legacy-max', type=int, default=100_000,
+                        help='максимум заявок, при котором замеряется список без пагинации')
+    parser.add_argument('--only', nargs='*', help='префиксы сценариев, например bookings.list auth')
+    parser.add_argument('--output', help='по умолчанию benchmarks/results/<commit>-<bookings>.json')
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{(report['meta']['commit'] or 'nogit')[:12]}-{report['dataset']['bookings']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as target:
+        json.dump(report, target, ensure_ascii=False, indent=2)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+'''
+Business: Локальная база для бенчмарков - схема из db_migrations/ и синтетические данные заданного объёма
+Args: --admin-dsn (сервер PostgreSQL), --database, --bookings (1k..10M), --users, --clients, --services, --fresh
+Returns: DSN подготовленной базы в stdout; пароль всех сидированных пользователей и клиентов - BENCH_PASSWORD
+'''
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, Any, List
+from urllib.parse import urlparse, urlunparse
+import psycopg2
+import psycopg2.extensions
+
+SCHEMA = 't_p89410065_cleaning_service_web'
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db_migrations')
+MIGRATION_RE = re.compile(r'^V(\d+)__.+\.sql$')
+
+BENCH_PASSWORD = 'bench-password'
+BENCH_ADMIN_LOGIN = 'bench_admin'
+SEED_CHUNK = 500_000
+
+# на платформе поля логина пользователей были добавлены вне миграций, а V0005 уже на них опирается
+PLATFORM_DRIFT = {
+    5: (
+        f"ALTER TABLE {SCHEMA}.users ADD COLUMN IF NOT EXISTS username VARCHAR(100) UNIQUE; "
+        f"ALTER TABLE {SCHEMA}.users ADD COLUMN IF NOT EXISTS password_hash VARCHAR(64);"
+    ),
+}
+
+SERVICE_TYPES = ['apartment', 'office', 'renovation', 'furniture']
+BOOKING_STATUSES = ['new', 'assigned', 'in-progress', 'completed', 'cancelled']
+
+
+def database_dsn(admin_dsn: str, database: str) -> str:
+    '''DSN базы бенчмарка; search_path как у роли на платформе (V0001/V0003 создают таблицы без схемы)'''
+    url = urlparse(admin_dsn)
+    query = url.query + ('&' if url.query else '') + f'options=-csearch_path%3D{SCHEMA}'
+    return urlunparse(url._replace(path='/' + database, query=query))
+
+
+def migrations() -> List[str]:
+    files = [path for path in glob.glob(os.path.join(MIGRATIONS_DIR, 'V*.sql')) if MIGRATION_RE.match(os.path.basename(path))]
+    return sorted(files, key=lambda path: int(MIGRATION_RE.match(os.path.basename(path)).group(1)))
+
+
+def create_database(admin_dsn: str, database: str, fresh: bool) -> bool:
+    '''Создаёт базу; False, если она уже есть и --fresh не указан'''
+    conn = psycopg2.connect(admin_dsn)
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (database,))
+            exists = cursor.fetchone() is not None
+            if exists and not fresh:
+                return False
+            if exists:
+                cursor.execute(f'DROP DATABASE "{database}"')
+            cursor.execute(f'CREATE DATABASE "{database}"')
+            return True
+    finally:
+        conn.close()
+
+
+def apply_migrations(conn: Any) -> List[str]:
+    applied = []
+    with conn.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {SCHEMA}')
+        for path in migrations():
+            version = int(MIGRATION_RE.match(os.path.basename(path)).group(1))
+            if version in PLATFORM_DRIFT:
+                cursor.execute(PLATFORM_DRIFT[version])
+            with open(path, encoding='utf-8') as source:
+                cursor.execute(source.read())
+            applied.append(os.path.basename(path))
+    conn.commit()
+    return applied
+
+
+def seed(conn: Any, bookings: int, users: int, clients: int, services: int) -> Dict[str, Any]:
+    '''Генерация данных на стороне сервера через generate_series; пользовательские триггеры на время заливки отключены'''
+    password_hash = hashlib.sha256(BENCH_PASSWORD.encode()).hexdigest()
+    timings: Dict[str, float] = {}
+    with conn.cursor() as cursor:
+        started = time.monotonic()
+        cursor.execute(
+            f"INSERT INTO {SCHEMA}.users (full_name, phone, role, username, password_hash) "
+            "VALUES ('Бенчмарк Администратор', '+70000000000', 'super_admin', %s, %s)",
+            (BENCH_ADMIN_LOGIN, password_hash)
+        )
+        cursor.execute(
+            f"INSERT INTO {SCHEMA}.users (full_name, phone, role, username, password_hash) "
+            "SELECT 'Исполнитель ' || g, '+7100' || lpad(g::text, 7, '0'), "
+            "CASE WHEN g %% 10 = 0 THEN 'manager' ELSE 'operator' END, 'bench_operator_' || g, %s "
+            "FROM generate_series(1, %s) g",
+            (password_hash, users)
+        )
+        cursor.execute(
+            f"INSERT INTO {SCHEMA}.clients (full_name, email, phone, login, password_hash) "
+            "SELECT 'Клиент ' || g, 'client' || g || '@example.com', '+7200' || lpad(g::text, 7, '0'), "
+            "'client' || g, %s FROM generate_series(1, %s) g",
+            (password_hash, clients)
+        )
+        cursor.execute(
+            "INSERT INTO services (title, description, icon, price) "
+            "SELECT 'Услуга ' || g, 'Описание услуги ' || g, 'Sparkles', 'от ' || (100 * g) || ' ₽' "
+            "FROM generate_series(1, %s) g",
+            (services,)
+        )
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {SCHEMA}.users WHERE username LIKE 'bench_operator_%'")
+        first_user, last_user = cursor.fetchone()
+        timings['reference_s'] = round(time.monotonic() - started, 3)
+
+        started = time.monotonic()
+        cursor.execute(f"ALTER TABLE {SCHEMA}.bookings DISABLE TRIGGER USER")
+        # два года истории, равномерно по времени создания; у трети заявок нет исполнителя
+        span_seconds = 2 * 365 * 86400
+        for start in range(1, bookings + 1, SEED_CHUNK):
+            stop = min(start + SEED_CHUNK - 1, bookings)
+            cursor.execute(
+                f"INSERT INTO {SCHEMA}.bookings "
+                "(name, phone, email, address, area, service_type, comment, status, created_at, updated_at, "
+                "booking_date, booking_time, assignee_id, location, geocode_precision) "
+                "SELECT 'Клиент ' || g, '+7 9' || lpad((g %% 1000000000)::text, 9, '0'), "
+                "'client' || g || '@example.com', 'ул. Тестовая, ' || (g %% 500 + 1), 20 + g %% 280, "
+                "(%s::text[])[1 + g %% %s], CASE WHEN g %% 5 = 0 THEN 'Позвонить заранее' ELSE '' END, "
+                "(%s::text[])[1 + (g * 7919) %% %s], ts, ts, ts::date + (g %% 30), "
+                "make_time(8 + g %% 12, 0, 0), "
+                "CASE WHEN g %% 3 = 0 THEN NULL ELSE %s + (g * 31) %% %s END, "
+                # синтетические точки по Москве вместо геокодирования (V0015) - триггеры отключены
+                "point(37.35 + ((g * 7907) %% 10000) * 0.000055, 55.57 + ((g * 6151) %% 10000) * 0.000035), 'exact' "
+                "FROM generate_series(%s, %s) g, "
+                "LATERAL (SELECT CURRENT_TIMESTAMP - make_interval(secs => (%s - g) * %s::float8)) t(ts)",
+                (
+                    SERVICE_TYPES, len(SERVICE_TYPES), BOOKING_STATUSES, len(BOOKING_STATUSES),
+                    first_user, last_user - first_user + 1, start, stop, bookings, span_seconds / max(bookings, 1)
+                )
+            )
+            conn.commit()
+            print(json.dumps({'event': 'seeded', 'bookings': stop}), flush=True)
+        cursor.execute(f"ALTER TABLE {SCHEMA}.bookings ENABLE TRIGGER USER")
+        timings['bookings_s'] = round(time.monotonic() - started, 3)
+
+        # счётчики дашборда пересчитываются одним проходом, как в V0010
+        started = time.monotonic()
+        cursor.execute(f"TRUNCATE {SCHEMA}.booking_stats")
+        cursor.execute(
+            f"INSERT INTO {SCHEMA}.booking_stats (day, status, assignee_id, cnt) "
+            f"SELECT created_at::date, status, COALESCE(assignee_id, 0), COUNT(*) FROM {SCHEMA}.bookings "
+            "GROUP BY created_at::date, status, COALESCE(assignee_id, 0)"
+        )
+        conn.commit()
+        timings['stats_s'] = round(time.monotonic() - started, 3)
+
+        # занятость исполнителей (V0014) тоже ведётся триггером
+        started = time.monotonic()
+        cursor.execute(f"SELECT {SCHEMA}.occupancy_rebuild()")
+        conn.commit()
+        timings['occupancy_s'] = round(time.monotonic() - started, 3)
+
+    started = time.monotonic()
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with conn.cursor() as cursor:
+        cursor.execute('VACUUM ANALYZE')
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_READ_COMMITTED)
+    timings['analyze_s'] = round(time.monotonic() - started, 3)
+    return timings
+
+
+def dataset_info(conn: Any) -> Dict[str, Any]:
+    '''Фактические объёмы таблиц - попадают в результаты бенчмарка'''
+    info: Dict[str, Any] = {}
+    with conn.cursor() as cursor:
+        for table in ['bookings', 'users', 'clients']:
+            cursor.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{table}")
+            info[table] = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM services")
+        info['services'] = cursor.fetchone()[0]
+        cursor.execute(f"SELECT pg_size_pretty(pg_total_relation_size('{SCHEMA}.bookings'))")
+        info['bookings_size'] = cursor.fetchone()[0]
+        cursor.execute('SHOW server_version')
+        info['server_version'] = cursor.fetchone()[0]
+    return info
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Подготовка базы для бенчмарков')
+    parser.add_argument('--admin-dsn', default=os.environ.get('BENCH_ADMIN_DSN', 'postgresql://postgres@127.0.0.1:5432/postgres'))
+    parser.add_argument('--database', help='по умолчанию bench_<bookings>')
+    parser.add_argument('--bookings', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--clients', type=int, help='по умолчанию bookings / 10')
+    parser.add_argument('--services', type=int, default=20)
+    parser.add_argument('--fresh', action='store_true', help='пересоздать базу, если она уже есть')
+    args = parser.parse_args()
+
+    if not 1000 <= args.bookings <= 10_000_000:
+        parser.error('--bookings must be between 1000 and 10000000')
+    database = args.database or f'bench_{args.bookings}'
+    dsn = database_dsn(args.admin_dsn, database)
+
+    if create_database(args.admin_dsn, database, args.fresh):
+        conn = psycopg2.connect(dsn)
+        try:
+            applied = apply_migrations(conn)
+            timings = seed(conn, args.bookings, args.users,
+                           args.clients if args.clients is not None else args.bookings // 10, args.services)
+            print(json.dumps({'event': 'ready', 'migrations': len(applied), 'timings': timings,
+                              'dataset': dataset_info(conn)}, ensure_ascii=False), flush=True)
+        finally:
+            conn.close()
+    else:
+        print(json.dumps({'event': 'reused', 'database': database}), flush=True)
+    print(dsn)
+
+
+if __name__ == '__main__':
+    main()
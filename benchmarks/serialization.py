@@ -0,0 +1,146 @@
+'''
+Business: Сравнение путей сериализации списка заявок - dict + json.dumps, dict + orjson, json_agg в Postgres
+Args: --dsn (вывод benchmarks.seed) или --synthetic (без базы, только кодировщики), --rows 10000 100000, --repeat
+Returns: JSON в формате benchmarks.run: results.<путь>.<строк> с p50/p95 полного цикла запрос + сериализация
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import time
+from typing import Callable, Dict, Any, List
+
+from benchmarks.run import RESULTS_DIR, git_revision, summarize
+from benchmarks.seed import SCHEMA
+
+FASTJSON_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'bookings', 'fastjson.py')
+
+# колонки и порядок как у списка в bookings/index.py
+LIST_QUERY = (
+    "SELECT b.id, b.name, b.phone, b.email, b.address, b.area, b.service_type, b.comment, b.status, "
+    "TO_CHAR(b.created_at, 'YYYY-MM-DD HH24:MI') as created_at, "
+    "TO_CHAR(b.booking_date, 'YYYY-MM-DD') as booking_date, "
+    "TO_CHAR(b.booking_time, 'HH24:MI') as booking_time, "
+    "b.assignee_id, u.full_name as assignee_name, "
+    "TO_CHAR(b.created_at, 'YYYY-MM-DD\"T\"HH24:MI:SS.US') as cursor_created_at "
+    "FROM {schema}.bookings b "
+    "LEFT JOIN {schema}.users u ON b.assignee_id = u.id "
+    "ORDER BY b.created_at DESC, b.id DESC LIMIT %s"
+)
+
+
+def load_fastjson() -> Any:
+    '''Модуль функции bookings без её остальных зависимостей (db, metrics)'''
+    spec = importlib.util.spec_from_file_location('bookings_fastjson', FASTJSON_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_rows(count: int) -> List[Dict[str, Any]]:
+    return [{
+        'id': i, 'name': f'Клиент {i}', 'phone': f'+7 9{i:09d}', 'email': f'client{i}@example.com',
+        'address': f'ул. Тестовая, {i % 500 + 1}', 'area': 20 + i % 280, 'service_type': 'apartment',
+        'comment': 'Позвонить заранее' if i % 5 == 0 else '', 'status': 'new',
+        'created_at': '2025-03-01 10:00', 'booking_date': '2025-03-05', 'booking_time': '12:00',
+        'assignee_id': i % 50 or None, 'assignee_name': f'Исполнитель {i % 50}' if i % 50 else None,
+    } for i in range(count)]
+
+
+def timed(action: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    samples: List[float] = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = action()
+        samples.append((time.perf_counter() - started) * 1000)
+        size = len(payload)
+    report = summarize(samples, 0)
+    report['payload_chars'] = size
+    return report
+
+
+def run_synthetic(fastjson: Any, rows: List[int], repeat: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for count in rows:
+        data = synthetic_rows(count)
+        results[f'encode.json.{count}'] = timed(lambda: json.dumps(data), repeat)
+        if fastjson.orjson is not None:
+            results[f'encode.orjson.{count}'] = timed(lambda: fastjson.dumps(data), repeat)
+    return results
+
+
+def run_database(fastjson: Any, dsn: str, rows: List[int], repeat: int) -> Dict[str, Any]:
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
+    page_query = LIST_QUERY.format(schema=SCHEMA)
+    json_query = fastjson.json_page_query(page_query, 'p.cursor_created_at DESC, p.id DESC', ['cursor_created_at'])
+    conn = psycopg2.connect(dsn)
+    results: Dict[str, Any] = {}
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+        def python_path(encode: Callable[[Any], str], count: int) -> Callable[[], str]:
+            def action() -> str:
+                cursor.execute(page_query, (count,))
+                items = [dict(row) for row in cursor.fetchall()]
+                for item in items:
+                    del item['cursor_created_at']
+                return encode(items)
+            return action
+
+        def database_path(count: int) -> Callable[[], str]:
+            def action() -> str:
+                cursor.execute(json_query, (count, None, None))
+                return cursor.fetchone()['items']
+            return action
+
+        for count in rows:
+            results[f'list.json.{count}'] = timed(python_path(json.dumps, count), repeat)
+            if fastjson.orjson is not None:
+                results[f'list.orjson.{count}'] = timed(python_path(fastjson.dumps, count), repeat)
+            results[f'list.json_agg.{count}'] = timed(database_path(count), repeat)
+            print(json.dumps({'event': 'measured', 'rows': count}), flush=True)
+        conn.rollback()
+    finally:
+        conn.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк сериализации списка заявок')
+    parser.add_argument('--dsn', help='DSN из python -m benchmarks.seed (нужно не меньше max(--rows) заявок)')
+    parser.add_argument('--synthetic', action='store_true', help='без базы: только json против orjson')
+    parser.add_argument('--rows', type=int, nargs='*', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help='по умолчанию benchmarks/results/serialization-<commit>.json')
+    args = parser.parse_args()
+    if not args.dsn and not args.synthetic:
+        parser.error('--dsn or --synthetic is required')
+
+    fastjson = load_fastjson()
+    if args.synthetic:
+        results = run_synthetic(fastjson, args.rows, args.repeat)
+    else:
+        results = run_database(fastjson, args.dsn, args.rows, args.repeat)
+
+    revision = git_revision()
+    report = {
+        'meta': {**revision, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                 'repeat': args.repeat, 'encoder': fastjson.ENCODER, 'synthetic': args.synthetic},
+        'dataset': {'rows': args.rows},
+        'results': results,
+    }
+    for name, row in results.items():
+        print(f"{name:<28}{row['p50_ms']:>10} ms p50{row['p95_ms']:>10} ms p95{row['payload_chars']:>12} chars")
+    output = args.output or os.path.join(RESULTS_DIR, f"serialization-{(revision['commit'] or 'nogit')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as target:
+        json.dump(report, target, ensure_ascii=False, indent=2)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
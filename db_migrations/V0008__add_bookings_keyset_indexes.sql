@@ -0,0 +1,16 @@
+-- Составные индексы для keyset-пагинации списка заявок по (created_at, id)
+-- и серверных фильтров: каждый фильтр превращается в range scan по индексу
+CREATE INDEX IF NOT EXISTS idx_bookings_created_at_id
+    ON t_p89410065_cleaning_service_web.bookings (created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_status_created_at_id
+    ON t_p89410065_cleaning_service_web.bookings (status, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_assignee_created_at_id
+    ON t_p89410065_cleaning_service_web.bookings (assignee_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_service_type_created_at_id
+    ON t_p89410065_cleaning_service_web.bookings (service_type, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_booking_date_created_at_id
+    ON t_p89410065_cleaning_service_web.bookings (booking_date, created_at DESC, id DESC);
@@ -0,0 +1,19 @@
+-- Серверный поиск по заявкам: нормализованный телефон (только цифры)
+-- и поисковая строка (имя + email + цифры телефона) с триграммным GIN-индексом
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE t_p89410065_cleaning_service_web.bookings
+ADD COLUMN IF NOT EXISTS phone_digits TEXT
+    GENERATED ALWAYS AS (regexp_replace(phone, '[^0-9]', '', 'g')) STORED;
+
+ALTER TABLE t_p89410065_cleaning_service_web.bookings
+ADD COLUMN IF NOT EXISTS search_text TEXT
+    GENERATED ALWAYS AS (
+        lower(name || ' ' || email || ' ' || regexp_replace(phone, '[^0-9]', '', 'g'))
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_bookings_search_text_trgm
+    ON t_p89410065_cleaning_service_web.bookings USING GIN (search_text gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_phone_digits
+    ON t_p89410065_cleaning_service_web.bookings (phone_digits text_pattern_ops);
@@ -0,0 +1,50 @@
+-- Счётчики заявок для дашборда: (день создания, статус, ответственный) -> количество
+-- Поддерживаются триггером на bookings, поэтому статистика не требует полного скана
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.booking_stats (
+    day DATE NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    assignee_id INTEGER NOT NULL DEFAULT 0,
+    cnt INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status, assignee_id)
+);
+
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.bookings_stats_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND NEW.status IS NOT DISTINCT FROM OLD.status
+       AND NEW.assignee_id IS NOT DISTINCT FROM OLD.assignee_id
+       AND NEW.created_at::date = OLD.created_at::date THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE t_p89410065_cleaning_service_web.booking_stats
+        SET cnt = cnt - 1
+        WHERE day = OLD.created_at::date
+          AND status = OLD.status
+          AND assignee_id = COALESCE(OLD.assignee_id, 0);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO t_p89410065_cleaning_service_web.booking_stats (day, status, assignee_id, cnt)
+        VALUES (NEW.created_at::date, NEW.status, COALESCE(NEW.assignee_id, 0), 1)
+        ON CONFLICT (day, status, assignee_id)
+        DO UPDATE SET cnt = t_p89410065_cleaning_service_web.booking_stats.cnt + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bookings_stats ON t_p89410065_cleaning_service_web.bookings;
+CREATE TRIGGER trg_bookings_stats
+AFTER INSERT OR UPDATE OR DELETE ON t_p89410065_cleaning_service_web.bookings
+FOR EACH ROW EXECUTE FUNCTION t_p89410065_cleaning_service_web.bookings_stats_trg();
+
+-- Заполнение счётчиков по существующим заявкам
+INSERT INTO t_p89410065_cleaning_service_web.booking_stats (day, status, assignee_id, cnt)
+SELECT created_at::date, status, COALESCE(assignee_id, 0), COUNT(*)
+FROM t_p89410065_cleaning_service_web.bookings
+GROUP BY created_at::date, status, COALESCE(assignee_id, 0)
+ON CONFLICT (day, status, assignee_id) DO UPDATE SET cnt = EXCLUDED.cnt;
@@ -0,0 +1,18 @@
+-- Transactional outbox: уведомления о новых заявках пишутся в одной транзакции с заявкой,
+-- а отправляет их отдельный диспетчер (backend/notifications) с повторами и dead-letter
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.notification_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    booking_id INTEGER,
+    channel VARCHAR(20) NOT NULL CHECK (channel IN ('email', 'telegram')),
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'skipped', 'dead')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_pending
+    ON t_p89410065_cleaning_service_web.notification_outbox (next_attempt_at, id)
+    WHERE status = 'pending';
@@ -0,0 +1,45 @@
+-- Инкрементальная синхронизация админ-панели: индекс по updated_at,
+-- автоматическое обновление updated_at и надгробия удалённых заявок
+CREATE INDEX IF NOT EXISTS idx_bookings_updated_at_id
+    ON t_p89410065_cleaning_service_web.bookings (updated_at, id);
+
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.bookings_touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bookings_touch_updated_at ON t_p89410065_cleaning_service_web.bookings;
+CREATE TRIGGER trg_bookings_touch_updated_at
+BEFORE UPDATE ON t_p89410065_cleaning_service_web.bookings
+FOR EACH ROW EXECUTE FUNCTION t_p89410065_cleaning_service_web.bookings_touch_updated_at();
+
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.booking_tombstones (
+    booking_id INTEGER PRIMARY KEY,
+    assignee_id INTEGER,
+    deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_booking_tombstones_deleted_at
+    ON t_p89410065_cleaning_service_web.booking_tombstones (deleted_at);
+
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.bookings_tombstone_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO t_p89410065_cleaning_service_web.booking_tombstones (booking_id, assignee_id, deleted_at)
+    VALUES (OLD.id, OLD.assignee_id, CURRENT_TIMESTAMP)
+    ON CONFLICT (booking_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+
+    DELETE FROM t_p89410065_cleaning_service_web.booking_tombstones
+    WHERE deleted_at < CURRENT_TIMESTAMP - INTERVAL '30 days';
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bookings_tombstone ON t_p89410065_cleaning_service_web.bookings;
+CREATE TRIGGER trg_bookings_tombstone
+AFTER DELETE ON t_p89410065_cleaning_service_web.bookings
+FOR EACH ROW EXECUTE FUNCTION t_p89410065_cleaning_service_web.bookings_tombstone_trg();
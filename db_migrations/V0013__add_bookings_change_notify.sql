@@ -0,0 +1,35 @@
+-- Лента изменений заявок: каждое изменение отправляет NOTIFY в канал bookings_changes,
+-- шлюз (gateway/change_feed.py) слушает канал одним соединением и раздаёт события админам.
+-- Массовые операции выставляют SET LOCAL bookings.notify = 'off' и шлют одно сводное событие
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.bookings_notify_trg()
+RETURNS TRIGGER AS $$
+DECLARE
+    rec RECORD;
+BEGIN
+    IF current_setting('bookings.notify', true) = 'off' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+    ELSE
+        rec := NEW;
+    END IF;
+
+    PERFORM pg_notify('bookings_changes', json_build_object(
+        'op', TG_OP,
+        'id', rec.id,
+        'status', rec.status,
+        'assignee_id', rec.assignee_id,
+        'previous_assignee_id', CASE WHEN TG_OP = 'UPDATE' THEN OLD.assignee_id END,
+        'at', TO_CHAR(CURRENT_TIMESTAMP, 'YYYY-MM-DD"T"HH24:MI:SS.US')
+    )::text);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bookings_notify ON t_p89410065_cleaning_service_web.bookings;
+CREATE TRIGGER trg_bookings_notify
+AFTER INSERT OR UPDATE OR DELETE ON t_p89410065_cleaning_service_web.bookings
+FOR EACH ROW EXECUTE FUNCTION t_p89410065_cleaning_service_web.bookings_notify_trg();
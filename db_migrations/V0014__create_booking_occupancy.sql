@@ -0,0 +1,212 @@
+-- Модель загрузки исполнителей для выбора времени записи.
+-- Рабочий день делится на слоты по slot_minutes начиная с day_start; занятость исполнителя за день -
+-- битовая маска BIGINT (бит i - слот i), поэтому слотов в дне не больше 62
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.schedule_settings (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    day_start TIME NOT NULL DEFAULT '08:00',
+    slot_minutes INTEGER NOT NULL DEFAULT 30 CHECK (slot_minutes BETWEEN 5 AND 240),
+    slots_per_day INTEGER NOT NULL DEFAULT 24 CHECK (slots_per_day BETWEEN 1 AND 62)
+);
+
+INSERT INTO t_p89410065_cleaning_service_web.schedule_settings (id)
+VALUES (TRUE)
+ON CONFLICT (id) DO NOTHING;
+
+-- Оценка длительности работ: base_minutes + minutes_per_m2 * площадь; '*' - для неизвестных типов
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.service_durations (
+    service_type VARCHAR(100) PRIMARY KEY,
+    base_minutes INTEGER NOT NULL CHECK (base_minutes >= 0),
+    minutes_per_m2 NUMERIC(6, 2) NOT NULL CHECK (minutes_per_m2 >= 0)
+);
+
+INSERT INTO t_p89410065_cleaning_service_web.service_durations (service_type, base_minutes, minutes_per_m2) VALUES
+    ('office', 30, 1.2),
+    ('apartment', 30, 1.5),
+    ('renovation', 60, 3.0),
+    ('furniture', 60, 0.5),
+    ('*', 60, 1.5)
+ON CONFLICT (service_type) DO NOTHING;
+
+-- Маска слотов заявки. Длительность ограничена рабочим днём, начало вне рабочих часов
+-- прижимается к его границам - такая заявка всё равно занимает исполнителя
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.booking_slot_mask(
+    p_time TIME, p_area INTEGER, p_service_type VARCHAR
+) RETURNS BIGINT AS $$
+DECLARE
+    s t_p89410065_cleaning_service_web.schedule_settings%ROWTYPE;
+    d t_p89410065_cleaning_service_web.service_durations%ROWTYPE;
+    slot_count INTEGER;
+    start_slot INTEGER;
+BEGIN
+    SELECT * INTO s FROM t_p89410065_cleaning_service_web.schedule_settings WHERE id;
+    SELECT * INTO d FROM t_p89410065_cleaning_service_web.service_durations
+    WHERE service_type IN (p_service_type, '*')
+    ORDER BY service_type = '*'
+    LIMIT 1;
+
+    slot_count := LEAST(GREATEST(
+        CEIL((COALESCE(d.base_minutes, 60) + COALESCE(d.minutes_per_m2, 1.5) * GREATEST(COALESCE(p_area, 0), 0))
+             / s.slot_minutes)::INTEGER, 1), s.slots_per_day);
+    start_slot := FLOOR(EXTRACT(EPOCH FROM (COALESCE(p_time, s.day_start) - s.day_start)) / 60 / s.slot_minutes)::INTEGER;
+    start_slot := LEAST(GREATEST(start_slot, 0), s.slots_per_day - slot_count);
+
+    RETURN ((1::BIGINT << slot_count) - 1) << start_slot;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Занятость назначенных исполнителей по дням: OR масок их активных заявок
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.cleaner_occupancy (
+    day DATE NOT NULL,
+    assignee_id INTEGER NOT NULL,
+    busy BIGINT NOT NULL DEFAULT 0,
+    jobs INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, assignee_id)
+);
+
+-- Неназначенные заявки: сколько их приходится на каждый слот дня (counts[i + 1] - слот i)
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.slot_demand (
+    day DATE PRIMARY KEY,
+    counts INTEGER[] NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_assignee_booking_date
+    ON t_p89410065_cleaning_service_web.bookings (assignee_id, booking_date);
+
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.occupancy_refresh_cleaner(
+    p_assignee_id INTEGER, p_day DATE
+) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO t_p89410065_cleaning_service_web.cleaner_occupancy (day, assignee_id, busy, jobs)
+    SELECT p_day, p_assignee_id,
+           COALESCE(BIT_OR(t_p89410065_cleaning_service_web.booking_slot_mask(b.booking_time, b.area, b.service_type)), 0),
+           COUNT(*)
+    FROM t_p89410065_cleaning_service_web.bookings b
+    WHERE b.assignee_id = p_assignee_id AND b.booking_date = p_day AND b.status <> 'cancelled'
+    ON CONFLICT (day, assignee_id) DO UPDATE SET busy = EXCLUDED.busy, jobs = EXCLUDED.jobs;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.occupancy_apply_demand(
+    p_day DATE, p_mask BIGINT, p_delta INTEGER
+) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO t_p89410065_cleaning_service_web.slot_demand (day, counts)
+    VALUES (p_day, array_fill(0, ARRAY[62]))
+    ON CONFLICT (day) DO NOTHING;
+
+    UPDATE t_p89410065_cleaning_service_web.slot_demand
+    SET counts = (
+        SELECT array_agg(GREATEST(c + CASE WHEN (p_mask >> (i - 1)::INTEGER) & 1 = 1 THEN p_delta ELSE 0 END, 0) ORDER BY i)
+        FROM unnest(counts) WITH ORDINALITY AS u(c, i)
+    )
+    WHERE day = p_day;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Инкрементальное обновление при создании, изменении и удалении заявки.
+-- Маска исполнителя пересчитывается по его заявкам за день (у одного исполнителя их единицы),
+-- счётчики неназначенных меняются на +-1 по слотам заявки. Массовая загрузка выставляет
+-- SET LOCAL bookings.bulk = 'on' и пересчитывает затронутые дни одним occupancy_rebuild_days()
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.bookings_occupancy_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF current_setting('bookings.bulk', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE'
+       AND NEW.assignee_id IS NOT DISTINCT FROM OLD.assignee_id
+       AND NEW.booking_date IS NOT DISTINCT FROM OLD.booking_date
+       AND NEW.booking_time IS NOT DISTINCT FROM OLD.booking_time
+       AND NEW.area IS NOT DISTINCT FROM OLD.area
+       AND NEW.service_type IS NOT DISTINCT FROM OLD.service_type
+       AND (NEW.status = 'cancelled') = (OLD.status = 'cancelled') THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.booking_date IS NOT NULL AND OLD.status <> 'cancelled' THEN
+        IF OLD.assignee_id IS NULL THEN
+            PERFORM t_p89410065_cleaning_service_web.occupancy_apply_demand(
+                OLD.booking_date,
+                t_p89410065_cleaning_service_web.booking_slot_mask(OLD.booking_time, OLD.area, OLD.service_type),
+                -1
+            );
+        ELSE
+            PERFORM t_p89410065_cleaning_service_web.occupancy_refresh_cleaner(OLD.assignee_id, OLD.booking_date);
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.booking_date IS NOT NULL AND NEW.status <> 'cancelled' THEN
+        IF NEW.assignee_id IS NULL THEN
+            PERFORM t_p89410065_cleaning_service_web.occupancy_apply_demand(
+                NEW.booking_date,
+                t_p89410065_cleaning_service_web.booking_slot_mask(NEW.booking_time, NEW.area, NEW.service_type),
+                1
+            );
+        ELSIF TG_OP = 'INSERT' THEN
+            INSERT INTO t_p89410065_cleaning_service_web.cleaner_occupancy (day, assignee_id, busy, jobs)
+            VALUES (
+                NEW.booking_date, NEW.assignee_id,
+                t_p89410065_cleaning_service_web.booking_slot_mask(NEW.booking_time, NEW.area, NEW.service_type), 1
+            )
+            ON CONFLICT (day, assignee_id) DO UPDATE
+            SET busy = t_p89410065_cleaning_service_web.cleaner_occupancy.busy | EXCLUDED.busy,
+                jobs = t_p89410065_cleaning_service_web.cleaner_occupancy.jobs + 1;
+        ELSE
+            PERFORM t_p89410065_cleaning_service_web.occupancy_refresh_cleaner(NEW.assignee_id, NEW.booking_date);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bookings_occupancy ON t_p89410065_cleaning_service_web.bookings;
+CREATE TRIGGER trg_bookings_occupancy
+AFTER INSERT OR UPDATE OR DELETE ON t_p89410065_cleaning_service_web.bookings
+FOR EACH ROW EXECUTE FUNCTION t_p89410065_cleaning_service_web.bookings_occupancy_trg();
+
+-- Пересчёт занятости по заявкам за дни p_days (NULL - за все дни): после массовой загрузки
+-- с bookings.bulk = 'on' и при заполнении в миграции
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.occupancy_rebuild_days(p_days DATE[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM t_p89410065_cleaning_service_web.cleaner_occupancy
+    WHERE p_days IS NULL OR day = ANY(p_days);
+    DELETE FROM t_p89410065_cleaning_service_web.slot_demand
+    WHERE p_days IS NULL OR day = ANY(p_days);
+
+    INSERT INTO t_p89410065_cleaning_service_web.cleaner_occupancy (day, assignee_id, busy, jobs)
+    SELECT booking_date, assignee_id,
+           BIT_OR(t_p89410065_cleaning_service_web.booking_slot_mask(booking_time, area, service_type)), COUNT(*)
+    FROM t_p89410065_cleaning_service_web.bookings
+    WHERE assignee_id IS NOT NULL AND booking_date IS NOT NULL AND status <> 'cancelled'
+      AND (p_days IS NULL OR booking_date = ANY(p_days))
+    GROUP BY booking_date, assignee_id;
+
+    INSERT INTO t_p89410065_cleaning_service_web.slot_demand (day, counts)
+    SELECT day, array_agg(cnt ORDER BY slot)
+    FROM (
+        SELECT m.booking_date AS day, g.slot, SUM(((m.mask >> g.slot) & 1)::INTEGER)::INTEGER AS cnt
+        FROM (
+            SELECT booking_date, t_p89410065_cleaning_service_web.booking_slot_mask(booking_time, area, service_type) AS mask
+            FROM t_p89410065_cleaning_service_web.bookings
+            WHERE assignee_id IS NULL AND booking_date IS NOT NULL AND status <> 'cancelled'
+              AND (p_days IS NULL OR booking_date = ANY(p_days))
+        ) m
+        CROSS JOIN generate_series(0, 61) AS g(slot)
+        GROUP BY m.booking_date, g.slot
+    ) per_slot
+    GROUP BY day;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Полный пересчёт по всем заявкам
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.occupancy_rebuild()
+RETURNS VOID AS $$
+BEGIN
+    PERFORM t_p89410065_cleaning_service_web.occupancy_rebuild_days(NULL);
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT t_p89410065_cleaning_service_web.occupancy_rebuild();
@@ -0,0 +1,175 @@
+-- Геокодирование адресов заявок без внешних сервисов: локальный справочник улиц и городов (gazetteer)
+-- и кэш точных координат (geocode_cache). Точка заявки - POINT(долгота, широта) с GiST-индексом,
+-- поиск "заявки рядом" - KNN-сканирование индекса по оператору <->
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.gazetteer (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL CHECK (kind IN ('city', 'street')),
+    city TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    location POINT NOT NULL,
+    UNIQUE (kind, city, name_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_gazetteer_kind_name_key
+    ON t_p89410065_cleaning_service_web.gazetteer (kind, name_key);
+
+-- Точные координаты конкретных адресов (ручная правка, выгрузка из внешнего геокодера);
+-- ключ - нормализованный адрес, имеет приоритет над справочником
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.geocode_cache (
+    address_key TEXT PRIMARY KEY,
+    location POINT NOT NULL,
+    source VARCHAR(50) NOT NULL DEFAULT 'manual',
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE t_p89410065_cleaning_service_web.bookings ADD COLUMN IF NOT EXISTS location POINT;
+ALTER TABLE t_p89410065_cleaning_service_web.bookings ADD COLUMN IF NOT EXISTS geocode_precision VARCHAR(20);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_location
+    ON t_p89410065_cleaning_service_web.bookings USING GIST (location);
+
+-- Часть адреса без типов объектов, регистра, ё и пунктуации: 'ул. Тверская' и 'Тверская улица' -> 'тверская'
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.normalize_address_part(p_part TEXT)
+RETURNS TEXT AS $$
+    SELECT btrim(regexp_replace(regexp_replace(regexp_replace(
+        translate(lower(p_part), 'ё', 'е'),
+        '(^|[\s.])(город|гор|г|улица|ул|проспект|просп|пр-кт|пр-т|переулок|пер|шоссе|ш|бульвар|б-р|'
+        'набережная|наб|площадь|пл|проезд|пр-д|микрорайон|мкр|дом|д|квартира|кв|корпус|корп|строение|стр)(?=$|[\s.])',
+        ' ', 'g'),
+        '[."«»()]', ' ', 'g'),
+        '\s+', ' ', 'g'))
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.normalize_address(p_address TEXT)
+RETURNS TEXT[] AS $$
+    SELECT array_agg(part ORDER BY i)
+    FROM unnest(string_to_array(p_address, ',')) WITH ORDINALITY AS u(raw, i),
+         LATERAL t_p89410065_cleaning_service_web.normalize_address_part(u.raw) AS part
+    WHERE part <> ''
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Точка адреса и её точность: exact (кэш), street (центр улицы), city (центр города) или NULL.
+-- Улица сравнивается и без номера дома в той же части адреса ('тверская 7' -> 'тверская')
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.geocode_address(
+    p_address TEXT, OUT location POINT, OUT geocode_precision VARCHAR
+) AS $$
+DECLARE
+    parts TEXT[];
+    bare TEXT[];
+    city_key TEXT;
+    city_location POINT;
+BEGIN
+    parts := t_p89410065_cleaning_service_web.normalize_address(p_address);
+    IF parts IS NULL THEN
+        RETURN;
+    END IF;
+
+    SELECT c.location, 'exact' INTO location, geocode_precision
+    FROM t_p89410065_cleaning_service_web.geocode_cache c
+    WHERE c.address_key = array_to_string(parts, ', ');
+    IF FOUND THEN
+        RETURN;
+    END IF;
+
+    bare := ARRAY(SELECT regexp_replace(p, '\s+\d\S*$', '') FROM unnest(parts) AS p);
+
+    SELECT g.name_key, g.location INTO city_key, city_location
+    FROM t_p89410065_cleaning_service_web.gazetteer g
+    WHERE g.kind = 'city' AND g.name_key = ANY(bare)
+    ORDER BY array_position(bare, g.name_key)
+    LIMIT 1;
+
+    -- без города в адресе улица ищется по всему справочнику, при совпадении названий первой идёт Москва
+    SELECT g.location, 'street' INTO location, geocode_precision
+    FROM t_p89410065_cleaning_service_web.gazetteer g
+    WHERE g.kind = 'street' AND g.name_key = ANY(bare) AND (city_key IS NULL OR g.city = city_key)
+    ORDER BY g.city = 'москва' DESC, array_position(bare, g.name_key), g.id
+    LIMIT 1;
+    IF NOT FOUND AND city_key IS NOT NULL THEN
+        location := city_location;
+        geocode_precision := 'city';
+    END IF;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.bookings_geocode_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR NEW.address IS DISTINCT FROM OLD.address THEN
+        SELECT g.location, g.geocode_precision INTO NEW.location, NEW.geocode_precision
+        FROM t_p89410065_cleaning_service_web.geocode_address(NEW.address) g;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bookings_geocode ON t_p89410065_cleaning_service_web.bookings;
+CREATE TRIGGER trg_bookings_geocode
+BEFORE INSERT OR UPDATE OF address ON t_p89410065_cleaning_service_web.bookings
+FOR EACH ROW EXECUTE FUNCTION t_p89410065_cleaning_service_web.bookings_geocode_trg();
+
+-- updated_at (V0012) отражает изменения заявки, а не служебных колонок: пересчёт координат не должен
+-- заставлять клиентов updated_since заново скачивать всю таблицу. Колонки бизнес-данных перечислены явно
+DROP TRIGGER IF EXISTS trg_bookings_touch_updated_at ON t_p89410065_cleaning_service_web.bookings;
+CREATE TRIGGER trg_bookings_touch_updated_at
+BEFORE UPDATE OF name, phone, email, address, area, service_type, comment, status,
+                 booking_date, booking_time, assignee_id
+ON t_p89410065_cleaning_service_web.bookings
+FOR EACH ROW EXECUTE FUNCTION t_p89410065_cleaning_service_web.bookings_touch_updated_at();
+
+-- Повторное геокодирование после пополнения справочника или кэша; p_only_missing - только заявки без точки.
+-- Меняются лишь координаты, поэтому построчные NOTIFY (V0013) отключены, а updated_at не трогается
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.geocode_refresh(p_only_missing BOOLEAN)
+RETURNS INTEGER AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    PERFORM set_config('bookings.notify', 'off', true);
+    UPDATE t_p89410065_cleaning_service_web.bookings b
+    SET location = g.location, geocode_precision = g.geocode_precision
+    FROM t_p89410065_cleaning_service_web.bookings src,
+         LATERAL t_p89410065_cleaning_service_web.geocode_address(src.address) g
+    WHERE b.id = src.id
+      AND (NOT p_only_missing OR b.location IS NULL)
+      AND (b.location IS DISTINCT FROM g.location OR b.geocode_precision IS DISTINCT FROM g.geocode_precision);
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Начальный справочник: центры городов и крупных улиц Москвы (приблизительно, для кластеризации маршрутов
+-- этого достаточно); полный справочник загружается python routing.py load-gazetteer
+INSERT INTO t_p89410065_cleaning_service_web.gazetteer (kind, city, name_key, name, location) VALUES
+    ('city', 'москва', 'москва', 'Москва', POINT(37.6173, 55.7558)),
+    ('city', 'санкт-петербург', 'санкт-петербург', 'Санкт-Петербург', POINT(30.3351, 59.9343)),
+    ('city', 'санкт-петербург', 'спб', 'Санкт-Петербург', POINT(30.3351, 59.9343)),
+    ('city', 'химки', 'химки', 'Химки', POINT(37.4450, 55.8970)),
+    ('city', 'мытищи', 'мытищи', 'Мытищи', POINT(37.7300, 55.9100)),
+    ('city', 'балашиха', 'балашиха', 'Балашиха', POINT(37.9380, 55.7960)),
+    ('city', 'подольск', 'подольск', 'Подольск', POINT(37.5450, 55.4310)),
+    ('city', 'красногорск', 'красногорск', 'Красногорск', POINT(37.3300, 55.8310)),
+    ('city', 'зеленоград', 'зеленоград', 'Зеленоград', POINT(37.1950, 55.9900)),
+    ('street', 'москва', 'тверская', 'Тверская улица', POINT(37.6060, 55.7640)),
+    ('street', 'москва', 'арбат', 'улица Арбат', POINT(37.5920, 55.7495)),
+    ('street', 'москва', 'новый арбат', 'улица Новый Арбат', POINT(37.5850, 55.7525)),
+    ('street', 'москва', 'ленинский', 'Ленинский проспект', POINT(37.5500, 55.6900)),
+    ('street', 'москва', 'ленинградский', 'Ленинградский проспект', POINT(37.5400, 55.7950)),
+    ('street', 'москва', 'кутузовский', 'Кутузовский проспект', POINT(37.5250, 55.7400)),
+    ('street', 'москва', 'мира', 'проспект Мира', POINT(37.6350, 55.8000)),
+    ('street', 'москва', 'профсоюзная', 'Профсоюзная улица', POINT(37.5300, 55.6550)),
+    ('street', 'москва', 'варшавское', 'Варшавское шоссе', POINT(37.6200, 55.6400)),
+    ('street', 'москва', 'вернадского', 'проспект Вернадского', POINT(37.4950, 55.6750)),
+    ('street', 'москва', 'мясницкая', 'Мясницкая улица', POINT(37.6400, 55.7640)),
+    ('street', 'москва', 'покровка', 'улица Покровка', POINT(37.6470, 55.7590)),
+    ('street', 'москва', 'садовая-кудринская', 'Садовая-Кудринская улица', POINT(37.5870, 55.7640)),
+    ('street', 'москва', 'большая якиманка', 'улица Большая Якиманка', POINT(37.6120, 55.7340)),
+    ('street', 'москва', 'люблинская', 'Люблинская улица', POINT(37.7450, 55.6850)),
+    ('street', 'москва', 'щелковское', 'Щёлковское шоссе', POINT(37.8000, 55.8100)),
+    ('street', 'москва', 'дмитровское', 'Дмитровское шоссе', POINT(37.5600, 55.8600)),
+    ('street', 'москва', 'митинская', 'Митинская улица', POINT(37.3600, 55.8450)),
+    ('street', 'санкт-петербург', 'невский', 'Невский проспект', POINT(30.3500, 59.9320)),
+    ('street', 'санкт-петербург', 'московский', 'Московский проспект', POINT(30.3200, 59.8800))
+ON CONFLICT (kind, city, name_key) DO NOTHING;
+
+SELECT t_p89410065_cleaning_service_web.geocode_refresh(TRUE);
@@ -0,0 +1,82 @@
+-- Структурированные тарифы для расчёта стоимости заявки; services.price остаётся текстом для витрины.
+-- Цена = max(min_price, base_price + rate_per_m2 * max(площадь, min_area)) * произведение множителей
+-- подходящих модификаторов + сумма их надбавок
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.tariffs (
+    service_type VARCHAR(100) PRIMARY KEY,
+    service_id INTEGER,
+    base_price NUMERIC(10, 2) NOT NULL DEFAULT 0 CHECK (base_price >= 0),
+    rate_per_m2 NUMERIC(10, 2) NOT NULL DEFAULT 0 CHECK (rate_per_m2 >= 0),
+    min_area INTEGER NOT NULL DEFAULT 0 CHECK (min_area >= 0),
+    min_price NUMERIC(10, 2) NOT NULL DEFAULT 0 CHECK (min_price >= 0),
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Модификаторы: условие (тип услуги, дни недели ISO 1-7, интервал времени [time_from, time_to),
+-- даты, площадь от min_area) и эффект - множитель и/или надбавка. NULL в условии - без ограничения
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.tariff_modifiers (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    service_type VARCHAR(100),
+    weekdays INTEGER[],
+    time_from TIME,
+    time_to TIME,
+    date_from DATE,
+    date_to DATE,
+    min_area INTEGER,
+    multiplier NUMERIC(6, 3) NOT NULL DEFAULT 1 CHECK (multiplier > 0),
+    surcharge NUMERIC(10, 2) NOT NULL DEFAULT 0,
+    active BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+-- Версия тарифов: функции держат скомпилированную таблицу в памяти и перечитывают её при смене версии
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.tariff_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO t_p89410065_cleaning_service_web.tariff_version (id)
+VALUES (TRUE)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.tariff_version_bump_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE t_p89410065_cleaning_service_web.tariff_version SET version = version + 1 WHERE id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_tariffs_version ON t_p89410065_cleaning_service_web.tariffs;
+CREATE TRIGGER trg_tariffs_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON t_p89410065_cleaning_service_web.tariffs
+FOR EACH STATEMENT EXECUTE FUNCTION t_p89410065_cleaning_service_web.tariff_version_bump_trg();
+
+DROP TRIGGER IF EXISTS trg_tariff_modifiers_version ON t_p89410065_cleaning_service_web.tariff_modifiers;
+CREATE TRIGGER trg_tariff_modifiers_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON t_p89410065_cleaning_service_web.tariff_modifiers
+FOR EACH STATEMENT EXECUTE FUNCTION t_p89410065_cleaning_service_web.tariff_version_bump_trg();
+
+-- изменения каталога услуг (функция services) тоже сбрасывают скомпилированные тарифы
+DROP TRIGGER IF EXISTS trg_services_tariff_version ON services;
+CREATE TRIGGER trg_services_tariff_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON services
+FOR EACH STATEMENT EXECUTE FUNCTION t_p89410065_cleaning_service_web.tariff_version_bump_trg();
+
+-- Начальные тарифы по ценам витрины из V0003
+INSERT INTO t_p89410065_cleaning_service_web.tariffs (service_type, service_id, base_price, rate_per_m2, min_area, min_price)
+VALUES
+    ('office', (SELECT MIN(id) FROM services WHERE title = 'Офисная уборка'), 0, 500, 10, 5000),
+    ('apartment', (SELECT MIN(id) FROM services WHERE title = 'Квартиры и дома'), 0, 300, 20, 3000),
+    ('renovation', (SELECT MIN(id) FROM services WHERE title = 'После ремонта'), 0, 700, 20, 7000),
+    ('furniture', (SELECT MIN(id) FROM services WHERE title = 'Химчистка мебели'), 1500, 0, 0, 1500)
+ON CONFLICT (service_type) DO NOTHING;
+
+INSERT INTO t_p89410065_cleaning_service_web.tariff_modifiers (name, weekdays, time_from, time_to, min_area, multiplier)
+SELECT name, weekdays, time_from, time_to, min_area, multiplier
+FROM (VALUES
+    ('Выходные дни', ARRAY[6, 7], NULL::TIME, NULL::TIME, NULL::INTEGER, 1.2),
+    ('Раннее утро', NULL::INTEGER[], '00:00'::TIME, '09:00'::TIME, NULL::INTEGER, 1.1),
+    ('Вечер', NULL::INTEGER[], '18:00'::TIME, NULL::TIME, NULL::INTEGER, 1.15),
+    ('Большая площадь', NULL::INTEGER[], NULL::TIME, NULL::TIME, 200, 0.9)
+) AS seed (name, weekdays, time_from, time_to, min_area, multiplier)
+WHERE NOT EXISTS (SELECT 1 FROM t_p89410065_cleaning_service_web.tariff_modifiers);
@@ -0,0 +1,68 @@
+-- Отчёты для руководства: заявки и оценка выручки по неделям, типам услуг, исполнителям и статусам.
+-- Данные предагрегированы в материализованных представлениях с уникальными индексами, поэтому их можно
+-- обновлять REFRESH ... CONCURRENTLY по расписанию (python reports.py или POST ?action=report_refresh),
+-- не блокируя чтение
+
+-- Цена заявки по тарифам V0016 - та же формула, что quote_items() в bookings/pricing.py
+CREATE OR REPLACE FUNCTION t_p89410065_cleaning_service_web.tariff_price(
+    p_area INTEGER, p_service_type VARCHAR, p_date DATE, p_time TIME
+) RETURNS NUMERIC AS $$
+    SELECT GREATEST(FLOOR(
+        GREATEST(t.min_price, t.base_price + t.rate_per_m2 * GREATEST(COALESCE(p_area, 0), t.min_area))
+        * COALESCE(m.factor, 1) + COALESCE(m.extra, 0) + 0.5), 0)
+    FROM t_p89410065_cleaning_service_web.tariffs t
+    LEFT JOIN LATERAL (
+        SELECT EXP(SUM(LN(tm.multiplier))) AS factor, SUM(tm.surcharge) AS extra
+        FROM t_p89410065_cleaning_service_web.tariff_modifiers tm
+        WHERE tm.active
+          AND (tm.service_type IS NULL OR tm.service_type = p_service_type)
+          AND (tm.weekdays IS NULL OR EXTRACT(ISODOW FROM p_date)::integer = ANY(tm.weekdays))
+          AND ((tm.time_from IS NULL AND tm.time_to IS NULL)
+               OR (p_time IS NOT NULL AND (tm.time_from IS NULL OR p_time >= tm.time_from)
+                   AND (tm.time_to IS NULL OR p_time < tm.time_to)))
+          AND ((tm.date_from IS NULL AND tm.date_to IS NULL)
+               OR (p_date IS NOT NULL AND (tm.date_from IS NULL OR p_date >= tm.date_from)
+                   AND (tm.date_to IS NULL OR p_date <= tm.date_to)))
+          AND (tm.min_area IS NULL OR COALESCE(p_area, 0) >= tm.min_area)
+    ) m ON TRUE
+    WHERE t.service_type = p_service_type
+$$ LANGUAGE sql STABLE;
+
+-- Неделя - по дате уборки (без даты - по дню создания); выручка по заявкам без тарифа не оценивается
+CREATE MATERIALIZED VIEW IF NOT EXISTS t_p89410065_cleaning_service_web.report_weekly_service AS
+SELECT date_trunc('week', COALESCE(b.booking_date, b.created_at::date))::date AS week,
+       b.service_type,
+       b.status,
+       COUNT(*) AS bookings,
+       COALESCE(SUM(b.area), 0) AS area_m2,
+       COALESCE(SUM(t_p89410065_cleaning_service_web.tariff_price(b.area, b.service_type, b.booking_date, b.booking_time)), 0)
+           AS estimated_revenue
+FROM t_p89410065_cleaning_service_web.bookings b
+GROUP BY 1, 2, 3;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_report_weekly_service_key
+    ON t_p89410065_cleaning_service_web.report_weekly_service (week, service_type, status);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS t_p89410065_cleaning_service_web.report_weekly_assignee AS
+SELECT date_trunc('week', COALESCE(b.booking_date, b.created_at::date))::date AS week,
+       COALESCE(b.assignee_id, 0) AS assignee_id,
+       b.status,
+       COUNT(*) AS bookings,
+       COALESCE(SUM(t_p89410065_cleaning_service_web.tariff_price(b.area, b.service_type, b.booking_date, b.booking_time)), 0)
+           AS estimated_revenue
+FROM t_p89410065_cleaning_service_web.bookings b
+GROUP BY 1, 2, 3;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_report_weekly_assignee_key
+    ON t_p89410065_cleaning_service_web.report_weekly_assignee (week, assignee_id, status);
+
+-- Время последнего обновления - отдаётся вместе с отчётом, чтобы была видна свежесть данных
+CREATE TABLE IF NOT EXISTS t_p89410065_cleaning_service_web.report_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    duration_ms INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT INTO t_p89410065_cleaning_service_web.report_state (id)
+VALUES (TRUE)
+ON CONFLICT (id) DO NOTHING;
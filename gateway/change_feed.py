@@ -0,0 +1,276 @@
+'''
+Business: Шлюз ленты изменений заявок - одно LISTEN-соединение с PostgreSQL, раздача событий админам
+Args: DATABASE_URL, FEED_HOST, FEED_PORT, FEED_BUFFER, FEED_HEARTBEAT из окружения; SESSION_KEYS как у функций
+Returns: HTTP-сервер с GET /events (server-sent events), GET /poll?after=N (long-poll), GET /health
+'''
+
+import json
+import os
+import queue
+import select
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Set, Tuple
+from urllib.parse import urlparse, parse_qs
+import psycopg2
+import psycopg2.extensions
+from tokens import request_identity, TokenError
+
+CHANNEL = 'bookings_changes'
+BUFFER_SIZE = int(os.environ.get('FEED_BUFFER', '1000'))
+HEARTBEAT_SECONDS = float(os.environ.get('FEED_HEARTBEAT', '15'))
+POLL_TIMEOUT_MAX = 30.0
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+def drop_queue(subscriber: queue.Queue) -> None:
+    '''Очищает очередь отключаемого подписчика и оставляет в ней только None, не блокируясь'''
+    while True:
+        try:
+            subscriber.get_nowait()
+        except queue.Empty:
+            break
+    try:
+        subscriber.put_nowait(None)
+    except queue.Full:
+        pass
+
+
+class ChangeFeed:
+    '''Кольцевой буфер последних событий и очереди подписчиков; медленные подписчики отключаются'''
+
+    def __init__(self, buffer_size: int = BUFFER_SIZE) -> None:
+        self._events: deque = deque(maxlen=buffer_size)
+        self._next_id = 1
+        self._subscribers: Set[queue.Queue] = set()
+        self._cond = threading.Condition()
+        self.stats: Dict[str, int] = {'received': 0, 'delivered': 0, 'dropped_subscribers': 0}
+
+    def publish(self, payload: Dict[str, Any]) -> None:
+        with self._cond:
+            event = (self._next_id, payload)
+            self._next_id += 1
+            self._events.append(event)
+            self.stats['received'] += 1
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.put_nowait(event)
+                    self.stats['delivered'] += 1
+                except queue.Full:
+                    # под блокировкой нельзя ждать место в очереди: освобождаем её и кладём маркер отключения
+                    self._subscribers.discard(subscriber)
+                    drop_queue(subscriber)
+                    self.stats['dropped_subscribers'] += 1
+            self._cond.notify_all()
+
+    def since(self, after: int) -> List[Tuple[int, Dict[str, Any]]]:
+        with self._cond:
+            return [event for event in self._events if event[0] > after]
+
+    def wait_since(self, after: int, timeout: float) -> List[Tuple[int, Dict[str, Any]]]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                events = [event for event in self._events if event[0] > after]
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self._cond.wait(remaining)
+
+    def last_id(self) -> int:
+        with self._cond:
+            return self._next_id - 1
+
+    def subscribe(self) -> queue.Queue:
+        subscriber: queue.Queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        with self._cond:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        with self._cond:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        with self._cond:
+            return len(self._subscribers)
+
+
+def listen_forever(feed: ChangeFeed, dsn: str, stop: threading.Event) -> None:
+    '''Держит LISTEN-соединение, переподключается с экспоненциальной задержкой'''
+    delay = 1.0
+    while not stop.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(dsn)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            # после переподключения клиенты должны дозапросить пропущенное через updated_since
+            feed.publish({'op': 'RESYNC'})
+            delay = 1.0
+            while not stop.is_set():
+                if select.select([conn], [], [], HEARTBEAT_SECONDS) == ([], [], []):
+                    with conn.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        feed.publish(json.loads(notify.payload))
+                    except ValueError:
+                        continue
+        except Exception as e:
+            print(json.dumps({'event': 'listen_error', 'error': str(e)}), flush=True)
+            stop.wait(delay)
+            delay = min(delay * 2, 30.0)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def visible_to(payload: Dict[str, Any], user_id: Optional[str], user_role: Optional[str]) -> bool:
+    '''Операторы видят только события по своим заявкам, как и в списке bookings'''
+    if not user_id or user_role in ['super_admin', 'admin'] or payload.get('op') in ['IMPORT', 'RESYNC']:
+        return True
+    return str(user_id) in (str(payload.get('assignee_id')), str(payload.get('previous_assignee_id')))
+
+
+class FeedRequestHandler(BaseHTTPRequestHandler):
+    feed: ChangeFeed = None  # type: ignore
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Any) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_OPTIONS(self) -> None:
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Authorization, Last-Event-ID')
+        self.send_header('Access-Control-Max-Age', '86400')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == '/health':
+            self._send_json(200, {
+                'subscribers': self.feed.subscriber_count(),
+                'last_event_id': self.feed.last_id(),
+                **self.feed.stats
+            })
+            return
+
+        headers = dict(self.headers.items())
+        # EventSource не умеет заголовки, поэтому токен допускается и в query
+        if params.get('token'):
+            headers['Authorization'] = 'Bearer ' + params['token']
+        try:
+            user_id, user_role = request_identity(headers)
+        except TokenError as e:
+            self._send_json(401, {'error': str(e)})
+            return
+
+        try:
+            after = int(params.get('after') or self.headers.get('Last-Event-ID') or self.feed.last_id())
+        except ValueError:
+            self._send_json(400, {'error': 'Invalid event id'})
+            return
+
+        if url.path == '/poll':
+            try:
+                timeout = float(params.get('timeout') or 25)
+                # nan и отрицательные значения превратили бы long-poll в непрерывный опрос
+                if not timeout > 0:
+                    raise ValueError(timeout)
+            except ValueError:
+                self._send_json(400, {'error': 'Invalid timeout'})
+                return
+            timeout = min(timeout, POLL_TIMEOUT_MAX)
+            events = self.feed.wait_since(after, timeout)
+            self._send_json(200, {
+                'events': [dict(payload, event_id=event_id) for event_id, payload in events
+                           if visible_to(payload, user_id, user_role)],
+                'last_event_id': events[-1][0] if events else after
+            })
+        elif url.path == '/events':
+            self._stream(after, user_id, user_role)
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def _stream(self, after: int, user_id: Optional[str], user_role: Optional[str]) -> None:
+        subscriber = self.feed.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.close_connection = True
+
+            backlog = self.feed.since(after)
+            replayed = backlog[-1][0] if backlog else after
+            for event in backlog:
+                self._write_event(event, user_id, user_role)
+            while True:
+                try:
+                    event = subscriber.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    self.wfile.write(b': ping\n\n')
+                    self.wfile.flush()
+                    continue
+                if event is None:
+                    break
+                if event[0] > replayed:
+                    self._write_event(event, user_id, user_role)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.feed.unsubscribe(subscriber)
+
+    def _write_event(self, event: Tuple[int, Dict[str, Any]], user_id: Optional[str], user_role: Optional[str]) -> None:
+        event_id, payload = event
+        if not visible_to(payload, user_id, user_role):
+            return
+        self.wfile.write(f'id: {event_id}\ndata: {json.dumps(payload)}\n\n'.encode('utf-8'))
+        self.wfile.flush()
+
+
+def serve(host: str, port: int, dsn: str) -> None:
+    feed = ChangeFeed()
+    stop = threading.Event()
+    listener = threading.Thread(target=listen_forever, args=(feed, dsn, stop), daemon=True)
+    listener.start()
+
+    FeedRequestHandler.feed = feed
+    server = ThreadingHTTPServer((host, port), FeedRequestHandler)
+    server.daemon_threads = True
+    print(json.dumps({'event': 'listening', 'host': host, 'port': port}), flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    serve(
+        os.environ.get('FEED_HOST', '0.0.0.0'),
+        int(os.environ.get('FEED_PORT', '8090')),
+        os.environ['DATABASE_URL']
+    )
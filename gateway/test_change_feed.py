@@ -0,0 +1,69 @@
+'''
+Business: Проверки ChangeFeed и /poll - переполненный подписчик отключается, не блокируя публикацию;
+          неверный timeout long-poll отклоняется с 400
+Args: запуск из gateway: python -m pytest -q
+Returns: результат pytest
+'''
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+from change_feed import ChangeFeed, FeedRequestHandler, SUBSCRIBER_QUEUE_SIZE
+
+
+def publish_with_timeout(feed: ChangeFeed, payload: dict, timeout: float = 2.0) -> bool:
+    publisher = threading.Thread(target=feed.publish, args=(payload,), daemon=True)
+    publisher.start()
+    publisher.join(timeout)
+    return not publisher.is_alive()
+
+
+def test_publish_returns_when_subscriber_queue_is_full():
+    feed = ChangeFeed(buffer_size=10)
+    stalled = feed.subscribe()
+    healthy = feed.subscribe()
+    for index in range(SUBSCRIBER_QUEUE_SIZE):
+        stalled.put_nowait((0, {'op': 'FILL', 'n': index}))
+
+    assert publish_with_timeout(feed, {'op': 'UPDATE', 'id': 1})
+
+    assert feed.subscriber_count() == 1
+    assert feed.stats['dropped_subscribers'] == 1
+    assert stalled.get_nowait() is None
+    assert stalled.empty()
+    assert healthy.get_nowait() == (1, {'op': 'UPDATE', 'id': 1})
+
+
+def test_feed_keeps_serving_after_eviction():
+    feed = ChangeFeed(buffer_size=10)
+    stalled = feed.subscribe()
+    for index in range(SUBSCRIBER_QUEUE_SIZE):
+        stalled.put_nowait((0, {'op': 'FILL', 'n': index}))
+
+    assert publish_with_timeout(feed, {'op': 'UPDATE', 'id': 1})
+    assert publish_with_timeout(feed, {'op': 'UPDATE', 'id': 2})
+    assert feed.last_id() == 2
+    assert [event_id for event_id, _ in feed.wait_since(0, 0.1)] == [1, 2]
+
+
+def test_poll_rejects_invalid_timeout():
+    FeedRequestHandler.feed = ChangeFeed(buffer_size=10)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FeedRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}/poll?after=0&timeout='
+    try:
+        for value in ('abc', '-1', '0', 'nan'):
+            try:
+                urllib.request.urlopen(base + value, timeout=5)
+            except urllib.error.HTTPError as e:
+                assert e.code == 400
+                assert json.loads(e.read()) == {'error': 'Invalid timeout'}
+            else:
+                raise AssertionError(value)
+        with urllib.request.urlopen(base + '0.05', timeout=5) as response:
+            assert json.loads(response.read()) == {'events': [], 'last_event_id': 0}
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -6,7 +6,7 @@ import Icon from '@/components/ui/icon';
 import { useToast } from '@/hooks/use-toast';
 
 interface LoginFormProps {
-  onLogin: (userId: number, userRole: string) => void;
+  onLogin: (userId: number, userRole: string, token: string | null) => void;
 }
 
 const AUTH_API_URL = 'https://functions.poehali.dev/07a5a039-979c-4a7c-a481-9eeb2c0fe91e';
@@ -33,7 +33,7 @@ export default function LoginForm({ onLogin }: LoginFormProps) {
       const data = await response.json();
 
       if (response.ok) {
-        onLogin(data.id, data.role);
+        onLogin(data.id, data.role, data.token ?? null);
         toast({
           title: 'Успешный вход',
           description: `Добро пожаловать, ${data.full_name}`
@@ -60,7 +60,7 @@ export default function ServicesManager({ currentUserRole }: ServicesManagerProp
   const fetchServices = async () => {
     setIsLoading(true);
     try {
-      const response = await fetch('https://functions.poehali.dev/3897ac2d-d595-41df-900e-fe7563a56fdc');
+      const response = await fetch('https://functions.poehali.dev/3897ac2d-d595-41df-900e-fe7563a56fdc', { cache: 'no-cache' });
       if (response.ok) {
         const data = await response.json();
         setServices(data);
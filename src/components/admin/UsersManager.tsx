@@ -13,9 +13,14 @@ import { User, USERS_API_URL } from '@/components/admin/types';
 
 interface UsersManagerProps {
   currentUserRole: string;
+  authToken?: string | null;
 }
 
-export default function UsersManager({ currentUserRole }: UsersManagerProps) {
+export default function UsersManager({ currentUserRole, authToken }: UsersManagerProps) {
+  const authHeaders: Record<string, string> = authToken
+    ? { 'Authorization': `Bearer ${authToken}` }
+    : {};
+
   const [users, setUsers] = useState<User[]>([]);
   const [isLoading, setIsLoading] = useState(false);
   const [showDialog, setShowDialog] = useState(false);
@@ -32,7 +37,7 @@ export default function UsersManager({ currentUserRole }: UsersManagerProps) {
   const fetchUsers = async () => {
     setIsLoading(true);
     try {
-      const response = await fetch(USERS_API_URL);
+      const response = await fetch(USERS_API_URL, { headers: authHeaders });
       if (response.ok) {
         const data = await response.json();
         setUsers(data);
@@ -107,7 +112,8 @@ export default function UsersManager({ currentUserRole }: UsersManagerProps) {
         method,
         headers: {
           'Content-Type': 'application/json',
-          'X-User-Role': currentUserRole
+          'X-User-Role': currentUserRole,
+          ...authHeaders
         },
         body: JSON.stringify(formData)
       });
@@ -156,7 +162,8 @@ export default function UsersManager({ currentUserRole }: UsersManagerProps) {
       const response = await fetch(`${USERS_API_URL}?id=${userId}`, {
         method: 'DELETE',
         headers: {
-          'X-User-Role': currentUserRole
+          'X-User-Role': currentUserRole,
+          ...authHeaders
         }
       });
 
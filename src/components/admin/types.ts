@@ -25,5 +25,27 @@ export interface User {
   updated_at?: string;
 }
 
+export interface BookingStats {
+  all_time: {
+    total: number;
+    by_status: Partial<Record<Booking['status'], number>>;
+    by_assignee: { assignee_id: number | null; assignee_name: string | null; count: number }[];
+  };
+  daily: {
+    date_from: string;
+    date_to: string;
+    by_day: { date: string; count: number }[];
+  };
+}
+
+export interface BookingChanges {
+  items: Booking[];
+  deleted: number[];
+  watermark: string;
+  full_resync: boolean;
+}
+
 export const API_URL = 'https://functions.poehali.dev/efa2b104-cb77-4f2d-ac02-829e0e6ca609';
-export const USERS_API_URL = 'https://functions.poehali.dev/51beba0b-3e24-426c-a0a2-94a9a8097920';
\ No newline at end of file
+export const USERS_API_URL = 'https://functions.poehali.dev/51beba0b-3e24-426c-a0a2-94a9a8097920';
+// шлюз gateway/change_feed.py; без него админка обновляется только после собственных действий
+export const CHANGE_FEED_URL: string | undefined = import.meta.env.VITE_CHANGE_FEED_URL;
\ No newline at end of file
@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Input } from '@/components/ui/input';
@@ -18,6 +18,13 @@ const getAvailableDates = () => {
   return dates;
 };
 
+const BOOKINGS_URL = 'https://functions.poehali.dev/efa2b104-cb77-4f2d-ac02-829e0e6ca609';
+
+type AvailabilityDay = {
+  date: string;
+  slots: { time: string; free: number }[];
+};
+
 const getAvailableTimeSlots = () => {
   return [
     '09:00', '10:00', '11:00', '12:00', 
@@ -29,8 +36,90 @@ const getAvailableTimeSlots = () => {
 export default function BookingForm() {
   const [selectedDate, setSelectedDate] = useState('');
   const [selectedTime, setSelectedTime] = useState('');
+  const [area, setArea] = useState('');
+  const [service, setService] = useState('');
+  const [availability, setAvailability] = useState<Record<string, string[]> | null>(null);
+  const [price, setPrice] = useState<number | null>(null);
   const { toast } = useToast();
 
+  useEffect(() => {
+    if (!service || !(Number(area) > 0)) {
+      setPrice(null);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(`${BOOKINGS_URL}?action=quote`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({
+            area: Number(area),
+            serviceType: service,
+            date: selectedDate || undefined,
+            time: selectedTime || undefined
+          }),
+          signal: controller.signal
+        });
+        const data = await response.json();
+        setPrice(response.ok ? data.price : null);
+      } catch (error) {
+        if (!controller.signal.aborted) {
+          setPrice(null);
+        }
+      }
+    }, 300);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [area, service, selectedDate, selectedTime]);
+
+  useEffect(() => {
+    if (!service || !(Number(area) > 0)) {
+      setAvailability(null);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({
+          action: 'availability',
+          area: String(Number(area)),
+          service_type: service,
+          days: '30'
+        });
+        const response = await fetch(`${BOOKINGS_URL}?${params}`, { signal: controller.signal });
+        if (!response.ok) {
+          setAvailability(null);
+          return;
+        }
+        const data: { capacity: number; days: AvailabilityDay[] } = await response.json();
+        if (!data.capacity) {
+          setAvailability(null);
+          return;
+        }
+        const byDate: Record<string, string[]> = {};
+        data.days.forEach(day => {
+          byDate[day.date] = day.slots.map(slot => slot.time);
+        });
+        setAvailability(byDate);
+      } catch (error) {
+        if (!controller.signal.aborted) {
+          setAvailability(null);
+        }
+      }
+    }, 300);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [area, service]);
+
+  const timeSlots = availability
+    ? availability[selectedDate] || []
+    : getAvailableTimeSlots();
+
   const handleBookingSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     
@@ -48,7 +137,7 @@ export default function BookingForm() {
     };
 
     try {
-      const response = await fetch('https://functions.poehali.dev/efa2b104-cb77-4f2d-ac02-829e0e6ca609', {
+      const response = await fetch(BOOKINGS_URL, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json'
@@ -65,6 +154,16 @@ export default function BookingForm() {
         (e.target as HTMLFormElement).reset();
         setSelectedDate('');
         setSelectedTime('');
+        setArea('');
+        setService('');
+        setPrice(null);
+      } else if (response.status === 409) {
+        setSelectedTime('');
+        toast({
+          title: 'Время занято',
+          description: 'Выбранное время уже занято. Пожалуйста, выберите другое.',
+          variant: 'destructive'
+        });
       } else {
         toast({
           title: 'Ошибка',
@@ -116,13 +215,23 @@ export default function BookingForm() {
           <div className="grid md:grid-cols-2 gap-6">
             <div className="space-y-2">
               <Label htmlFor="area">Площадь помещения (м²)</Label>
-              <Input id="area" name="area" type="number" placeholder="50" required />
+              <Input
+                id="area"
+                name="area"
+                type="number"
+                placeholder="50"
+                value={area}
+                onChange={(e) => setArea(e.target.value)}
+                required
+              />
             </div>
             <div className="space-y-2">
               <Label htmlFor="service">Тип уборки</Label>
               <select 
                 id="service"
                 name="service"
+                value={service}
+                onChange={(e) => setService(e.target.value)}
                 className="w-full h-10 px-3 rounded-md border border-input bg-background"
                 required
               >
@@ -171,8 +280,11 @@ export default function BookingForm() {
             {selectedDate && (
               <div className="space-y-2 animate-fade-in">
                 <Label htmlFor="time">Доступное время</Label>
+                {timeSlots.length === 0 && (
+                  <p className="text-sm text-muted-foreground">На эту дату свободного времени нет, выберите другую дату</p>
+                )}
                 <div className="grid grid-cols-3 sm:grid-cols-5 gap-2">
-                  {getAvailableTimeSlots().map(time => (
+                  {timeSlots.map(time => (
                     <Button
                       key={time}
                       type="button"
@@ -199,6 +311,13 @@ export default function BookingForm() {
             />
           </div>
 
+          {price !== null && (
+            <div className="flex items-center justify-between bg-primary/5 p-4 rounded-lg animate-fade-in">
+              <span className="text-muted-foreground">Предварительная стоимость</span>
+              <span className="text-xl font-semibold">{price.toLocaleString('ru-RU')} ₽</span>
+            </div>
+          )}
+
           <Button type="submit" size="lg" className="w-full">
             <Icon name="Send" size={20} className="mr-2" />
             Отправить заявку
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Button } from "@/components/ui/button";
 import Icon from "@/components/ui/icon";
 import { useToast } from "@/hooks/use-toast";
@@ -11,9 +11,12 @@ import ServicesManager from "@/components/admin/ServicesManager";
 import UsersManager from "@/components/admin/UsersManager";
 import {
   Booking,
+  BookingChanges,
+  BookingStats,
   User,
   API_URL,
   USERS_API_URL,
+  CHANGE_FEED_URL,
 } from "@/components/admin/types";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 
@@ -21,28 +24,45 @@ export default function Admin() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [currentUserId, setCurrentUserId] = useState<number>(1);
   const [currentUserRole, setCurrentUserRole] = useState<string>("super_admin");
+  const [authToken, setAuthToken] = useState<string | null>(null);
   const [activeTab, setActiveTab] = useState("bookings");
   const [searchQuery, setSearchQuery] = useState("");
   const [statusFilter, setStatusFilter] = useState<string>("all");
   const [selectedBooking, setSelectedBooking] = useState<Booking | null>(null);
   const [bookings, setBookings] = useState<Booking[]>([]);
   const [users, setUsers] = useState<User[]>([]);
+  const [bookingStats, setBookingStats] = useState<BookingStats | null>(null);
+  const syncWatermark = useRef<string | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const [showDeleteConfirm, setShowDeleteConfirm] = useState(false);
   const { toast } = useToast();
 
+  const authHeaders = (): Record<string, string> => ({
+    "X-User-Id": currentUserId.toString(),
+    "X-User-Role": currentUserRole,
+    ...(authToken ? { Authorization: `Bearer ${authToken}` } : {}),
+  });
+
+  const fetchChanges = async (since: string): Promise<BookingChanges | null> => {
+    const response = await fetch(
+      `${API_URL}?updated_since=${encodeURIComponent(since)}`,
+      { headers: authHeaders() },
+    );
+    return response.ok ? response.json() : null;
+  };
+
   const fetchBookings = async () => {
     setIsLoading(true);
     try {
+      // watermark берётся до загрузки списка, чтобы не пропустить изменения между запросами
+      const head = await fetchChanges("1970-01-01T00:00:00");
       const response = await fetch(API_URL, {
-        headers: {
-          "X-User-Id": currentUserId.toString(),
-          "X-User-Role": currentUserRole,
-        },
+        headers: authHeaders(),
       });
       if (response.ok) {
         const data = await response.json();
         setBookings(data);
+        syncWatermark.current = head?.watermark ?? null;
       }
     } catch (error) {
       toast({
@@ -55,9 +75,54 @@ export default function Admin() {
     }
   };
 
+  const syncBookings = async () => {
+    if (!syncWatermark.current) {
+      await fetchBookings();
+      return;
+    }
+    try {
+      const changes = await fetchChanges(syncWatermark.current);
+      if (!changes || changes.full_resync) {
+        await fetchBookings();
+        return;
+      }
+      syncWatermark.current = changes.watermark;
+      const changed = new Map(changes.items.map((b) => [b.id, b]));
+      const deleted = new Set(changes.deleted);
+      setBookings((current) => {
+        const merged = current
+          .filter((b) => !deleted.has(b.id))
+          .map((b) => changed.get(b.id) ?? b);
+        const known = new Set(current.map((b) => b.id));
+        const added = changes.items.filter(
+          (b) => !known.has(b.id) && !deleted.has(b.id),
+        );
+        return [...added, ...merged];
+      });
+    } catch (error) {
+      console.error("Failed to sync bookings:", error);
+    }
+  };
+
+  const fetchStats = async () => {
+    try {
+      const response = await fetch(`${API_URL}?action=stats`, {
+        headers: authHeaders(),
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setBookingStats(data);
+      }
+    } catch (error) {
+      console.error("Failed to fetch stats:", error);
+    }
+  };
+
   const fetchUsers = async () => {
     try {
-      const response = await fetch(USERS_API_URL);
+      const response = await fetch(USERS_API_URL, {
+        headers: authHeaders(),
+      });
       if (response.ok) {
         const data = await response.json();
         setUsers(data);
@@ -70,10 +135,30 @@ export default function Admin() {
   useEffect(() => {
     if (isAuthenticated && currentUserId) {
       fetchBookings();
+      fetchStats();
       fetchUsers();
     }
   }, [isAuthenticated]);
 
+  useEffect(() => {
+    if (!isAuthenticated || !CHANGE_FEED_URL) return;
+    const query = authToken ? `?token=${encodeURIComponent(authToken)}` : "";
+    const source = new EventSource(`${CHANGE_FEED_URL}/events${query}`);
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    // пачку событий (например, импорт) схлопываем в одну синхронизацию
+    source.onmessage = () => {
+      clearTimeout(timer);
+      timer = setTimeout(() => {
+        syncBookings();
+        fetchStats();
+      }, 300);
+    };
+    return () => {
+      clearTimeout(timer);
+      source.close();
+    };
+  }, [isAuthenticated, authToken]);
+
   const updateBookingStatus = async (
     id: number,
     newStatus: Booking["status"],
@@ -83,6 +168,7 @@ export default function Admin() {
         method: "PUT",
         headers: {
           "Content-Type": "application/json",
+          ...authHeaders(),
         },
         body: JSON.stringify({ status: newStatus }),
       });
@@ -91,6 +177,7 @@ export default function Admin() {
         setBookings(
           bookings.map((b) => (b.id === id ? { ...b, status: newStatus } : b)),
         );
+        fetchStats();
         toast({
           title: "Статус обновлён",
           description: "Изменения сохранены",
@@ -121,12 +208,14 @@ export default function Admin() {
         method: "PUT",
         headers: {
           "Content-Type": "application/json",
+          ...authHeaders(),
         },
         body: JSON.stringify({ assignee_id: assigneeId }),
       });
 
       if (response.ok) {
-        await fetchBookings();
+        await syncBookings();
+        fetchStats();
         toast({
           title: "Ответственный обновлён",
           description: assigneeId
@@ -167,12 +256,14 @@ export default function Admin() {
         method: "PUT",
         headers: {
           "Content-Type": "application/json",
+          ...authHeaders(),
         },
         body: JSON.stringify(data),
       });
 
       if (response.ok) {
-        await fetchBookings();
+        await syncBookings();
+        fetchStats();
         toast({
           title: "Заявка обновлена",
           description: "Изменения успешно сохранены",
@@ -206,11 +297,13 @@ export default function Admin() {
         method: "DELETE",
         headers: {
           "Content-Type": "application/json",
+          ...authHeaders(),
         },
       });
 
       if (response.ok) {
         setBookings(bookings.filter((b) => b.id !== id));
+        fetchStats();
         setSelectedBooking(null);
         toast({
           title: "Заявка удалена",
@@ -234,19 +327,20 @@ export default function Admin() {
   };
 
   const stats = {
-    total: bookings.length,
-    new: bookings.filter((b) => b.status === "new").length,
-    assigned: bookings.filter((b) => b.status === "assigned").length,
-    inProgress: bookings.filter((b) => b.status === "in-progress").length,
-    completed: bookings.filter((b) => b.status === "completed").length,
+    total: bookingStats?.all_time.total ?? 0,
+    new: bookingStats?.all_time.by_status.new ?? 0,
+    assigned: bookingStats?.all_time.by_status.assigned ?? 0,
+    inProgress: bookingStats?.all_time.by_status["in-progress"] ?? 0,
+    completed: bookingStats?.all_time.by_status.completed ?? 0,
   };
 
   if (!isAuthenticated) {
     return (
       <LoginForm
-        onLogin={(userId: number, userRole: string) => {
+        onLogin={(userId: number, userRole: string, token: string | null) => {
           setCurrentUserId(userId);
           setCurrentUserRole(userRole);
+          setAuthToken(token);
           setIsAuthenticated(true);
         }}
       />
@@ -271,7 +365,13 @@ export default function Admin() {
               <Icon name="Home" size={18} className="mr-2" />
               На сайт
             </Button>
-            <Button variant="ghost" onClick={() => setIsAuthenticated(false)}>
+            <Button
+              variant="ghost"
+              onClick={() => {
+                setAuthToken(null);
+                setIsAuthenticated(false);
+              }}
+            >
               <Icon name="LogOut" size={18} className="mr-2" />
               Выйти
             </Button>
@@ -324,7 +424,10 @@ export default function Admin() {
           </TabsContent>
 
           <TabsContent value="users">
-            <UsersManager currentUserRole={currentUserRole} />
+            <UsersManager
+              currentUserRole={currentUserRole}
+              authToken={authToken}
+            />
           </TabsContent>
         </Tabs>
       </main>
@@ -0,0 +1,226 @@
+'''
+Business: Нагрузочный генератор - смешанный трафик на локальный раннер функций, пропускная способность и перцентили
+Args: --base-url раннера, --duration, --concurrency, --mix name=вес,...; --admin-login/--admin-password для токена
+Returns: таблица (или --json) по каждому сценарию: запросы, ошибки, rps, p50/p90/p99/max в миллисекундах
+'''
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse, quote
+
+DEFAULT_MIX = {
+    'bookings_list': 30,
+    'bookings_page': 15,
+    'bookings_search': 10,
+    'bookings_detail': 15,
+    'bookings_stats': 5,
+    'bookings_sync': 5,
+    'bookings_create': 5,
+    'bookings_update': 5,
+    'services_list': 8,
+    'auth_login': 2,
+}
+
+SEARCH_TERMS = ['иван', '999', 'офис', 'test', 'ул.', '+7 9']
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class Client:
+    '''Keep-alive HTTP-соединение одного виртуального пользователя'''
+
+    def __init__(self, base_url: str, token: Optional[str]) -> None:
+        url = urlparse(base_url)
+        self.host = url.hostname or '127.0.0.1'
+        self.port = url.port or 80
+        self.prefix = url.path.rstrip('/')
+        self.headers = {'Content-Type': 'application/json', 'X-User-Id': '1', 'X-User-Role': 'super_admin'}
+        if token:
+            self.headers['Authorization'] = 'Bearer ' + token
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, bytes]:
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        for attempt in range(2):
+            try:
+                self.conn.request(method, self.prefix + path, body=payload, headers=self.headers)
+                response = self.conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                if attempt:
+                    raise
+        raise RuntimeError('unreachable')
+
+
+class Scenarios:
+    '''Сценарии трафика; id заявок берутся из первой страницы списка'''
+
+    def __init__(self, args: argparse.Namespace, booking_ids: List[int]) -> None:
+        self.args = args
+        self.booking_ids = booking_ids or [1]
+
+    def bookings_list(self, client: Client) -> int:
+        return client.request('GET', '/bookings/')[0]
+
+    def bookings_page(self, client: Client) -> int:
+        return client.request('GET', '/bookings/?limit=50&status=' + random.choice(['new', 'assigned', 'completed']))[0]
+
+    def bookings_search(self, client: Client) -> int:
+        return client.request('GET', '/bookings/?limit=20&search=' + quote(random.choice(SEARCH_TERMS)))[0]
+
+    def bookings_detail(self, client: Client) -> int:
+        return client.request('GET', f'/bookings/{random.choice(self.booking_ids)}')[0]
+
+    def bookings_stats(self, client: Client) -> int:
+        return client.request('GET', '/bookings/?action=stats')[0]
+
+    def bookings_sync(self, client: Client) -> int:
+        since = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(time.time() - 300))
+        return client.request('GET', '/bookings/?updated_since=' + since)[0]
+
+    def bookings_create(self, client: Client) -> int:
+        suffix = random.randint(0, 9999999)
+        return client.request('POST', '/bookings/', {
+            'name': f'Нагрузка {suffix}',
+            'phone': f'+7 900 {suffix:07d}',
+            'email': f'load{suffix}@example.com',
+            'address': f'ул. Тестовая, {suffix % 200}',
+            'area': random.randint(20, 300),
+            'serviceType': random.choice(['apartment', 'office', 'after-repair']),
+            'comment': 'loadgen',
+            'date': time.strftime('%Y-%m-%d', time.gmtime(time.time() + 86400 * random.randint(1, 30))),
+            'time': random.choice(['09:00', '12:00', '15:00', '18:00'])
+        })[0]
+
+    def bookings_update(self, client: Client) -> int:
+        status = random.choice(['new', 'in-progress', 'completed'])
+        return client.request('PUT', f'/bookings/?id={random.choice(self.booking_ids)}', {'status': status})[0]
+
+    def services_list(self, client: Client) -> int:
+        return client.request('GET', '/services/')[0]
+
+    def auth_login(self, client: Client) -> int:
+        return client.request('POST', '/auth/', {
+            'username': self.args.admin_login or 'admin',
+            'password': self.args.admin_password or 'admin'
+        })[0]
+
+
+def parse_mix(raw: Optional[str]) -> Dict[str, int]:
+    if not raw:
+        return dict(DEFAULT_MIX)
+    mix: Dict[str, int] = {}
+    for item in raw.split(','):
+        name, _, weight = item.partition('=')
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def login(base_url: str, username: Optional[str], password: Optional[str]) -> Optional[str]:
+    if not username:
+        return None
+    status, body = Client(base_url, None).request('POST', '/auth/', {'username': username, 'password': password})
+    if status != 200:
+        raise SystemExit(f'login failed: {status} {body[:200]!r}')
+    return json.loads(body).get('token')
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    token = login(args.base_url, args.admin_login, args.admin_password)
+    status, body = Client(args.base_url, token).request('GET', '/bookings/?limit=200')
+    booking_ids = [item['id'] for item in json.loads(body)['items']] if status == 200 else []
+    scenarios = Scenarios(args, booking_ids)
+
+    mix = parse_mix(args.mix)
+    unknown = [name for name in mix if not hasattr(scenarios, name)]
+    if unknown:
+        raise SystemExit('unknown scenarios: ' + ', '.join(unknown))
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def user(seed: int) -> None:
+        rng = random.Random(seed)
+        client = Client(args.base_url, token)
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            action: Callable[[Client], int] = getattr(scenarios, name)
+            started = time.perf_counter()
+            try:
+                code = action(client)
+            except Exception:
+                code = 0
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies[name].append(elapsed)
+                if not 200 <= code < 400:
+                    errors[name] += 1
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=user, args=(args.seed + i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    report: Dict[str, Any] = {'duration_s': round(elapsed, 3), 'concurrency': args.concurrency, 'endpoints': {}}
+    total = 0
+    for name in names:
+        values = sorted(latencies[name])
+        total += len(values)
+        report['endpoints'][name] = {
+            'requests': len(values),
+            'errors': errors[name],
+            'rps': round(len(values) / elapsed, 2),
+            'p50_ms': round(percentile(values, 0.50), 2),
+            'p90_ms': round(percentile(values, 0.90), 2),
+            'p99_ms': round(percentile(values, 0.99), 2),
+            'max_ms': round(values[-1], 2) if values else 0.0,
+        }
+    report['requests'] = total
+    report['rps'] = round(total / elapsed, 2)
+    return report
+
+
+def print_table(report: Dict[str, Any]) -> None:
+    print(f"{'endpoint':<18}{'req':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for name, row in report['endpoints'].items():
+        print(f"{name:<18}{row['requests']:>8}{row['errors']:>6}{row['rps']:>9}"
+              f"{row['p50_ms']:>9}{row['p90_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}")
+    print(f"total: {report['requests']} requests in {report['duration_s']}s, {report['rps']} rps")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Нагрузочный тест локального раннера функций')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--duration', type=float, default=30.0, help='секунд')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--mix', help='например bookings_list=5,services_list=1')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--admin-login')
+    parser.add_argument('--admin-password')
+    parser.add_argument('--json', action='store_true', help='вывести отчёт в JSON')
+    args = parser.parse_args()
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_table(result)
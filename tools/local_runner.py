@@ -0,0 +1,193 @@
+'''
+Business: Локальный запуск облачных функций backend/*/index.py за одним HTTP-сервером
+Args: --port, --instances (процессов на функцию), --only; DATABASE_URL и прочие переменные берутся из окружения
+Returns: http://127.0.0.1:PORT/<функция>/[id]?... -> handler(event, context) функции в отдельном процессе
+'''
+
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import traceback
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse, parse_qsl
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+TEXT_CONTENT_TYPES = ('application/json', 'text/', 'application/x-www-form-urlencoded', 'application/x-ndjson')
+
+
+class LocalContext:
+    '''Аналог context платформы: request_id и function_name'''
+
+    def __init__(self, request_id: str, function_name: str) -> None:
+        self.request_id = request_id
+        self.function_name = function_name
+
+
+def discover_functions(only: Optional[List[str]] = None) -> List[str]:
+    names = sorted(
+        name for name in os.listdir(BACKEND_DIR)
+        if os.path.isfile(os.path.join(BACKEND_DIR, name, 'index.py'))
+    )
+    return [name for name in names if not only or name in only]
+
+
+def worker_main(function_name: str, pipe: Any) -> None:
+    '''
+    Процесс одного экземпляра функции. Каждая функция деплоится отдельно со своими копиями db.py,
+    tokens.py и т.д., поэтому модули с одинаковыми именами нельзя смешивать в одном интерпретаторе.
+    '''
+    function_dir = os.path.join(BACKEND_DIR, function_name)
+    os.chdir(function_dir)
+    sys.path.insert(0, function_dir)
+    started = time.perf_counter()
+    import index
+    pipe.send({'ready': True, 'import_ms': round((time.perf_counter() - started) * 1000, 3)})
+    while True:
+        message = pipe.recv()
+        if message is None:
+            break
+        context = LocalContext(message['request_id'], function_name)
+        try:
+            response = index.handler(message['event'], context)
+        except Exception:
+            response = {
+                'statusCode': 502,
+                'headers': {'Content-Type': 'text/plain'},
+                'body': traceback.format_exc(),
+                'isBase64Encoded': False
+            }
+        pipe.send(response)
+
+
+class FunctionInstances:
+    '''Пул процессов одной функции: экземпляр обрабатывает один запрос за раз, как на платформе'''
+
+    def __init__(self, function_name: str, instances: int) -> None:
+        self.function_name = function_name
+        self.idle: 'queue.Queue[Any]' = queue.Queue()
+        self.processes: List[Any] = []
+        ctx = multiprocessing.get_context('spawn')
+        for _ in range(instances):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=worker_main, args=(function_name, child), daemon=True)
+            process.start()
+            self.processes.append(process)
+            ready = parent.recv()
+            print(json.dumps({'event': 'instance_ready', 'function': function_name, **ready}), flush=True)
+            self.idle.put(parent)
+
+    def invoke(self, event: Dict[str, Any], request_id: str) -> Dict[str, Any]:
+        pipe = self.idle.get()
+        try:
+            pipe.send({'event': event, 'request_id': request_id})
+            return pipe.recv()
+        finally:
+            self.idle.put(pipe)
+
+    def stop(self) -> None:
+        while not self.idle.empty():
+            self.idle.get().send(None)
+        for process in self.processes:
+            process.join(timeout=2)
+
+
+def build_event(method: str, path: str, headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+    '''Событие в формате платформы: httpMethod, headers, queryStringParameters, pathParams, body'''
+    url = urlparse(path)
+    parts = [part for part in url.path.split('/') if part]
+    content_type = headers.get('Content-Type', '')
+    is_text = not body or content_type.startswith(TEXT_CONTENT_TYPES)
+    try:
+        text_body = body.decode('utf-8') if is_text else None
+    except UnicodeDecodeError:
+        text_body = None
+    return {
+        'httpMethod': method,
+        'headers': headers,
+        'queryStringParameters': dict(parse_qsl(url.query, keep_blank_values=True)),
+        'pathParams': {'id': parts[1]} if len(parts) > 1 else {},
+        'body': text_body if text_body is not None else base64.b64encode(body).decode('ascii'),
+        'isBase64Encoded': text_body is None,
+        'requestContext': {'httpMethod': method, 'path': url.path}
+    }
+
+
+class RunnerRequestHandler(BaseHTTPRequestHandler):
+    functions: Dict[str, FunctionInstances] = {}
+    protocol_version = 'HTTP/1.1'
+    # заголовки и тело уходят отдельными write; без TCP_NODELAY keep-alive упирается в delayed ACK (~40 мс)
+    disable_nagle_algorithm = True
+    quiet = False
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _dispatch(self) -> None:
+        parts = [part for part in urlparse(self.path).path.split('/') if part]
+        instances = self.functions.get(parts[0]) if parts else None
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if instances is None:
+            self._reply(404, {'Content-Type': 'application/json'},
+                        json.dumps({'error': 'Unknown function', 'functions': sorted(self.functions)}).encode())
+            return
+
+        event = build_event(self.command, self.path, dict(self.headers.items()), body)
+        response = instances.invoke(event, uuid.uuid4().hex)
+        payload = response.get('body') or ''
+        if response.get('isBase64Encoded'):
+            data = base64.b64decode(payload)
+        else:
+            data = payload.encode('utf-8') if isinstance(payload, str) else json.dumps(payload).encode('utf-8')
+        self._reply(response.get('statusCode', 200), response.get('headers') or {}, data)
+
+    def _reply(self, status: int, headers: Dict[str, str], data: bytes) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            if name.lower() != 'content-length':
+                self.send_header(name, str(value))
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_OPTIONS = do_PATCH = _dispatch
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Локальный запуск функций backend/*')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--instances', type=int, default=2, help='процессов на функцию')
+    parser.add_argument('--only', nargs='*', help='запустить только указанные функции')
+    parser.add_argument('--quiet', action='store_true', help='без access-лога')
+    args = parser.parse_args()
+
+    functions = {name: FunctionInstances(name, args.instances) for name in discover_functions(args.only)}
+    RunnerRequestHandler.functions = functions
+    RunnerRequestHandler.quiet = args.quiet
+    server = ThreadingHTTPServer((args.host, args.port), RunnerRequestHandler)
+    server.daemon_threads = True
+    print(json.dumps({'event': 'listening', 'url': f'http://{args.host}:{args.port}',
+                      'functions': sorted(functions)}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for instances in functions.values():
+            instances.stop()
+
+
+if __name__ == '__main__':
+    main()